@@ -1,4 +1,7 @@
+import json
+import sqlite3
 import sys
+import uuid
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -6,51 +9,74 @@ sys.path.append(str(ROOT))
 
 import streamlit as st
 
-from rag.rag_answer import answer_question_structured
-from rag.index_store import load_index, load_metadata
+from rag.expansion import reset_expansion_table
+from rag.filters import columns_for
+from rag.memory import ConversationMemory
+from rag.prefetch import PrefetchCache, follow_up_candidates
+from rag.profiler import profile_request
+from rag.rag_answer import answer_question_structured, prefetch_retrieval
+from rag.index_store import load_child_index, load_index, load_metadata
+from rag.session_store import get_session_store
+from rag.throttle import Overloaded, run_guarded
+from rag.usage import get_ledger, usage_scope
+from rag.routing import load_doc_router
+from rag.shards import load_shards
+from rag.warmup import take_preloaded, warmup_in_background
 
 DEFAULT_TOP_K = 20
 DEFAULT_MEMORY_LEN = 2
+HISTORY_PAGE_SIZE = 20
 
 
 @st.cache_resource(show_spinner=False)
 def get_index():
-    return load_index()
+    return take_preloaded("index", load_index)
 
 
-@st.cache_data(show_spinner=False)
-def get_meta():
-    return load_metadata()
+@st.cache_resource(show_spinner=False)
+def get_store():
+    return get_session_store()
 
 
-@st.cache_data(show_spinner=False)
-def load_meta_options(meta: list[dict]):
-    topics = set()
-    categories = set()
-    years = set()
-    docs = set()
+@st.cache_resource(show_spinner=False)
+def get_hierarchy():
+    return take_preloaded("hierarchy", load_child_index)
+
 
-    for item in meta:
-        d = item.get("doc")
-        if d:
-            docs.add(d)
+@st.cache_resource(show_spinner=False)
+def get_router():
+    # Document routing index for two-stage retrieval, if built (rag/routing.py)
+    return take_preloaded("router", load_doc_router)
+
+
+@st.cache_resource(show_spinner=False)
+def get_shards():
+    # Named collections, if built (python -m rag.faiss_index collections); else single index
+    return take_preloaded("shards", lambda: load_shards() or None)
 
-        cat = item.get("category")
-        if cat:
-            categories.add(cat)
 
-        y = item.get("year")
-        if y is not None:
-            years.add(y)
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    # Plain `streamlit run`: warm index/hints/connections in the background after the
+    # first render. `python -m rag.warmup` has already done it before serving.
+    warmup_in_background(lambda: (get_index(), get_meta(), get_hierarchy(), get_shards(), get_router()))
 
-        for t in item.get("topics", []) or []:
-            topics.add(t)
 
+@st.cache_resource(show_spinner=False)
+def get_meta():
+    # cache_resource: shared read-only, not pickled/copied on every rerun like cache_data
+    return take_preloaded("meta", load_metadata)
+
+
+@st.cache_data(show_spinner=False)
+def load_meta_options(_meta: list[dict]):
+    # leading underscore: Streamlit does not hash the (large) metadata list on each call
+    cols = columns_for(_meta)
     return {
-        "topics": sorted(topics),
-        "categories": sorted(categories),
-        "years": sorted(years),
-        "docs": sorted(docs),
+        "topics": cols.topics,
+        "categories": [c for c in cols.categories if c],
+        "years": cols.years,
+        "docs": [d for d in cols.docs if d],
     }
 
 
@@ -67,6 +93,12 @@ def _filters_summary(doc_filter, year_filter, category_filter, topic_filter):
     return " • ".join(parts) if parts else "No filters applied."
 
 
+def _confidence_caption(confidence: str, evidence) -> str:
+    if isinstance(evidence, (int, float)):
+        return f"Confidence: {confidence} (evidence {evidence:.2f})"
+    return f"Confidence: {confidence}"
+
+
 def _dedupe_quotes(quotes: list[dict]) -> list[dict]:
     seen = set()
     deduped = []
@@ -78,6 +110,29 @@ def _dedupe_quotes(quotes: list[dict]) -> list[dict]:
     return deduped
 
 
+def _ask(question: str) -> None:
+    st.session_state["pending_question"] = question
+
+
+def _session_id() -> str:
+    # Kept in the URL so a reconnect / reload resumes the same server-side session
+    sid = st.query_params.get("sid")
+    if not sid:
+        sid = uuid.uuid4().hex
+        st.query_params["sid"] = sid
+    return sid
+
+
+def _new_conversation() -> None:
+    st.query_params["sid"] = uuid.uuid4().hex
+    for key in ("memory", "prefetch", "history_window"):
+        st.session_state.pop(key, None)
+
+
+def _show_more_history() -> None:
+    st.session_state["history_window"] = st.session_state.get("history_window", HISTORY_PAGE_SIZE) + HISTORY_PAGE_SIZE
+
+
 def main():
     st.set_page_config(
         page_title="RAG Chatbot",
@@ -89,10 +144,73 @@ def main():
     st.title("RAG Chatbot")
     st.caption("Grounded answers • OpenAI embeddings • FAISS vector search")
 
-    # Load data
-    INDEX = get_index()
-    META = get_meta()
-    opts = load_meta_options(META)
+    # Session state (history + memory persist in the session store)
+    store = get_store()
+    sid = _session_id()
+
+    if "memory" not in st.session_state:
+        memory = ConversationMemory(recent_turns=DEFAULT_MEMORY_LEN)
+        saved = store.get_state(sid, "memory")
+        if saved:
+            memory.load_state(saved)
+        st.session_state.memory = memory
+    if "prefetch" not in st.session_state:
+        st.session_state.prefetch = PrefetchCache()
+
+    # Render chat history (only the visible window is loaded)
+    total = store.count(sid)
+    window = st.session_state.get("history_window", HISTORY_PAGE_SIZE)
+    first = max(0, total - window)
+    if first > 0:
+        st.button(f"Show earlier messages ({first} more)", on_click=_show_more_history)
+
+    for m_idx, m in enumerate(store.page(sid, first, total - first), start=first):
+        with st.chat_message(m["role"]):
+            st.markdown(m["content"])
+
+            if m["role"] == "assistant":
+                sources = m.get("sources", [])
+                quotes = _dedupe_quotes(m.get("quotes", []))
+                confidence = m.get("confidence")
+
+                if confidence:
+                    st.caption(_confidence_caption(confidence, m.get("evidence")))
+
+                if sources:
+                    with st.expander("Sources", expanded=False):
+                        for i, s in enumerate(sources, start=1):
+                            doc = s.get("doc", "Unknown doc")
+                            page = s.get("page", "?")
+                            score = s.get("score", None)
+                            score_txt = f" • score: {score:.3f}" if isinstance(score, (int, float)) else ""
+                            st.write(f"**{i}. {doc}** (page {page}){score_txt}")
+
+                if quotes:
+                    with st.expander("Supporting quotes", expanded=False):
+                        quote_options = []
+                        for q in quotes:
+                            quote = (q.get("quote") or "").strip()
+                            src_idx = q.get("source_index")
+                            if quote:
+                                if src_idx is not None:
+                                    quote_options.append(f"[{src_idx}] {quote}")
+                                else:
+                                    quote_options.append(quote)
+
+                        if quote_options:
+                            selected = st.selectbox("Pick a quote", quote_options, index=0, key=f"quote_{m_idx}")
+                            st.info(selected)
+                        else:
+                            st.caption("No quotes available.")
+
+                if m_idx == total - 1:
+                    for j, fq in enumerate(m.get("follow_ups", [])):
+                        st.button(fq, key=f"follow_up_{m_idx}_{j}", on_click=_ask, args=(fq,))
+
+    # Metadata for the filter options; the FAISS index is loaded on the first question
+    with st.spinner("Loading documents…"):
+        META = get_meta()
+        opts = load_meta_options(META)
 
     # Sidebar
     with st.sidebar:
@@ -146,28 +264,89 @@ def main():
 
         if st.button("Reload index/meta (after rebuild)", use_container_width=True):
             get_index.clear()
+            get_hierarchy.clear()
+            get_router.clear()
+            get_shards.clear()
             get_meta.clear()
             load_meta_options.clear()
+            reset_expansion_table()
             st.rerun()
 
-    # Session state
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    if "user_questions" not in st.session_state:
-        st.session_state.user_questions = []
+        st.button("New conversation", use_container_width=True, on_click=_new_conversation)
 
-    # Render chat history
-    for m in st.session_state.messages:
-        with st.chat_message(m["role"]):
-            st.markdown(m["content"])
+        try:
+            usage = get_ledger().session_totals(sid)
+        except sqlite3.Error:
+            usage = {"calls": 0}
+        if usage["calls"]:
+            tokens = usage["prompt_tokens"] + usage["completion_tokens"]
+            st.caption(f"Usage this session: {tokens:,} tokens · ${usage['cost_usd']:.4f}")
 
-            if m["role"] == "assistant":
-                sources = m.get("sources", [])
-                quotes = _dedupe_quotes(m.get("quotes", []))
-                confidence = m.get("confidence")
+    # Chat input
+    user_input = st.chat_input("Ask a question about the documents…") or st.session_state.pop(
+        "pending_question", None
+    )
+
+    if user_input:
+        store.append(sid, {"role": "user", "content": user_input})
+
+        with st.chat_message("user"):
+            st.markdown(user_input)
+
+        with st.chat_message("assistant"):
+            with st.spinner("Loading index…"):
+                INDEX = get_index()
+                HIERARCHY = get_hierarchy()
+                ROUTER = get_router()
+                SHARDS = get_shards()
+
+            # API tokens/cost of this answer (and its prefetch / memory work) go to this session
+            with usage_scope(
+                sid, docs=doc_filter, year=year_filter, category=category_filter, topics=topic_filter
+            ):
+                # identical concurrent requests (same question, filters and memory) share one computation
+                request_key = (
+                    user_input.strip().lower(),
+                    tuple(doc_filter or ()),
+                    year_filter,
+                    category_filter,
+                    tuple(topic_filter or ()),
+                    json.dumps(st.session_state.memory.to_state(), sort_keys=True),
+                )
+                with st.spinner("Retrieving…"):
+                    try:
+                        result = dict(
+                            run_guarded(
+                                request_key,
+                                lambda: answer_question_structured(
+                                    user_input,
+                                    index=INDEX,
+                                    meta=META,
+                                    top_k=DEFAULT_TOP_K,
+                                    memory=st.session_state.memory,
+                                    doc_filter=doc_filter,
+                                    year_filter=year_filter,
+                                    category_filter=category_filter,
+                                    topic_filter=topic_filter,
+                                    hierarchy=HIERARCHY,
+                                    prefetch=st.session_state.prefetch,
+                                    shards=SHARDS,
+                                    router=ROUTER,
+                                ),
+                            )
+                        )
+                    except Overloaded as e:
+                        result = {"answer": str(e), "sources": [], "quotes": [], "busy": True}
+
+                answer = result.get("answer", "")
+                st.markdown(answer)
+
+                sources = result.get("sources", [])
+                quotes = _dedupe_quotes(result.get("quotes", []))
+                confidence = result.get("confidence")
 
                 if confidence:
-                    st.caption(f"Confidence: {confidence}")
+                    st.caption(_confidence_caption(confidence, result.get("evidence")))
 
                 if sources:
                     with st.expander("Sources", expanded=False):
@@ -191,85 +370,58 @@ def main():
                                     quote_options.append(quote)
 
                         if quote_options:
-                            selected = st.selectbox("Pick a quote", quote_options, index=0, key=f"quote_{id(m)}")
+                            selected = st.selectbox("Pick a quote", quote_options, index=0, key="quote_live")
                             st.info(selected)
                         else:
                             st.caption("No quotes available.")
 
-    # Chat input
-    user_input = st.chat_input("Ask a question about the documents…")
-
-    if user_input:
-        st.session_state.messages.append({"role": "user", "content": user_input})
-        st.session_state.user_questions.append(user_input)
-
-        with st.chat_message("user"):
-            st.markdown(user_input)
-
-        history = st.session_state.user_questions[:-1][-DEFAULT_MEMORY_LEN:]
-
-        with st.chat_message("assistant"):
-            with st.spinner("Retrieving…"):
-                result = answer_question_structured(
-                    user_input,
-                    index=INDEX,
-                    meta=META,
-                    top_k=DEFAULT_TOP_K,
-                    history=history,
-                    doc_filter=doc_filter,
-                    year_filter=year_filter,
-                    category_filter=category_filter,
-                    topic_filter=topic_filter,
-                )
-
-            answer = result.get("answer", "")
-            st.markdown(answer)
-
-            sources = result.get("sources", [])
-            quotes = _dedupe_quotes(result.get("quotes", []))
-            confidence = result.get("confidence")
-
-            if confidence:
-                st.caption(f"Confidence: {confidence}")
-
-            if sources:
-                with st.expander("Sources", expanded=False):
-                    for i, s in enumerate(sources, start=1):
-                        doc = s.get("doc", "Unknown doc")
-                        page = s.get("page", "?")
-                        score = s.get("score", None)
-                        score_txt = f" • score: {score:.3f}" if isinstance(score, (int, float)) else ""
-                        st.write(f"**{i}. {doc}** (page {page}){score_txt}")
-
-            if quotes:
-                with st.expander("Supporting quotes", expanded=False):
-                    quote_options = []
-                    for q in quotes:
-                        quote = (q.get("quote") or "").strip()
-                        src_idx = q.get("source_index")
-                        if quote:
-                            if src_idx is not None:
-                                quote_options.append(f"[{src_idx}] {quote}")
-                            else:
-                                quote_options.append(quote)
-
-                    if quote_options:
-                        selected = st.selectbox("Pick a quote", quote_options, index=0, key="quote_live")
-                        st.info(selected)
-                    else:
-                        st.caption("No quotes available.")
-
-        
-        st.session_state.messages.append(
+                follow_ups = []
+                if not result.get("busy") and not result.get("budget_exhausted"):
+                    # Update memory (summary folding runs in the background) and
+                    # warm retrieval for likely next questions while the user reads the answer
+                    st.session_state.memory.add_turn(user_input, answer)
+                    st.session_state.memory.compact_async()
+
+                    follow_ups = follow_up_candidates(user_input, sources)
+                    for fq in follow_ups:
+                        prefetch_retrieval(
+                            st.session_state.prefetch,
+                            fq,
+                            index=INDEX,
+                            meta=META,
+                            top_k=DEFAULT_TOP_K,
+                            memory=st.session_state.memory,
+                            doc_filter=doc_filter,
+                            year_filter=year_filter,
+                            category_filter=category_filter,
+                            topic_filter=topic_filter,
+                            hierarchy=HIERARCHY,
+                            shards=SHARDS,
+                            router=ROUTER,
+                        )
+
+            msg_idx = total + 1
+            for j, fq in enumerate(follow_ups):
+                st.button(fq, key=f"follow_up_{msg_idx}_{j}", on_click=_ask, args=(fq,))
+
+        store.append(
+            sid,
             {
                 "role": "assistant",
                 "content": answer,
                 "sources": sources,
                 "quotes": quotes,
                 "confidence": confidence,
-            }
+                "evidence": result.get("evidence"),
+                "follow_ups": follow_ups,
+            },
         )
+        store.put_state(sid, "memory", st.session_state.memory.to_state())
+
+    start_warmup()
 
 
 if __name__ == "__main__":
-    main()
+    # sampled only while a window is open (`python -m rag.profiler start`)
+    with profile_request():
+        main()
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-import re
 from typing import Optional
 
+import numpy as np
+
+from rag.filters import filter_mask
+from rag.intent import classify
+
 
 BARRIER_TERMS = (
     "adoption",
@@ -34,12 +38,6 @@ BARRIER_TERMS = (
     "connectivity",
 )
 
-BARRIERISH_RE = re.compile(
-    r"\b(barrier(s)?|challenge(s)?|limitation(s)?|obstacle(s)?|constraint(s)?|implement(ation|ing)?|adoption|unintended consequence(s)?)\b",
-    re.IGNORECASE,
-)
-
-
 RETRIEVAL_BOOST = (
     "Focus: challenges, barriers, limitations, obstacles, provider acceptance, workflow, reimbursement, "
     "infrastructure, privacy, security, licensure, regulatory constraints."
@@ -47,37 +45,7 @@ RETRIEVAL_BOOST = (
 
 
 def is_barrierish(question: str) -> bool:
-    return bool(BARRIERISH_RE.search(question or ""))
-
-
-def _matches_filters(
-    item: dict,
-    doc_filter: Optional[list[str]],
-    year_filter: Optional[int],
-    category_filter: Optional[str],
-    topic_filter: Optional[list[str]],
-) -> bool:
-    if doc_filter and item.get("doc") not in doc_filter:
-        return False
-
-    if year_filter:
-        item_year = item.get("year")
-        if item_year is not None:
-            if int(item_year) != int(year_filter):
-                return False
-        else:
-            if not item.get("doc", "").startswith(f"{year_filter}_"):
-                return False
-
-    if category_filter and item.get("category") != category_filter:
-        return False
-
-    if topic_filter:
-        item_topics = set(item.get("topics", []) or [])
-        if item_topics.isdisjoint(set(topic_filter)):
-            return False
-
-    return True
+    return classify(question).barrier
 
 
 def keyword_fallback_contexts(
@@ -96,10 +64,11 @@ def keyword_fallback_contexts(
     """
     scored: list[tuple[int, int, dict]] = []
 
-    for item in meta:
-        if not _matches_filters(item, doc_filter, year_filter, category_filter, topic_filter):
-            continue
+    mask = filter_mask(meta, doc_filter, year_filter, category_filter, topic_filter)
+    rows = range(len(meta)) if mask is None else np.flatnonzero(mask)
 
+    for row in rows:
+        item = meta[row]
         text = (item.get("text") or "").lower()
         if not text:
             continue
@@ -124,6 +93,8 @@ def keyword_fallback_contexts(
                 "year": item.get("year"),
                 "topics": item.get("topics", []),
                 "category": item.get("category"),
+                "alt_citations": item.get("alt_citations", []),
+                "telemed_signal": item.get("telemed_signal", 0),
             }
         )
 
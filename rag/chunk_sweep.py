@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from rag.embeddings import active_model_id
+from rag.page_cache import PageCache, get_page_cache, iter_clean_pages
+from rag.preprocess import CHUNK_OVERLAP, CHUNK_SIZE, DOCS_PATH, chunk_text, load_documents
+from rag.usage import price_per_mtok
+
+# (chunk_size, chunk_overlap) in characters
+DEFAULT_CONFIGS = (
+    (500, 50),
+    (750, 100),
+    (CHUNK_SIZE, CHUNK_OVERLAP),
+    (1500, 200),
+    (2000, 300),
+)
+
+# Without tiktoken: ~4 characters per token for English prose
+CHARS_PER_TOKEN = 4.0
+
+
+@dataclass
+class SweepResult:
+    chunk_size: int
+    chunk_overlap: int
+    chunks: int
+    chars: int          # total characters embedded (overlap counted every time)
+    tokens: int
+    cost_usd: float     # at the model's price in rag/usage.py (0 for local / unknown models)
+    seconds: float
+
+    @property
+    def mean_chars(self) -> float:
+        return self.chars / self.chunks if self.chunks else 0.0
+
+
+def token_counter() -> tuple[Callable[[str], int], bool]:
+    """(count function, exact?) - tiktoken's cl100k_base if installed, else a chars/4 estimate."""
+    try:
+        import tiktoken
+    except ImportError:
+        return (lambda text: round(len(text) / CHARS_PER_TOKEN)), False
+
+    enc = tiktoken.get_encoding("cl100k_base")
+    return (lambda text: len(enc.encode(text, disallowed_special=()))), True
+
+
+def load_pages(docs_path: Path = DOCS_PATH, cache: Optional[PageCache] = None) -> list[list[tuple[int, str]]]:
+    """Cleaned pages of every document (from the page cache; extracted once on a miss)."""
+    cache = cache if cache is not None else get_page_cache()
+    return [list(iter_clean_pages(p, cache)) for p in load_documents(docs_path)]
+
+
+def sweep(
+    configs: tuple[tuple[int, int], ...] = DEFAULT_CONFIGS,
+    pages: Optional[list[list[tuple[int, str]]]] = None,
+    model_id: Optional[str] = None,
+) -> list[SweepResult]:
+    """Re-chunk the cached pages under each (chunk_size, chunk_overlap) and measure the result."""
+    pages = pages if pages is not None else load_pages()
+    count_tokens, _ = token_counter()
+    model_id = model_id or active_model_id()
+    price = price_per_mtok(model_id)[0]
+
+    results: list[SweepResult] = []
+    for size, overlap in configs:
+        t0 = time.perf_counter()
+        chunks = chars = tokens = 0
+        for doc_pages in pages:
+            for _, text in doc_pages:
+                for chunk in chunk_text(text, size, overlap):
+                    chunks += 1
+                    chars += len(chunk)
+                    tokens += count_tokens(chunk)
+        results.append(
+            SweepResult(
+                chunk_size=size,
+                chunk_overlap=overlap,
+                chunks=chunks,
+                chars=chars,
+                tokens=tokens,
+                cost_usd=tokens / 1e6 * price,
+                seconds=time.perf_counter() - t0,
+            )
+        )
+    return results
+
+
+def _parse_config(arg: str) -> tuple[int, int]:
+    size, _, overlap = arg.partition(":")
+    return int(size), int(overlap or 0)
+
+
+def _report(results: list[SweepResult], exact_tokens: bool, model_id: str) -> None:
+    print(f"Embedding model: {model_id}; tokens {'exact (tiktoken)' if exact_tokens else 'estimated (chars/4)'}")
+    print(f"{'size':>6} {'overlap':>7} {'chunks':>8} {'avg chars':>9} {'tokens':>10} {'embed cost':>10} {'time':>7}")
+    for r in results:
+        cost = f"${r.cost_usd:.4f}"
+        current = "  <- current" if (r.chunk_size, r.chunk_overlap) == (CHUNK_SIZE, CHUNK_OVERLAP) else ""
+        print(
+            f"{r.chunk_size:>6} {r.chunk_overlap:>7} {r.chunks:>8} {r.mean_chars:>9.0f} {r.tokens:>10} "
+            f"{cost:>10} {r.seconds:>6.2f}s{current}"
+        )
+
+
+if __name__ == "__main__":
+    # python -m rag.chunk_sweep                 -> default grid
+    # python -m rag.chunk_sweep 800:100 1200:150 -> custom size:overlap pairs
+    configs = tuple(_parse_config(a) for a in sys.argv[1:]) or DEFAULT_CONFIGS
+
+    t0 = time.perf_counter()
+    cache = get_page_cache()
+    pages = load_pages(cache=cache)
+    stats = cache.stats()
+    print(
+        f"Pages ready in {time.perf_counter() - t0:.2f}s: {sum(len(p) for p in pages)} pages from {len(pages)} docs "
+        f"(cache: {stats['docs']} docs, {stats['bytes'] / 1024:.0f} KiB)"
+    )
+
+    model_id = active_model_id()
+    _report(sweep(configs, pages, model_id), token_counter()[1], model_id)
@@ -1,7 +1,8 @@
 import json
 from pathlib import Path
 
-from rag.preprocess import load_pdfs, extract_text_with_pages, clean_text, chunk_text
+from rag.page_cache import iter_clean_pages
+from rag.preprocess import load_documents, chunk_text
 
 CHUNKS_PATH = Path("storage/chunks.jsonl")
 
@@ -20,26 +21,20 @@ def write_chunks_jsonl() -> None:
     """
     ensure_storage_dir()
 
-    pdfs = load_pdfs()
-    print(f" Found {len(pdfs)} PDF files")
+    docs = load_documents()
+    print(f" Found {len(docs)} documents")
 
     total_chunks = 0
     global_chunk_id = 0
 
     with CHUNKS_PATH.open("w", encoding="utf-8") as f:
-        for pdf_path in pdfs:
-            pages = extract_text_with_pages(pdf_path)
-
+        for doc_path in docs:
             doc_chunks = 0
-            for page_num, page_text in pages:
-                cleaned = clean_text(page_text)
-                if not cleaned:
-                    continue
-
+            for page_num, cleaned in iter_clean_pages(doc_path):
                 chunks = chunk_text(cleaned)
                 for chunk in chunks:
                     record = {
-                        "doc": pdf_path.name,
+                        "doc": doc_path.name,
                         "page": page_num,
                         "chunk_id": global_chunk_id,
                         "text": chunk,
@@ -50,7 +45,7 @@ def write_chunks_jsonl() -> None:
                     doc_chunks += 1
                     total_chunks += 1
 
-            print(f" {pdf_path.name}: {doc_chunks} chunks")
+            print(f" {doc_path.name}: {doc_chunks} chunks")
 
     print(f"\n Done! Wrote {total_chunks} total chunks → {CHUNKS_PATH}")
 
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+NGRAM = 2
+FUZZY_MIN = 0.6          # share of quote word-bigrams that must appear in one context
+CONF_HIGH = 0.75
+CONF_MEDIUM = 0.45
+SCORE_REF = 0.6          # cosine relevance treated as "fully relevant"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _ngrams(words: list[str]) -> set[tuple[str, ...]]:
+    if len(words) < NGRAM:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + NGRAM]) for i in range(len(words) - NGRAM + 1)}
+
+
+class ContextIndex:
+    """
+    Lookup structures over the retrieved contexts, built once per answer:
+    - (doc, page) -> context positions (including alt_citations of deduped chunks)
+    - normalized text and word-bigram set per context for quote matching
+    """
+
+    def __init__(self, contexts: list[dict]):
+        self.contexts = contexts
+        self.by_citation: dict[tuple[str, int], list[int]] = {}
+        self.norm_text: list[str] = []
+        self.grams: list[set[tuple[str, ...]]] = []
+
+        for i, c in enumerate(contexts):
+            self.by_citation.setdefault((c.get("doc"), c.get("page")), []).append(i)
+            for alt in c.get("alt_citations") or []:
+                self.by_citation.setdefault((alt.get("doc"), alt.get("page")), []).append(i)
+
+            words = _words(c.get("text", ""))
+            self.norm_text.append(" ".join(words))
+            self.grams.append(_ngrams(words))
+
+    def match_quote(self, quote: str, candidates: Optional[list[int]] = None) -> tuple[float, Optional[int]]:
+        """Best (support, context position) for a quote: 1.0 for a normalized substring, else bigram overlap."""
+        words = _words(quote)
+        if not words:
+            return 0.0, None
+
+        positions = candidates if candidates else range(len(self.contexts))
+        needle = " ".join(words)
+        for i in positions:
+            if needle in self.norm_text[i]:
+                return 1.0, i
+
+        q_grams = _ngrams(words)
+        best, best_i = 0.0, None
+        for i in positions:
+            overlap = len(q_grams & self.grams[i]) / len(q_grams)
+            if overlap > best:
+                best, best_i = overlap, i
+        return best, best_i
+
+
+def _relevance(context: dict) -> float:
+    # cosine similarity to the question (retriever._to_context); keyword-fallback
+    # contexts carry hit counts in "score" and no relevance, so they count as 0
+    r = context.get("relevance")
+    return float(r) if isinstance(r, (int, float)) else 0.0
+
+
+def verify_citations(sources: list[dict], quotes: list[dict], contexts: list[dict]) -> tuple[list[dict], list[dict], dict]:
+    """
+    Keep only sources that map back to a retrieved context (by doc/page) and quotes
+    found in the contexts (exact or fuzzy). Returns (sources, quotes, report) where
+    report has support ratios and an evidence-based confidence.
+    """
+    idx = ContextIndex(contexts)
+
+    kept_sources: list[dict] = []
+    cited_positions: list[int] = []
+    for s in sources:
+        positions = idx.by_citation.get((s.get("doc"), s.get("page")))
+        if not positions:
+            continue
+        best = max(positions, key=lambda i: _relevance(contexts[i]))
+        kept_sources.append({**s, "score": contexts[best].get("score"), "relevance": _relevance(contexts[best])})
+        cited_positions.extend(positions)
+
+    kept_quotes: list[dict] = []
+    for q in quotes:
+        text = (q.get("quote") or "").strip()
+        if not text:
+            continue
+
+        candidates: list[int] = []
+        si = q.get("source_index")
+        if isinstance(si, int) and 1 <= si <= len(contexts):
+            candidates.append(si - 1)
+        candidates.extend(cited_positions)
+
+        support, _ = idx.match_quote(text, candidates)
+        if support < FUZZY_MIN:
+            # quoted from a context the model did not cite
+            support, _ = idx.match_quote(text)
+        if support >= FUZZY_MIN:
+            kept_quotes.append({**q, "support": round(support, 3)})
+
+    source_support = len(kept_sources) / len(sources) if sources else 0.0
+    quote_support = len(kept_quotes) / len(quotes) if quotes else 0.0
+    relevance = (
+        min(1.0, sum(s["relevance"] for s in kept_sources) / len(kept_sources) / SCORE_REF) if kept_sources else 0.0
+    )
+
+    evidence = 0.5 * quote_support + 0.3 * source_support + 0.2 * relevance
+    if not kept_sources:
+        evidence = 0.0
+
+    report = {
+        "sources_dropped": len(sources) - len(kept_sources),
+        "quotes_dropped": len(quotes) - len(kept_quotes),
+        "evidence": round(evidence, 3),
+        "confidence": confidence_from_evidence(evidence),
+    }
+    return kept_sources, kept_quotes, report
+
+
+def confidence_from_evidence(evidence: float) -> str:
+    if evidence >= CONF_HIGH:
+        return "high"
+    if evidence >= CONF_MEDIUM:
+        return "medium"
+    return "low"
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Iterable, Optional
+
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+MAX_HAMMING = 3  # <= 3 differing bits out of 64 ~ near-duplicate
+
+# Pigeonhole: two hashes within MAX_HAMMING bits agree exactly on at least one of
+# (MAX_HAMMING + 1) bands, so we only compare chunks that share a band value.
+_NUM_BANDS = MAX_HAMMING + 1
+_BAND_BITS = SIMHASH_BITS // _NUM_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> list[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _hash64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word shingles (order-aware, whitespace/case-insensitive)."""
+    words = _normalize(text)
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+    weights = [0] * SIMHASH_BITS
+    for sh in shingles:
+        h = _hash64(sh)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    value = 0
+    for bit, w in enumerate(weights):
+        if w > 0:
+            value |= 1 << bit
+    return value
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _find(parent: list[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_near_duplicates(texts: Iterable[str], max_hamming: int = MAX_HAMMING) -> list[int]:
+    """
+    Group near-duplicate texts.
+    Returns, for each input position, the position of its cluster representative
+    (the earliest member of the cluster).
+    """
+    hashes = [simhash(t) for t in texts]
+    parent = list(range(len(hashes)))
+
+    buckets: dict[tuple[int, int], list[int]] = {}
+    for i, h in enumerate(hashes):
+        for band in range(_NUM_BANDS):
+            key = (band, (h >> (band * _BAND_BITS)) & _BAND_MASK)
+            for j in buckets.get(key, []):
+                if _hamming(h, hashes[j]) <= max_hamming:
+                    ri, rj = _find(parent, i), _find(parent, j)
+                    if ri != rj:
+                        # keep the earliest chunk as representative
+                        parent[max(ri, rj)] = min(ri, rj)
+            buckets.setdefault(key, []).append(i)
+
+    return [_find(parent, i) for i in range(len(hashes))]
+
+
+def dedupe_records(records: list[dict], max_hamming: int = MAX_HAMMING) -> tuple[list[int], dict]:
+    """
+    Near-duplicate removal for chunk records (dicts with doc/page/chunk_id/text).
+
+    - keeps one representative per cluster (the first one seen)
+    - the representative gets "alt_citations": other (doc, page, chunk_id) in its cluster
+    - returns (kept positions, report)
+    """
+    reps = cluster_near_duplicates((r.get("text", "") for r in records), max_hamming=max_hamming)
+
+    alts: dict[int, list[dict]] = {}
+    for i, rep in enumerate(reps):
+        if rep == i:
+            continue
+        r = records[i]
+        alts.setdefault(rep, []).append({"doc": r["doc"], "page": r["page"], "chunk_id": r["chunk_id"]})
+
+    kept = [i for i, rep in enumerate(reps) if rep == i]
+    for i in kept:
+        if i in alts:
+            records[i]["alt_citations"] = alts[i]
+
+    removed = len(records) - len(kept)
+    report = {
+        "chunks_in": len(records),
+        "chunks_kept": len(kept),
+        "chunks_removed": removed,
+        "clusters": len(alts),
+        "text_bytes_saved": sum(
+            len(records[i].get("text", "").encode("utf-8")) for i, rep in enumerate(reps) if rep != i
+        ),
+    }
+    return kept, report
+
+
+class NearDuplicateFilter:
+    """
+    Incremental variant for streaming ingestion: only the 64-bit hashes of kept
+    chunks are held (no text), and new chunks are matched against those.
+    """
+
+    def __init__(self, max_hamming: int = MAX_HAMMING):
+        self.max_hamming = max_hamming
+        self._hashes: list[int] = []
+        self._buckets: dict[tuple[int, int], list[int]] = {}
+
+    def add(self, text: str) -> Optional[int]:
+        """Return the kept position this text duplicates, or register it and return None."""
+        h = simhash(text)
+        keys = [(band, (h >> (band * _BAND_BITS)) & _BAND_MASK) for band in range(_NUM_BANDS)]
+
+        for key in keys:
+            for j in self._buckets.get(key, []):
+                if _hamming(h, self._hashes[j]) <= self.max_hamming:
+                    return j
+
+        pos = len(self._hashes)
+        self._hashes.append(h)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(pos)
+        return None
@@ -1,35 +1,47 @@
 import json
 from pathlib import Path
-from rag.openai_client import embed_text
+from rag.embeddings import embed_texts, get_provider
+from rag.openai_client import offline_build
 
 CHUNKS_PATH = Path("storage/chunks.jsonl")
 OUT_PATH = Path("storage/embeddings.jsonl")
 
+EMBED_BATCH = 256   # chunks per embedding call (as in rag/hierarchy.py)
 
-def embed_all_chunks():
+
+@offline_build()
+def embed_all_chunks(batch_size: int = EMBED_BATCH):
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+    model_id = get_provider().model_id
     count = 0
-    with CHUNKS_PATH.open("r", encoding="utf-8") as fin, OUT_PATH.open("w", encoding="utf-8") as fout:
-        for line in fin:
-            record = json.loads(line)
-
-            text = record["text"]
-            vector = embed_text(text)
-
+    batch: list[dict] = []
+
+    def _flush(fout) -> None:
+        nonlocal count
+        if not batch:
+            return
+        vectors = embed_texts([record["text"] for record in batch])
+        for record, vector in zip(batch, vectors):
             out_record = {
                 "doc": record["doc"],
                 "page": record["page"],
                 "chunk_id": record["chunk_id"],
                 "text": record["text"],
                 "embedding": vector,
+                "embedding_model": model_id,
             }
-
             fout.write(json.dumps(out_record, ensure_ascii=False) + "\n")
+        count += len(batch)
+        batch.clear()
+        print(f"Embedded {count} chunks...")
 
-            count += 1
-            if count % 50 == 0:
-                print(f"Embedded {count} chunks...")
+    with CHUNKS_PATH.open("r", encoding="utf-8") as fin, OUT_PATH.open("w", encoding="utf-8") as fout:
+        for line in fin:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                _flush(fout)
+        _flush(fout)
 
     print(f"\n Done! Embedded {count} chunks → {OUT_PATH}")
 
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from rag.settings import env
+
+# openai (default) | local
+PROVIDER_ENV = "RAG_EMBEDDING_PROVIDER"
+LOCAL_MODEL_ENV = "RAG_LOCAL_EMBEDDING_MODEL"
+LOCAL_THREADS_ENV = "RAG_EMBEDDING_THREADS"
+
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_BATCH_SIZE = 32
+
+
+class EmbeddingProvider(ABC):
+    """Turns texts into vectors. `model_id` is recorded in the index info and checked at load."""
+
+    model_id: str = ""
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    def __init__(self):
+        from rag.openai_client import EMBEDDING_MODEL
+
+        self.model_id = f"openai:{EMBEDDING_MODEL}"
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        from rag.openai_client import embed_texts
+
+        return embed_texts(texts)
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    CPU-only sentence-transformers model (optional dependency), batched, with a
+    fixed thread count so it does not compete with the web workers.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, threads: Optional[int] = None, batch_size: int = LOCAL_BATCH_SIZE):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                f"{PROVIDER_ENV}=local needs sentence-transformers (pip install sentence-transformers)."
+            ) from e
+
+        model_name = model_name or env(LOCAL_MODEL_ENV) or DEFAULT_LOCAL_MODEL
+        threads = threads or int(env(LOCAL_THREADS_ENV) or 0)
+        if threads > 0:
+            torch.set_num_threads(threads)
+
+        self.model_id = f"local:{model_name}"
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        with self._lock:
+            vectors = self._model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        return vectors.tolist()
+
+
+_provider: Optional[EmbeddingProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> EmbeddingProvider:
+    """Process-wide provider selected by RAG_EMBEDDING_PROVIDER (created once)."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            name = (env(PROVIDER_ENV) or "openai").strip().lower()
+            if name == "openai":
+                _provider = OpenAIEmbeddingProvider()
+            elif name == "local":
+                _provider = LocalEmbeddingProvider()
+            else:
+                raise RuntimeError(f"Unknown {PROVIDER_ENV}: {name!r} (use openai or local)")
+        return _provider
+
+
+def active_model_id() -> str:
+    """Model id of the configured provider, without loading a local model."""
+    if _provider is not None:
+        return _provider.model_id
+    name = (env(PROVIDER_ENV) or "openai").strip().lower()
+    if name == "local":
+        return f"local:{env(LOCAL_MODEL_ENV) or DEFAULT_LOCAL_MODEL}"
+    from rag.openai_client import EMBEDDING_MODEL
+
+    return f"openai:{EMBEDDING_MODEL}"
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    return get_provider().embed(texts)
+
+
+def embed_text(text: str) -> list[float]:
+    return get_provider().embed([text])[0]
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
+
+import numpy as np
+
+from rag.index_store import EXPANSION_INDEX_PATH, EXPANSION_TERMS_PATH, flat_vectors, load_index, write_index_info
+
+if TYPE_CHECKING:
+    import faiss
+
+# Corpus terms kept in the table: in at least MIN_TERM_DF chunks and at most
+# MAX_TERM_DF_FRACTION of them (rarer terms are noise, commoner ones say nothing).
+# MAX_TERMS bounds the table: 4000 x 1536 float32 ~ 25 MB.
+MIN_TERM_DF = 5
+MAX_TERM_DF_FRACTION = 0.2
+MAX_TERMS = 4000
+
+# A query is expanded with at most this many of its table terms (highest idf first)
+MAX_QUERY_TERMS = 8
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9]*(?:-[a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    """
+    a about above after again against all also am an and any are as at be because been before being below
+    between both but by can could did do does doing down during each few for from further had has have
+    having he her here hers him his how however i if in into is it its itself just may me might more most
+    must my no nor not now of off on once only or other our ours out over own per same she should so some
+    such than that the their theirs them then there these they this those through thus to too under until
+    up upon use used using very was we were what when where whether which while who whom why will with
+    within without would yet you your previous question questions
+    """.split()
+)
+
+
+def query_terms(text: str) -> set[str]:
+    """Lowercase content words (3+ chars) and bigrams of adjacent content words."""
+    words = _WORD_RE.findall((text or "").lower())
+    terms: set[str] = set()
+    prev: Optional[str] = None
+    for w in words:
+        if w in _STOPWORDS or len(w) < 3:
+            prev = None
+            continue
+        terms.add(w)
+        if prev is not None:
+            terms.add(f"{prev} {w}")
+        prev = w
+    return terms
+
+
+class TermPostings:
+    """term -> chunk rows, collected while chunks are indexed (row = position in the index)."""
+
+    def __init__(self) -> None:
+        self.postings: dict[str, list[int]] = {}
+        self.rows = 0
+
+    def add(self, texts: Iterable[str]) -> None:
+        for text in texts:
+            for term in query_terms(text):
+                self.postings.setdefault(term, []).append(self.rows)
+            self.rows += 1
+
+
+class ExpansionTable:
+    """
+    Corpus-derived query expansion: every kept term maps to the normalized centroid
+    of the chunks containing it. A query's vector is pulled towards the idf-weighted
+    centroids of its terms, so no expansion text is ever embedded.
+    """
+
+    def __init__(self, index: faiss.Index, terms: list[str], idf: Sequence[float]):
+        self.index = index
+        self.vectors = flat_vectors(index)
+        if self.vectors is None:
+            self.vectors = index.reconstruct_n(0, index.ntotal)
+        self.rows = {t: i for i, t in enumerate(terms)}
+        self.idf = np.asarray(idf, dtype="float32")
+
+    def matched_terms(self, query: str) -> list[str]:
+        """Table terms in the query, most specific (highest idf) first."""
+        found = [t for t in query_terms(query) if t in self.rows]
+        found.sort(key=lambda t: (-self.idf[self.rows[t]], t))
+        return found[:MAX_QUERY_TERMS]
+
+    def expand(self, query: str) -> Optional[np.ndarray]:
+        """Normalized expansion vector for a query, or None if no term is in the table."""
+        rows = [self.rows[t] for t in self.matched_terms(query)]
+        if not rows:
+            return None
+        v = self.idf[rows] @ self.vectors[rows]
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else None
+
+
+def term_centroids(
+    X: np.ndarray,
+    postings: dict[str, list[int]],
+    n_rows: int,
+) -> tuple[np.ndarray, list[str], np.ndarray]:
+    """Select table terms by document frequency -> (normalized centroids, terms, idf)."""
+    import faiss
+
+    max_df = max(MIN_TERM_DF, int(MAX_TERM_DF_FRACTION * n_rows))
+    kept = [(t, rows) for t, rows in postings.items() if MIN_TERM_DF <= len(rows) <= max_df]
+    # most frequent first: they carry the most evidence per centroid
+    kept.sort(key=lambda tr: (-len(tr[1]), tr[0]))
+    kept = kept[:MAX_TERMS]
+    if not kept:
+        return np.empty((0, X.shape[1]), dtype="float32"), [], np.empty(0, dtype="float32")
+
+    C = np.ascontiguousarray(np.vstack([X[rows].mean(axis=0) for _, rows in kept]), dtype="float32")
+    faiss.normalize_L2(C)
+    idf = np.array([math.log(n_rows / len(rows)) for _, rows in kept], dtype="float32")
+    return C, [t for t, _ in kept], idf
+
+
+def build_expansion_table(
+    X: np.ndarray,
+    postings: TermPostings,
+    model_id: Optional[str] = None,
+    index_path: Path = EXPANSION_INDEX_PATH,
+    terms_path: Path = EXPANSION_TERMS_PATH,
+) -> None:
+    """Write the term -> centroid expansion table for chunk vectors X (rows as in `postings`)."""
+    import faiss
+
+    C, terms, idf = term_centroids(X, postings.postings, postings.rows)
+    if not terms:
+        print("Expansion table: no terms within the document-frequency bounds; not written.")
+        return
+
+    index = faiss.IndexFlatIP(C.shape[1])
+    index.add(C)
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(index_path))
+    write_index_info(index_path, index.d, model_id)
+    terms_path.write_text(
+        json.dumps({"terms": terms, "idf": [round(float(x), 4) for x in idf]}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+
+    print(f"Expansion table saved: {index_path} ({len(terms)} terms)")
+
+
+def load_expansion_table(
+    index_path: Path = EXPANSION_INDEX_PATH,
+    terms_path: Path = EXPANSION_TERMS_PATH,
+) -> Optional[ExpansionTable]:
+    """Return the expansion table, or None if it was not built."""
+    if not index_path.exists() or not terms_path.exists():
+        return None
+    data = json.loads(terms_path.read_text(encoding="utf-8"))
+    return ExpansionTable(load_index(index_path), data["terms"], data["idf"])
+
+
+# Loaded once per process on first use (like the hint vectors in rag/retriever.py)
+_table: Optional[ExpansionTable] = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def expansion_table() -> Optional[ExpansionTable]:
+    """The process-wide expansion table from storage (None if not built or stale)."""
+    global _table, _table_loaded
+    if not _table_loaded:
+        with _table_lock:
+            if not _table_loaded:
+                try:
+                    _table = load_expansion_table()
+                except RuntimeError as e:
+                    # built with another embedding model: retrieve without expansion
+                    print(f"Expansion table ignored: {e}")
+                    _table = None
+                _table_loaded = True
+    return _table
+
+
+def reset_expansion_table() -> None:
+    """Reload the table on next use (after a rebuild or provider switch)."""
+    global _table, _table_loaded
+    with _table_lock:
+        _table, _table_loaded = None, False
+
+
+def build_from_storage() -> None:
+    """Build the table for an existing index without re-embedding anything."""
+    from rag.index_store import INDEX_PATH, load_metadata, read_index_info
+
+    index = load_index()
+    X = flat_vectors(index)
+    if X is None:
+        X = index.reconstruct_n(0, index.ntotal)
+    postings = TermPostings()
+    postings.add(m.get("text", "") for m in load_metadata())
+    build_expansion_table(X, postings, read_index_info(INDEX_PATH).get("embedding_model"))
+
+
+if __name__ == "__main__":
+    # python -m rag.expansion            -> build the table from storage/index.faiss + metadata
+    # python -m rag.expansion "question" -> show which table terms would expand it
+    if len(sys.argv) > 1:
+        table = load_expansion_table()
+        if table is None:
+            print("No expansion table; run `python -m rag.expansion` first.")
+        else:
+            for term in table.matched_terms(" ".join(sys.argv[1:])):
+                print(f"  {term:<40} idf={table.idf[table.rows[term]]:.2f}")
+    else:
+        build_from_storage()
@@ -1,24 +1,45 @@
 import json
+import sys
 from pathlib import Path
+from typing import Optional
+
 import numpy as np
 import faiss
 
+from rag.dedup import dedupe_records
+from rag.expansion import TermPostings, build_expansion_table
+from rag.hierarchy import build_child_index
+from rag.index_store import (
+    CHILD_INDEX_PATH,
+    CHILD_PARENT_PATH,
+    DOC_INDEX_DOCS_PATH,
+    DOC_INDEX_PATH,
+    EXPANSION_INDEX_PATH,
+    EXPANSION_TERMS_PATH,
+    write_index_info,
+)
+from rag.intent import telemed_signal
 from rag.metadata import infer_metadata
+from rag.routing import build_doc_index
+from rag.shards import write_collection
 
 EMB_PATH = Path("storage/embeddings.jsonl")
 INDEX_PATH = Path("storage/index.faiss")
 META_PATH = Path("storage/index_meta.jsonl")
 
 
-def build_faiss_index():
+def _load_embeddings(dedupe: bool = True) -> tuple[np.ndarray, list[dict], Optional[dict], Optional[str]]:
+    """Read storage/embeddings.jsonl → (normalized vectors, metadata, dedup report, embedding model id)."""
     vectors = []
     meta = []
+    model_id = None
 
     with EMB_PATH.open("r", encoding="utf-8") as f:
         for line in f:
             r = json.loads(line)
 
             vectors.append(r["embedding"])
+            model_id = model_id or r.get("embedding_model")
 
             extra = infer_metadata(r["doc"])
             meta.append({
@@ -27,11 +48,34 @@ def build_faiss_index():
                 "chunk_id": r["chunk_id"],
                 "text": r["text"],
                 **extra,   
+                "telemed_signal": telemed_signal(r["doc"], extra["topics"], r["text"]),
             })
 
-    X = np.array(vectors, dtype="float32")
+    report = None
+    if dedupe:
+        kept, report = dedupe_records(meta)
+        vectors = [vectors[i] for i in kept]
+        meta = [meta[i] for i in kept]
 
+    X = np.array(vectors, dtype="float32")
     faiss.normalize_L2(X)
+    return X, meta, report, model_id
+
+
+def _print_dedup_report(report: Optional[dict], dim: int) -> None:
+    if report is None:
+        return
+    saved_vec_bytes = report["chunks_removed"] * dim * 4
+    print(
+        f"Dedup: removed {report['chunks_removed']}/{report['chunks_in']} near-duplicate chunks "
+        f"in {report['clusters']} clusters "
+        f"(saved ~{saved_vec_bytes / 1024:.1f} KiB vectors, "
+        f"{report['text_bytes_saved'] / 1024:.1f} KiB text)"
+    )
+
+
+def build_faiss_index(dedupe: bool = True, hierarchy: bool = True):
+    X, meta, report, model_id = _load_embeddings(dedupe)
     dim = X.shape[1]
 
     index = faiss.IndexFlatIP(dim)
@@ -39,6 +83,7 @@ def build_faiss_index():
 
     INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
     faiss.write_index(index, str(INDEX_PATH))
+    write_index_info(INDEX_PATH, dim, model_id)
 
     with META_PATH.open("w", encoding="utf-8") as f:
         for m in meta:
@@ -47,7 +92,62 @@ def build_faiss_index():
     print(f"FAISS index saved: {INDEX_PATH}")
     print(f"Metadata saved: {META_PATH}")
     print(f"Vectors indexed: {index.ntotal} (dim={dim})")
+    _print_dedup_report(report, dim)
+
+    # coarse stage for two-stage retrieval: a few centroid vectors per document
+    build_doc_index(
+        X,
+        [m["doc"] for m in meta],
+        model_id,
+        index_path=INDEX_PATH.with_name(DOC_INDEX_PATH.name),
+        docs_path=INDEX_PATH.with_name(DOC_INDEX_DOCS_PATH.name),
+    )
+
+    # corpus-derived query expansion: term -> centroid of the chunks using it
+    postings = TermPostings()
+    postings.add(m["text"] for m in meta)
+    build_expansion_table(
+        X,
+        postings,
+        model_id,
+        index_path=INDEX_PATH.with_name(EXPANSION_INDEX_PATH.name),
+        terms_path=INDEX_PATH.with_name(EXPANSION_TERMS_PATH.name),
+    )
+
+    # small-to-big child index, rebuilt with its parents so its rows always match
+    if hierarchy:
+        build_child_index(
+            META_PATH,
+            index_path=INDEX_PATH.with_name(CHILD_INDEX_PATH.name),
+            parent_path=INDEX_PATH.with_name(CHILD_PARENT_PATH.name),
+            parent_index_path=INDEX_PATH,
+            model_id=model_id,
+        )
+
+
+def build_collections(by: str = "category", only: Optional[list[str]] = None, dedupe: bool = True):
+    """
+    Build one collection shard per value of a metadata field (default: category)
+    under storage/collections/<value>/. `only` rebuilds just the named collections.
+    """
+    X, meta, report, model_id = _load_embeddings(dedupe)
+
+    groups: dict[str, list[int]] = {}
+    for i, m in enumerate(meta):
+        groups.setdefault(str(m.get(by) or "general"), []).append(i)
+
+    for name, rows in sorted(groups.items()):
+        if only and name not in only:
+            continue
+        write_collection(name, X[rows], [meta[i] for i in rows], model_id)
+
+    _print_dedup_report(report, X.shape[1])
 
 
 if __name__ == "__main__":
-    build_faiss_index()
+    # python -m rag.faiss_index                     -> single index
+    # python -m rag.faiss_index collections [names] -> per-category shards
+    if len(sys.argv) > 1 and sys.argv[1] == "collections":
+        build_collections(only=sys.argv[2:] or None)
+    else:
+        build_faiss_index()
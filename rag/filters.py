@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+import numpy as np
+
+_CACHE_MAX = 8
+
+
+class MetaColumns:
+    """
+    Columnar view of chunk metadata for vectorized filtering:
+    - doc / category as int codes into sorted vocabularies
+    - year as int32 (-1 = unknown; falls back to the "YYYY_" filename prefix)
+    - topics as a boolean (n_chunks, n_topics) bitset matrix
+    """
+
+    def __init__(self, meta: list[dict]):
+        n = len(meta)
+
+        self.docs = sorted({m.get("doc") or "" for m in meta})
+        self.categories = sorted({m.get("category") or "" for m in meta})
+        self.topics = sorted({t for m in meta for t in (m.get("topics") or [])})
+
+        doc_pos = {d: i for i, d in enumerate(self.docs)}
+        cat_pos = {c: i for i, c in enumerate(self.categories)}
+        topic_pos = {t: i for i, t in enumerate(self.topics)}
+
+        self.doc = np.empty(n, dtype="int32")
+        self.category = np.empty(n, dtype="int32")
+        self.year = np.empty(n, dtype="int32")
+        self.topic_bits = np.zeros((n, max(len(self.topics), 1)), dtype=bool)
+
+        for i, m in enumerate(meta):
+            doc = m.get("doc") or ""
+            self.doc[i] = doc_pos[doc]
+            self.category[i] = cat_pos[m.get("category") or ""]
+
+            y = m.get("year")
+            if y is None and doc[:4].isdigit() and doc[4:5] == "_":
+                y = doc[:4]
+            self.year[i] = int(y) if y is not None else -1
+
+            for t in m.get("topics") or []:
+                self.topic_bits[i, topic_pos[t]] = True
+
+        self._doc_pos = doc_pos
+        self._cat_pos = cat_pos
+        self._topic_pos = topic_pos
+        self.size = n
+
+    @property
+    def years(self) -> list[int]:
+        return sorted(int(y) for y in np.unique(self.year) if y >= 0)
+
+    def mask(
+        self,
+        doc_filter: Optional[list[str]] = None,
+        year_filter: Optional[int] = None,
+        category_filter: Optional[str] = None,
+        topic_filter: Optional[list[str]] = None,
+    ) -> Optional[np.ndarray]:
+        """Boolean row mask for the filter spec, or None when no filter is set."""
+        if not (doc_filter or year_filter or category_filter or topic_filter):
+            return None
+
+        mask = np.ones(self.size, dtype=bool)
+
+        if doc_filter:
+            codes = [self._doc_pos[d] for d in doc_filter if d in self._doc_pos]
+            mask &= np.isin(self.doc, codes)
+
+        if year_filter:
+            mask &= self.year == int(year_filter)
+
+        if category_filter:
+            code = self._cat_pos.get(category_filter)
+            if code is None:
+                return np.zeros(self.size, dtype=bool)
+            mask &= self.category == code
+
+        if topic_filter:
+            cols = [self._topic_pos[t] for t in topic_filter if t in self._topic_pos]
+            if not cols:
+                return np.zeros(self.size, dtype=bool)
+            # "ANY overlap" semantics
+            mask &= self.topic_bits[:, cols].any(axis=1)
+
+        return mask
+
+
+_cache: dict[int, tuple[list[dict], MetaColumns]] = {}
+_cache_lock = threading.Lock()
+
+
+def columns_for(meta: list[dict]) -> MetaColumns:
+    """Columns for a metadata list, built once per list object and reused."""
+    key = id(meta)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] is meta and hit[1].size == len(meta):
+            return hit[1]
+
+    cols = MetaColumns(meta)
+
+    with _cache_lock:
+        if len(_cache) >= _CACHE_MAX:
+            _cache.pop(next(iter(_cache)))
+        # keep a reference to meta so its id() cannot be reused while cached
+        _cache[key] = (meta, cols)
+    return cols
+
+
+def filter_mask(
+    meta: list[dict],
+    doc_filter: Optional[list[str]] = None,
+    year_filter: Optional[int] = None,
+    category_filter: Optional[str] = None,
+    topic_filter: Optional[list[str]] = None,
+) -> Optional[np.ndarray]:
+    return columns_for(meta).mask(doc_filter, year_filter, category_filter, topic_filter)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Callable, Optional
+
+import faiss
+import numpy as np
+
+from rag.embeddings import embed_texts
+from rag.openai_client import offline_build
+from rag.index_store import (
+    CHILD_INDEX_PATH,
+    CHILD_PARENT_PATH,
+    INDEX_PATH,
+    META_PATH,
+    content_version,
+    load_metadata,
+    write_index_info,
+)
+
+CHILD_MAX_CHARS = 300
+CHILD_MIN_CHARS = 40
+CHILD_EMBED_BATCH = 256   # child texts per embedding call, across parent chunks
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_children(text: str, max_chars: int = CHILD_MAX_CHARS) -> list[str]:
+    """
+    Split a parent chunk into small sentence-level children.
+    Consecutive short sentences are packed together up to max_chars;
+    fragments shorter than CHILD_MIN_CHARS are merged into their neighbour.
+    """
+    sentences = [s.strip() for s in _SENTENCE_END_RE.split(text or "") if s.strip()]
+
+    children: list[str] = []
+    buf = ""
+    for s in sentences:
+        if buf and len(buf) + 1 + len(s) > max_chars:
+            children.append(buf)
+            buf = s
+        else:
+            buf = f"{buf} {s}".strip()
+    if buf:
+        if children and len(buf) < CHILD_MIN_CHARS:
+            children[-1] = f"{children[-1]} {buf}"
+        else:
+            children.append(buf)
+
+    return children
+
+
+@offline_build()
+def build_child_index(
+    meta_path: Path = META_PATH,
+    index_path: Path = CHILD_INDEX_PATH,
+    parent_path: Path = CHILD_PARENT_PATH,
+    parent_index_path: Path = INDEX_PATH,
+    model_id: Optional[str] = None,
+    embed_fn: Optional[Callable[[list[str]], list[list[float]]]] = None,
+    batch_size: int = CHILD_EMBED_BATCH,
+) -> None:
+    """
+    Build the small-to-big hierarchy on top of the parent index:
+    - one vector per child (sentence group) in storage/child_index.faiss
+    - child -> parent row mapping as a compact int32 array in storage/child_parent.npy
+    Parent rows are positions in index_meta.jsonl (same order as index.faiss).
+    Children of many parents are embedded together, batch_size texts per call.
+    The info file records the parent index version, so a stale hierarchy is
+    ignored at load (index_store.load_child_index).
+    """
+    embed_fn = embed_fn or embed_texts
+    meta = load_metadata(meta_path)
+
+    index: Optional[faiss.Index] = None
+    parents: list[int] = []
+    batch: list[str] = []
+
+    def _flush() -> None:
+        nonlocal index
+        if not batch:
+            return
+        X = np.array(embed_fn(batch), dtype="float32")
+        faiss.normalize_L2(X)
+        if index is None:
+            index = faiss.IndexFlatIP(X.shape[1])
+        index.add(X)
+        batch.clear()
+
+    for row, item in enumerate(meta):
+        children = split_children(item.get("text", ""))
+        batch.extend(children)
+        parents.extend([row] * len(children))
+        if len(batch) >= batch_size:
+            _flush()
+            print(f"Embedded children for {row + 1}/{len(meta)} parent chunks...")
+    _flush()
+
+    if index is None:
+        print("No child passages; child index not written.")
+        return
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(index_path))
+    np.save(parent_path, np.array(parents, dtype="int32"))
+    write_index_info(
+        index_path,
+        index.d,
+        model_id,
+        parent_version=content_version(parent_index_path, meta_path),
+        parent_ntotal=len(meta),
+    )
+
+    print(f"Child index saved: {index_path} ({index.ntotal} children)")
+    print(f"Child->parent map saved: {parent_path}")
+
+
+if __name__ == "__main__":
+    build_child_index()
@@ -1,6 +1,17 @@
+from __future__ import annotations
+
+import hashlib
 import json
 from pathlib import Path
-import faiss
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from rag.embeddings import active_model_id
+from rag.intent import telemed_signal
+
+if TYPE_CHECKING:
+    import faiss
 
 # repo root = .../rag-chatbot
 ROOT = Path(__file__).resolve().parents[1]
@@ -9,6 +20,21 @@ STORAGE = ROOT / "storage"
 INDEX_PATH = STORAGE / "index.faiss"
 META_PATH = STORAGE / "index_meta.jsonl"
 
+# Optional small-to-big hierarchy (built by rag/hierarchy.py)
+CHILD_INDEX_PATH = STORAGE / "child_index.faiss"
+CHILD_PARENT_PATH = STORAGE / "child_parent.npy"
+
+# Optional document-level routing index (built with the main index, see rag/routing.py)
+DOC_INDEX_PATH = STORAGE / "doc_index.faiss"
+DOC_INDEX_DOCS_PATH = STORAGE / "doc_index_docs.json"
+
+# Optional term -> centroid query expansion table (built with the main index, see rag/expansion.py)
+EXPANSION_INDEX_PATH = STORAGE / "expansion_terms.faiss"
+EXPANSION_TERMS_PATH = STORAGE / "expansion_terms.json"
+
+# Optional named collections, one shard per directory (see rag/shards.py)
+COLLECTIONS_DIR = STORAGE / "collections"
+
 
 def load_metadata(path: Path = META_PATH) -> list[dict]:
     if not path.exists():
@@ -23,15 +49,132 @@ def load_metadata(path: Path = META_PATH) -> list[dict]:
             line = line.strip()
             if not line:
                 continue
-            meta.append(json.loads(line))
+            item = json.loads(line)
+            # backfill fields derived at build time for indexes built before they existed
+            if "telemed_signal" not in item:
+                item["telemed_signal"] = telemed_signal(item.get("doc", ""), item.get("topics", []), item.get("text", ""))
+            meta.append(item)
     return meta
 
 
+# Indexes built before model info was recorded used this model
+LEGACY_EMBEDDING_MODEL = "openai:text-embedding-3-small"
+
+
+def info_path(index_path: Path) -> Path:
+    """storage/index.faiss -> storage/index_info.json (same for shards / child index)."""
+    return index_path.with_name(f"{index_path.stem}_info.json")
+
+
+def write_index_info(index_path: Path, dim: int, model_id: Optional[str] = None, **extra) -> None:
+    """Record which embedding model built an index (checked by load_index), plus any `extra` fields."""
+    info = {"embedding_model": model_id or active_model_id(), "dim": int(dim), **extra}
+    info_path(index_path).write_text(json.dumps(info, indent=2), encoding="utf-8")
+
+
+def read_index_info(index_path: Path) -> dict:
+    p = info_path(index_path)
+    if not p.exists():
+        return {"embedding_model": LEGACY_EMBEDDING_MODEL}
+    return json.loads(p.read_text(encoding="utf-8"))
+
+
 def load_index(path: Path = INDEX_PATH) -> faiss.Index:
     if not path.exists():
         raise FileNotFoundError(
             f"Missing FAISS index file: {path}. "
             "Make sure storage/index.faiss is committed to GitHub."
         )
+
+    built_with = read_index_info(path).get("embedding_model")
+    active = active_model_id()
+    if built_with != active:
+        raise RuntimeError(
+            f"{path.name} was built with embedding model {built_with!r}, but the active model is {active!r}. "
+            "Rebuild the index or switch RAG_EMBEDDING_PROVIDER back."
+        )
+
+    import faiss
+
     return faiss.read_index(str(path))
 
+
+def flat_vectors(index: faiss.Index) -> Optional[np.ndarray]:
+    """Zero-copy (ntotal, d) view of a flat index's vectors; None for other index types."""
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if not isinstance(index, faiss.IndexFlat) or index.ntotal == 0:
+        return None
+    return faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d).reshape(index.ntotal, index.d)
+
+
+def load_child_index(
+    index_path: Path = CHILD_INDEX_PATH,
+    parent_path: Path = CHILD_PARENT_PATH,
+    parent_index_path: Path = INDEX_PATH,
+    meta_path: Path = META_PATH,
+) -> Optional[tuple[faiss.Index, np.ndarray]]:
+    """
+    Return (child index, child->parent rows), or None if the hierarchy was not built
+    or was built for another parent index (its rows would point at the wrong parents).
+    """
+    if not index_path.exists() or not parent_path.exists():
+        return None
+
+    info = read_index_info(index_path)
+    if info.get("parent_version") != content_version(parent_index_path, meta_path):
+        print(f"Child index ignored: {index_path.name} was built for another {parent_index_path.name}; rebuild the index.")
+        return None
+
+    index, child_parent = load_index(index_path), np.load(parent_path)
+    if len(child_parent) != index.ntotal or (len(child_parent) and int(child_parent.max()) >= info.get("parent_ntotal", 0)):
+        print(f"Child index ignored: {parent_path.name} does not match {index_path.name}; rebuild the index.")
+        return None
+    return index, child_parent
+
+
+# path -> ((size, mtime_ns), sha256): files are re-hashed only when they change
+_digests: dict[Path, tuple[tuple[int, int], str]] = {}
+_HASH_BLOCK = 1 << 20
+
+
+def _file_digest(path: Path) -> str:
+    st = path.stat()
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _digests.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            h.update(block)
+    _digests[path] = (stamp, h.hexdigest())
+    return h.hexdigest()
+
+
+def content_version(*paths: Path) -> str:
+    """Short sha256 over the names and contents of `paths` (missing files included as such)."""
+    h = hashlib.sha256()
+    for p in paths:
+        h.update(f"{p.name}:{_file_digest(p) if p.exists() else 'missing'}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def index_version(index_path: Path = INDEX_PATH, meta_path: Path = META_PATH) -> str:
+    """
+    Content fingerprint of everything answers are retrieved from: the index and
+    metadata, the child hierarchy and the collection shards next to them.
+    Identical rebuilds and other checkouts get the same version; used to key
+    derived caches (response cache, cassette).
+    """
+    storage = index_path.parent
+    collections = storage / COLLECTIONS_DIR.name
+    return content_version(
+        index_path,
+        meta_path,
+        storage / CHILD_INDEX_PATH.name,
+        storage / CHILD_PARENT_PATH.name,
+        *sorted(collections.glob("*/index.faiss")),
+        *sorted(collections.glob("*/index_meta.jsonl")),
+    )
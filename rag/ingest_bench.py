@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Corpus sizes in pages; each run doubles as a scaling data point
+DEFAULT_SIZES = (100, 300, 900)
+PAGES_PER_DOC = 20
+PAGE_CHARS = 3000
+DUPLICATE_PAGE_FRACTION = 0.05   # repeated pages, so dedup has work to do
+STUB_DIM = 1536                  # same width as text-embedding-3-small
+
+# Build path stages, each measured in its own interpreter
+LEGACY_STAGES = ("chunks", "embed", "index")    # chunks.py -> embed_chunks.py -> faiss_index.py
+STREAMING_STAGES = ("streaming",)               # pipeline.ingest_streaming
+STAGES = LEGACY_STAGES + STREAMING_STAGES
+
+# Growth exponent (time or memory ~ corpus^k) above which a stage is flagged
+SUPERLINEAR = 1.15
+
+_VOCAB = (
+    "patient care primary health system telemedicine interoperability data quality access cost outcome "
+    "provider payment incentive performance measure hospital clinic record electronic information "
+    "barrier adoption implementation policy workforce training infrastructure network standard "
+    "authorization delay burden evidence review study results analysis rural urban service delivery"
+).split()
+
+# One build stage with a stub embedder (deterministic per text, no network);
+# the page cache and every output live under the corpus directory (cwd).
+_CHILD = r"""
+import contextlib, json, os, resource, sys, time, zlib
+from pathlib import Path
+
+import numpy as np
+
+stage, dim = json.loads(sys.argv[1])
+root = Path.cwd()
+
+def stub_vectors(texts):
+    out = np.empty((len(texts), dim), dtype="float32")
+    for i, text in enumerate(texts):
+        out[i] = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(dim, dtype="float32")
+    return out.tolist()
+
+class StubProvider:
+    model_id = f"stub:hash-{dim}"
+
+import rag.chunks, rag.embed_chunks, rag.faiss_index, rag.hierarchy, rag.page_cache, rag.pipeline
+
+# the streaming build gets its own cache, so it extracts cold like the chunks stage
+cache_name = "stream_page_cache.sqlite3" if stage == "streaming" else "page_cache.sqlite3"
+rag.page_cache._cache = rag.page_cache.PageCache(root / "storage" / cache_name)
+rag.embed_chunks.embed_text = lambda text: stub_vectors([text])[0]
+rag.embed_chunks.get_provider = StubProvider
+rag.hierarchy.embed_texts = stub_vectors
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+baseline = peak_mb()
+t = time.perf_counter()
+with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+    if stage == "chunks":
+        rag.chunks.write_chunks_jsonl()
+    elif stage == "embed":
+        rag.embed_chunks.embed_all_chunks()
+    elif stage == "index":
+        rag.faiss_index.build_faiss_index()
+    elif stage == "streaming":
+        rag.pipeline.ingest_streaming(
+            root / "data" / "docs",
+            root / "storage" / "stream_index.faiss",
+            root / "storage" / "stream_meta.jsonl",
+            embed_fn=stub_vectors,
+        )
+seconds = time.perf_counter() - t
+
+print(json.dumps({"seconds": seconds, "baseline_mb": baseline, "peak_mb": peak_mb()}))
+"""
+
+# stage -> file whose line count is the number of chunks it produced, files it wrote
+_STAGE_OUTPUTS = {
+    "chunks": ("chunks.jsonl", ("chunks.jsonl",)),
+    "embed": ("embeddings.jsonl", ("embeddings.jsonl",)),
+    "index": ("index_meta.jsonl", ("index.faiss", "index_meta.jsonl")),
+    "streaming": ("stream_meta.jsonl", ("stream_index.faiss", "stream_meta.jsonl")),
+}
+
+
+@dataclass
+class StageResult:
+    stage: str
+    pages: int
+    chunks: int
+    seconds: float
+    peak_rss_mb: float
+    rss_growth_mb: float    # peak during the stage minus the peak after imports
+    output_mb: float
+
+    @property
+    def pages_per_s(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+
+def _page_text(rng: random.Random, chars: int) -> str:
+    sentences: list[str] = []
+    size = 0
+    while size < chars:
+        words = rng.choices(_VOCAB, k=rng.randint(8, 20)) + [f"term{rng.randint(0, 5000)}"]
+        rng.shuffle(words)
+        sentence = " ".join(words).capitalize() + "."
+        sentences.append(sentence)
+        size += len(sentence) + 1
+        if rng.random() < 0.15:
+            sentences.append("\n\n")
+    return " ".join(sentences)
+
+
+def write_corpus(root: Path, pages: int, seed: int = 0) -> Path:
+    """Synthetic Markdown corpus: PAGES_PER_DOC pages per doc, one '# Page n' section per page."""
+    rng = random.Random(seed)
+    docs_dir = root / "data" / "docs"
+    docs_dir.mkdir(parents=True, exist_ok=True)
+
+    written: list[str] = []
+    for d in range(math.ceil(pages / PAGES_PER_DOC)):
+        n = min(PAGES_PER_DOC, pages - d * PAGES_PER_DOC)
+        parts: list[str] = []
+        for p in range(1, n + 1):
+            if written and rng.random() < DUPLICATE_PAGE_FRACTION:
+                text = rng.choice(written)
+            else:
+                text = _page_text(rng, PAGE_CHARS)
+                written.append(text)
+            parts.append(f"# Page {p}\n\n{text}\n")
+        (docs_dir / f"2020_Synthetic_Report_{d:04d}.md").write_text("\n".join(parts), encoding="utf-8")
+    return docs_dir
+
+
+def run_stage(stage: str, root: Path, pages: int, dim: int = STUB_DIM) -> StageResult:
+    """Run one build stage in a fresh interpreter inside the corpus directory."""
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD, json.dumps([stage, dim])],
+        cwd=root,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Stage {stage!r} failed:\n{proc.stderr[-2000:]}")
+    data = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    count_file, outputs = _STAGE_OUTPUTS[stage]
+    with (root / "storage" / count_file).open("rb") as f:
+        chunks = sum(1 for _ in f)
+    output_bytes = sum((root / "storage" / name).stat().st_size for name in outputs)
+
+    return StageResult(
+        stage=stage,
+        pages=pages,
+        chunks=chunks,
+        seconds=data["seconds"],
+        peak_rss_mb=data["peak_mb"],
+        rss_growth_mb=data["peak_mb"] - data["baseline_mb"],
+        output_mb=output_bytes / 1e6,
+    )
+
+
+def bench(
+    sizes: tuple[int, ...] = DEFAULT_SIZES,
+    stages: tuple[str, ...] = STAGES,
+    dim: int = STUB_DIM,
+    workdir: Optional[Path] = None,
+) -> list[StageResult]:
+    """
+    Full build pipeline over synthetic corpora of increasing size (pages).
+    Stages run in order on a fresh corpus per size, so each reads the previous
+    stage's output, exactly as the real build does. Extraction is cold: the
+    chunks and streaming stages each start with an empty page cache.
+    """
+    results: list[StageResult] = []
+    for pages in sizes:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            root = Path(tmp)
+            (root / "storage").mkdir()
+            write_corpus(root, pages)
+            for stage in stages:
+                results.append(run_stage(stage, root, pages, dim))
+                print(_row(results[-1]), flush=True)
+    return results
+
+
+def growth_exponent(small: StageResult, large: StageResult, field: str) -> Optional[float]:
+    """k in value ~ pages^k between two corpus sizes (None if not measurable)."""
+    a, b = getattr(small, field), getattr(large, field)
+    if a <= 0 or b <= 0 or large.pages == small.pages:
+        return None
+    return math.log(b / a) / math.log(large.pages / small.pages)
+
+
+_HEADER = (
+    f"{'stage':<10} {'pages':>6} {'chunks':>7} {'time':>8} {'pages/s':>8} {'chunks/s':>9} "
+    f"{'peak RSS':>9} {'RSS +':>8} {'output':>8}"
+)
+
+
+def _row(r: StageResult) -> str:
+    return (
+        f"{r.stage:<10} {r.pages:>6} {r.chunks:>7} {r.seconds:>7.2f}s {r.pages_per_s:>8.1f} {r.chunks_per_s:>9.1f} "
+        f"{r.peak_rss_mb:>7.0f}MB {r.rss_growth_mb:>6.0f}MB {r.output_mb:>6.1f}MB"
+    )
+
+
+def _report_growth(results: list[StageResult]) -> None:
+    print("\nGrowth from smallest to largest corpus (value ~ pages^k; k > 1 grows faster than the corpus):")
+    for stage in dict.fromkeys(r.stage for r in results):
+        runs = [r for r in results if r.stage == stage]
+        if len(runs) < 2:
+            continue
+        small, large = runs[0], runs[-1]
+        parts: list[str] = []
+        for label, field in (("time", "seconds"), ("memory", "rss_growth_mb")):
+            k = growth_exponent(small, large, field)
+            if k is None:
+                parts.append(f"{label} k=n/a")
+            else:
+                parts.append(f"{label} k={k:.2f}{' SUPERLINEAR' if k > SUPERLINEAR else ''}")
+        mb_per_1k = (large.rss_growth_mb - small.rss_growth_mb) / max(1, large.chunks - small.chunks) * 1000
+        print(f"  {stage:<10} {', '.join(parts)}; {mb_per_1k:+.1f} MB RSS per 1k chunks")
+
+
+if __name__ == "__main__":
+    # python -m rag.ingest_bench                    -> default sizes (pages), all stages
+    # python -m rag.ingest_bench 200 800 --dim 384  -> custom sizes / stub vector width
+    args = sys.argv[1:]
+    dim = STUB_DIM
+    if "--dim" in args:
+        i = args.index("--dim")
+        dim = int(args[i + 1])
+        del args[i : i + 2]
+    sizes = tuple(int(a) for a in args) or DEFAULT_SIZES
+
+    print(f"Stub embedder dim={dim}; {PAGES_PER_DOC} pages/doc, ~{PAGE_CHARS} chars/page\n")
+    print(_HEADER)
+    _report_growth(bench(sizes, dim=dim))
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+
+# intent -> word-bounded alternatives (one compiled pattern, one scan per query).
+# Alternatives must not consume words another intent needs.
+_INTENT_PATTERNS = {
+    "telemed": r"telemedicine|telehealth|tele-med\w*|tele-health|virtual care|telecare",
+    "compare": r"compar(?:e|es|ed|ing|ison|isons)|versus|vs\.?|overlaps?|differences?|similarit(?:y|ies)",
+    "barrier": (
+        r"barriers?|challenges?|limitations?|obstacles?|constraints?|implement(?:ation|ing)?|adoption"
+        r"|unintended consequences?"
+    ),
+}
+
+_INTENT_RE = re.compile(
+    "|".join(rf"(?P<{name}>\b(?:{alts})\b)" for name, alts in _INTENT_PATTERNS.items()),
+    re.IGNORECASE,
+)
+
+# Comparison facets: "compare A and B", "differences between A and B", "A vs B".
+# Exactly two facets, split at one explicit connector; anything else keeps the
+# single-query path.
+_FACET_LEAD_RE = re.compile(
+    r"\b(?:compar(?:e|ing)|comparison (?:of|between)|contrast(?:ing)?|(?:differences?|similarit(?:y|ies)|overlaps?) between)\b",
+    re.IGNORECASE,
+)
+_FACET_END_RE = re.compile(r"[?.;!,]", re.IGNORECASE)
+_FACET_VS_RE = re.compile(r"\s+(?:vs\.?|versus)\s+", re.IGNORECASE)
+_FACET_AND_RE = re.compile(r"\s+and\s+", re.IGNORECASE)
+_FACET_PAIR_RE = re.compile(r"\s+(?:with|to)\s+", re.IGNORECASE)
+# aspect nouns written once after the last facet are shared: "A and B barriers"
+_FACET_ASPECT_RE = re.compile(
+    r"barriers?|challenges?|limitations?|obstacles?|constraints?|impacts?|effects?|consequences?|outcomes?",
+    re.IGNORECASE,
+)
+_FACET_PREPOSITIONS = frozenset(("to", "of", "for", "in", "on", "about"))
+_FACET_STOPWORDS = frozenset(
+    "what which how why are is do does did the a an of in on for there any between among and or exist exists when while".split()
+)
+_COMPARE_WORD_RE = re.compile(rf"(?:{_INTENT_PATTERNS['compare']})", re.IGNORECASE)
+
+_TELEMED_TEXT_RE = re.compile(r"\b(?:telemedicine|telehealth|tele-med\w*|tele-health|virtual care)\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class QueryIntent:
+    telemed: bool = False
+    compare: bool = False
+    barrier: bool = False
+
+
+def classify(query: str) -> QueryIntent:
+    """All intent flags for a query from a single regex pass."""
+    found = {m.lastgroup for m in _INTENT_RE.finditer(query or "")}
+
+    return QueryIntent(
+        telemed="telemed" in found,
+        compare="compare" in found,
+        barrier="barrier" in found,
+    )
+
+
+def telemed_signal(doc: str, topics: list[str], text: str) -> int:
+    """
+    Context-side telemedicine score, computed once per chunk at index build/load
+    and stored as metadata "telemed_signal" (used to reorder telemed answers).
+    """
+    doc_l = (doc or "").lower()
+    score = 0
+    if "telemedicine" in doc_l or "telehealth" in doc_l:
+        score += 3
+    if "telemedicine" in (topics or []):
+        score += 3
+    if _TELEMED_TEXT_RE.search(text or ""):
+        score += 1
+    return score
+
+
+def compare_facets(question: str) -> tuple[str, ...]:
+    """
+    Split a comparison question into two per-facet sub-queries, or () when it is
+    not an explicit "A vs B" / "compare A and B" between two complete phrases.
+    A modifier written once is shared: "barriers to interoperability and
+    telemedicine" -> ("barriers to interoperability", "barriers to telemedicine"),
+    "A and B barriers" -> ("A barriers", "B barriers"), "barriers vs facilitators
+    of X" -> ("barriers of X", "facilitators of X").
+    Content words before the comparison ("What barriers ...") are kept on both facets.
+    """
+    q = (question or "").strip()
+    lead = _FACET_LEAD_RE.search(q)
+    head, span = (q[: lead.start()], q[lead.end() :]) if lead else ("", q)
+    end = _FACET_END_RE.search(span)
+    if end:
+        span = span[: end.start()]
+
+    parts = _FACET_VS_RE.split(span)
+    if len(parts) == 1 and lead is not None:
+        parts = _FACET_AND_RE.split(span)
+        if len(parts) == 1:
+            # "compare A with B" / "compare A to B"
+            parts = _FACET_PAIR_RE.split(span)
+    if len(parts) != 2:
+        return ()
+    first, second = (p.split() for p in parts)
+    if lead is None:
+        # "What is A vs B": question words before A are not part of the facet
+        while first and first[0].lower() in _FACET_STOPWORDS:
+            first = first[1:]
+    if not first or not second or first[-1].endswith("-") or second[0].startswith("-"):
+        return ()
+
+    first_prep = [i for i, w in enumerate(first[:-1]) if w.lower() in _FACET_PREPOSITIONS]
+    second_prep = [i for i, w in enumerate(second[:-1]) if w.lower() in _FACET_PREPOSITIONS]
+    if first_prep and not second_prep:
+        # shared head written once before the first facet: "barriers to A and B"
+        second = first[: first_prep[-1] + 1] + second
+    elif len(first) == 1 and second_prep:
+        # shared tail written once after the last facet: "barriers vs facilitators of A"
+        first = first + second[second_prep[0] :]
+    elif not second_prep and len(second) > 1 and _FACET_ASPECT_RE.fullmatch(second[-1]):
+        # shared aspect written once after the last facet: "A and B barriers"
+        if not _FACET_ASPECT_RE.fullmatch(first[-1]):
+            first = first + second[-1:]
+
+    context = [
+        w for w in head.split()
+        if w.lower() not in _FACET_STOPWORDS and not _COMPARE_WORD_RE.fullmatch(w)
+    ]
+    facets = tuple(" ".join(context + w) for w in (first, second))
+    if facets[0].lower() == facets[1].lower():
+        return ()
+    return facets
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from rag.index_store import STORAGE, index_version
+from rag.settings import env
+from rag.usage import export_counters
+
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL_SECONDS = 24 * 3600
+
+# live   = normal calls, exact-match in-memory cache
+# record = live calls, every response is also appended to the cassette file
+# replay = no network; chat responses and query embeddings come only from the cassette file
+MODE_ENV = "RAG_LLM_MODE"
+CASSETTE_ENV = "RAG_LLM_CASSETTE"
+CASSETTE_PATH = STORAGE / "llm_cassette.jsonl"
+
+_MODES = ("live", "record", "replay")
+
+
+class CacheMiss(RuntimeError):
+    """A cached-only call (e.g. over budget) found no cached or recorded response."""
+
+
+def cache_key(model: str, prompt: str, version: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, version, prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Exact-match prompt -> response cache (LRU + TTL).
+    Keys include the index version, so a rebuilt index never serves stale answers.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            self._data.clear()
+            self._version = version
+
+    def get(self, key: str, version: str) -> Optional[str]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, version: str, value: str) -> None:
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_cache = ResponseCache()
+# Embeddings depend only on model + text, not on the index: a separate, unversioned cache
+_embed_cache = ResponseCache()
+EMBEDDING_VERSION = "embedding"
+_cassette: Optional[dict[str, str]] = None
+_cassette_lock = threading.Lock()
+
+# response cache hit rate per day (`python -m rag.usage events`), exported on ledger flushes
+export_counters("cache", lambda: {"hit": _cache.hits, "miss": _cache.misses})
+
+
+def get_mode() -> str:
+    mode = (env(MODE_ENV) or "live").strip().lower()
+    if mode not in _MODES:
+        raise RuntimeError(f"{MODE_ENV} must be one of {', '.join(_MODES)} (got {mode!r}).")
+    return mode
+
+
+def _cassette_path() -> Path:
+    return Path(env(CASSETTE_ENV) or CASSETTE_PATH)
+
+
+def _load_cassette() -> dict[str, str]:
+    global _cassette
+    if _cassette is None:
+        _cassette = {}
+        path = _cassette_path()
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        r = json.loads(line)
+                        _cassette[r["key"]] = r["response"]
+    return _cassette
+
+
+def _record(key: str, model: str, response: str) -> None:
+    with _cassette_lock:
+        cassette = _load_cassette()
+        if key in cassette:
+            return
+        cassette[key] = response
+        path = _cassette_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "model": model, "response": response}, ensure_ascii=False) + "\n")
+
+
+def cached_call(model: str, prompt: str, call: Callable[[], str], cached_only: bool = False) -> str:
+    """
+    Serve `prompt` from the cache / cassette when possible, otherwise run `call`.
+    In replay mode a missing entry is an error (no network); with cached_only
+    (budget exhausted, see rag/usage.py) it raises CacheMiss in any mode.
+    """
+    mode = get_mode()
+    version = index_version()
+    key = cache_key(model, prompt, version)
+
+    hit = _cache.get(key, version)
+    if hit is not None:
+        return hit
+
+    if mode == "replay":
+        with _cassette_lock:
+            response = _load_cassette().get(key)
+        if response is None:
+            raise RuntimeError(
+                f"No recorded response for this prompt in {_cassette_path()} "
+                f"({MODE_ENV}=replay). Re-run once with {MODE_ENV}=record."
+            )
+    elif cached_only:
+        with _cassette_lock:
+            response = _load_cassette().get(key) if _cassette_path().exists() else None
+        if response is None:
+            raise CacheMiss("No cached response for this prompt.")
+    else:
+        response = call()
+        if mode == "record":
+            _record(key, model, response)
+
+    _cache.put(key, version, response)
+    return response
+
+
+def cached_embeddings(
+    model: str,
+    texts: Sequence[str],
+    call: Callable[[list[str]], list[list[float]]],
+) -> list[list[float]]:
+    """
+    Per-text embedding cache / cassette: texts seen before are served from it,
+    the rest are embedded with one `call` (a batch). In replay mode a missing
+    text is an error (no network).
+    """
+    mode = get_mode()
+    keys = [cache_key(model, t, EMBEDDING_VERSION) for t in texts]
+    out: list[Optional[list[float]]] = [None] * len(texts)
+    missing: list[int] = []
+    for i, key in enumerate(keys):
+        hit = _embed_cache.get(key, EMBEDDING_VERSION)
+        if hit is None:
+            missing.append(i)
+        else:
+            out[i] = json.loads(hit)
+
+    if missing and mode == "replay":
+        with _cassette_lock:
+            cassette = _load_cassette()
+            recorded = {i: cassette.get(keys[i]) for i in missing}
+        if any(r is None for r in recorded.values()):
+            raise RuntimeError(
+                f"No recorded embedding for a query in {_cassette_path()} "
+                f"({MODE_ENV}=replay). Re-run once with {MODE_ENV}=record."
+            )
+        for i, response in recorded.items():
+            out[i] = json.loads(response)
+            _embed_cache.put(keys[i], EMBEDDING_VERSION, response)
+    elif missing:
+        unique = list({keys[i]: i for i in missing}.values())
+        vectors = dict(zip((keys[i] for i in unique), call([texts[i] for i in unique])))
+        for i in unique:
+            response = json.dumps(vectors[keys[i]])
+            _embed_cache.put(keys[i], EMBEDDING_VERSION, response)
+            if mode == "record":
+                _record(keys[i], model, response)
+        for i in missing:
+            out[i] = vectors[keys[i]]
+    return out
+
+
+def cache_stats() -> dict:
+    return {"hits": _cache.hits, "misses": _cache.misses, "entries": len(_cache)}
+
+
+def clear_cache() -> None:
+    _cache.clear()
+    _embed_cache.clear()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from rag.prompts import DONT_KNOW
+
+RECENT_TURNS = 2
+MEMORY_TOKEN_BUDGET = 400
+SUMMARY_TOKEN_BUDGET = 150
+TURN_ANSWER_CHARS = 400
+FOLD_BATCH_TURNS = 8    # turns merged into the summary per LLM call
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-memory")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token for English)."""
+    return (len(text or "") + 3) // 4
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= max_chars else text[: max_chars - 1].rstrip() + "…"
+
+
+def _llm_summarize(summary: str, turns: list[tuple[str, str]]) -> str:
+    from rag.openai_client import chat
+    from rag.usage import OK, budget_level
+
+    if budget_level() != OK:
+        raise RuntimeError("usage budget nearly spent; summary not updated")
+
+    prompt = (
+        "Update the running summary of a conversation about healthcare documents.\n"
+        f"Keep it under {SUMMARY_TOKEN_BUDGET * 4} characters. Keep topics, entities and open questions; "
+        "drop wording. Return only the new summary.\n\n"
+        f"Current summary:\n{summary or '(empty)'}\n\n"
+        "New turns:\n"
+        + "\n".join(f"User: {q}\nAssistant: {_clip(a, TURN_ANSWER_CHARS)}" for q, a in turns)
+    )
+    return chat(prompt).strip()
+
+
+class ConversationMemory:
+    """
+    Per-session conversation state under a token budget:
+    - the last `recent_turns` (question, answer) pairs verbatim (answers clipped)
+    - older turns folded into a rolling summary in the background (up to
+      FOLD_BATCH_TURNS per call) and then dropped, so state stays bounded however
+      long the session runs
+    Rendering never waits for a fold: it uses the last finished summary plus the
+    questions of turns not folded yet.
+    """
+
+    def __init__(
+        self,
+        recent_turns: int = RECENT_TURNS,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        summarize: Callable[[str, list[tuple[str, str]]], str] = _llm_summarize,
+    ):
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.turns: list[tuple[str, str]] = []
+        self.summary = ""
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def to_state(self) -> dict:
+        """JSON-serializable snapshot (for the session store)."""
+        with self._lock:
+            return {"turns": [list(t) for t in self.turns], "summary": self.summary}
+
+    def load_state(self, state: dict) -> None:
+        with self._lock:
+            self.turns = [(q, a) for q, a in state.get("turns", [])]
+            self.summary = state.get("summary", "")
+
+    def add_turn(self, question: str, answer: str) -> None:
+        with self._lock:
+            self.turns.append((question, "" if answer == DONT_KNOW else answer))
+
+    def recent_questions(self) -> list[str]:
+        with self._lock:
+            return [q for q, _ in self.turns[-self.recent_turns :]]
+
+    def _fold(self) -> None:
+        """Merge turns that left the recent window into the summary (one LLM call per batch)."""
+        while True:
+            with self._lock:
+                n = min(FOLD_BATCH_TURNS, len(self.turns) - self.recent_turns)
+                if n <= 0:
+                    return
+                batch = self.turns[:n]
+                summary = self.summary
+            try:
+                new_summary = self.summarize(summary, batch)
+            except Exception:
+                new_summary = " ".join([summary, *(q for q, _ in batch)]).strip()
+            with self._lock:
+                self.summary = _clip(new_summary, SUMMARY_TOKEN_BUDGET * 4)
+                del self.turns[:n]
+
+    def compact_async(self) -> None:
+        """Start folding in the background (call after the answer has been shown)."""
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return
+            self._pending = _EXECUTOR.submit(contextvars.copy_context().run, self._fold)
+
+    def render(self) -> str:
+        """Memory block for the prompt: summary + as many recent turns as fit the budget (never blocks on a fold)."""
+        with self._lock:
+            summary = self.summary
+            # turns not yet folded stay visible as questions only
+            unfolded = [q for q, _ in self.turns[: max(0, len(self.turns) - self.recent_turns)]]
+            recent = self.turns[-self.recent_turns :] if self.recent_turns else []
+
+        if not summary and not recent and not unfolded:
+            return ""
+
+        parts: list[str] = []
+        used = 0
+        if summary:
+            parts.append(f"Summary of earlier conversation: {summary}")
+            used += estimate_tokens(parts[-1])
+        for q in unfolded:
+            line = f"Earlier question: {q}"
+            if used + estimate_tokens(line) > self.token_budget:
+                break
+            parts.append(line)
+            used += estimate_tokens(line)
+
+        turn_lines: list[str] = []
+        for q, a in reversed(recent):
+            line = f"User: {q}\nAssistant: {_clip(a, TURN_ANSWER_CHARS)}" if a else f"User: {q}"
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            turn_lines.insert(0, line)
+            used += cost
+
+        return "Conversation memory:\n" + "\n".join(parts + turn_lines) + "\n\n"
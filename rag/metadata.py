@@ -1,9 +1,12 @@
+import re
+
+
 def infer_metadata(doc_name: str) -> dict:
     """
     General metadata inferred from filename.
     You can extend this anytime (manual mapping, better rules, etc.).
     """
-    base = doc_name.lower().replace(".pdf", "")
+    base = re.sub(r"\.(pdf|html?|docx|md|markdown|txt)$", "", doc_name.lower())
     base = base.replace("-", "_")
 
     year = int(doc_name[:4]) if len(doc_name) >= 4 and doc_name[:4].isdigit() else None
@@ -1,34 +1,138 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+from __future__ import annotations
 
-load_dotenv()
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from rag.llm_cache import cached_call, cached_embeddings
+from rag.settings import env
+from rag.throttle import api_bucket
+from rag.usage import record_usage
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 EMBEDDING_MODEL = "text-embedding-3-small"
 CHAT_MODEL = "gpt-4o-mini"
 
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def _client_instance() -> OpenAI:
+    # the openai SDK is slow to import; load it (and .env) on first use and
+    # reuse one client so its HTTP connection pool stays warm
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = env("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError(
+                    "OPENAI_API_KEY is missing. Add it to your .env file or environment variables."
+                )
+            from openai import OpenAI
+
+            _client = OpenAI(api_key=api_key)
+        return _client
+
+
+# Set while an index build embeds chunks: bulk embeddings bypass the serving
+# rate limiter and the embedding cache / cassette (they are written to the index, not replayed)
+_offline_build: contextvars.ContextVar[bool] = contextvars.ContextVar("rag_offline_build", default=False)
+
+
+@contextmanager
+def offline_build() -> Iterator[None]:
+    """Mark API calls in this context as part of an offline index build."""
+    token = _offline_build.set(True)
+    try:
+        yield
+    finally:
+        _offline_build.reset(token)
+
 
 def _get_client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError(
-            "OPENAI_API_KEY is missing. Add it to your .env file or environment variables."
-        )
-    return OpenAI(api_key=api_key)
+    # serving requests pass the process-wide rate limiter (raises Overloaded when exhausted);
+    # offline index builds are not throttled (the SDK still retries on 429)
+    if not _offline_build.get():
+        api_bucket().acquire()
+    return _client_instance()
+
+
+def prime_client() -> None:
+    """Import the SDK and create the shared client ahead of the first request (see rag/warmup.py)."""
+    _client_instance()
+
+
+def _record(kind: str, model: str, resp) -> None:
+    usage = getattr(resp, "usage", None)
+    if usage is not None:
+        record_usage(kind, model, usage.prompt_tokens or 0, getattr(usage, "completion_tokens", 0) or 0)
+
+
+def _embed_call(texts: list[str]) -> list[list[float]]:
+    client = _get_client()
+    resp = client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    _record("embedding", EMBEDDING_MODEL, resp)
+    return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
 
 
 def embed_text(text: str) -> list[float]:
     """Return embedding vector for a single text."""
-    client = _get_client()
-    resp = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
-    return resp.data[0].embedding
+    return embed_texts([text])[0]
 
 
-def chat(prompt: str) -> str:
-    """Generate an answer from the chat model."""
-    client = _get_client()
-    resp = client.chat.completions.create(
-        model=CHAT_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-    )
-    return resp.choices[0].message.content or ""
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """
+    Return embedding vectors for a batch of texts (at most one API call).
+    Cached and replayable per text like chat responses, except during offline_build().
+    """
+    if not texts:
+        return []
+    if _offline_build.get():
+        return _embed_call(texts)
+    return cached_embeddings(EMBEDDING_MODEL, texts, _embed_call)
+
+
+def chat(prompt: str, cached_only: bool = False) -> str:
+    """
+    Generate an answer from the chat model (cached / replayable, see rag/llm_cache.py).
+    cached_only=True never calls the API (raises llm_cache.CacheMiss instead).
+    """
+
+    def _call() -> str:
+        client = _get_client()
+        resp = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        _record("chat", CHAT_MODEL, resp)
+        return resp.choices[0].message.content or ""
+
+    return cached_call(CHAT_MODEL, prompt, _call, cached_only)
+
+
+def chat_json(prompt: str, schema: dict, name: str = "rag_answer", cached_only: bool = False) -> str:
+    """
+    Chat call with schema-constrained output (JSON schema response_format).
+    Returns the raw JSON text; a model refusal comes back as "".
+    """
+
+    def _call() -> str:
+        client = _get_client()
+        resp = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": name, "schema": schema, "strict": True},
+            },
+        )
+        _record("chat", CHAT_MODEL, resp)
+        msg = resp.choices[0].message
+        if getattr(msg, "refusal", None):
+            return ""
+        return msg.content or ""
+
+    return cached_call(f"{CHAT_MODEL}|json_schema:{name}", prompt, _call, cached_only)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional
+
+from rag.index_store import STORAGE
+from rag.preprocess import clean_text, iter_pages
+
+PAGE_CACHE_PATH = STORAGE / "page_cache.sqlite3"
+
+# Part of every cache key: bump when a loader or clean_text changes its output
+EXTRACT_VERSION = 1
+
+# Table layout of the cache file (PRAGMA user_version); older files are migrated once on open
+SCHEMA_VERSION = 2
+
+_HASH_BLOCK = 1 << 20
+PAGE_FETCH = 16     # cached pages read per query
+
+
+def content_key(path: Path) -> str:
+    """sha256 of the file bytes + EXTRACT_VERSION (renamed/moved files still hit)."""
+    h = hashlib.sha256(f"v{EXTRACT_VERSION}\0".encode())
+    with path.open("rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            h.update(block)
+    return h.hexdigest()
+
+
+class PageCache:
+    """
+    Extracted + cleaned pages per document, keyed by content hash.
+    One SQLite file; one zlib-compressed row per page, so a document is written
+    and read back page by page. A document counts as cached only once all its
+    pages are in (an interrupted extraction is redone).
+    """
+
+    def __init__(self, path: Path = PAGE_CACHE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+            if version < SCHEMA_VERSION:
+                self._migrate()
+
+    def _migrate(self) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # another worker may have migrated while we waited for the write lock
+            (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+            if version < SCHEMA_VERSION:
+                # version 1 kept whole documents in one `pages` table
+                self._conn.execute("DROP TABLE IF EXISTS pages")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS docs ("
+                    " key TEXT PRIMARY KEY, name TEXT NOT NULL, n_pages INTEGER NOT NULL, complete INTEGER NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS doc_pages ("
+                    " key TEXT NOT NULL, seq INTEGER NOT NULL, page INTEGER NOT NULL, data BLOB NOT NULL,"
+                    " PRIMARY KEY (key, seq))"
+                )
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT complete FROM docs WHERE key = ?", (key,)).fetchone()
+        return bool(row and row[0])
+
+    def iter_pages(self, key: str) -> Iterator[tuple[int, str]]:
+        """Stored pages of a document in order, fetched PAGE_FETCH at a time."""
+        seq = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT seq, page, data FROM doc_pages WHERE key = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                    (key, seq, PAGE_FETCH),
+                ).fetchall()
+            for seq, page, data in rows:
+                yield int(page), zlib.decompress(data).decode("utf-8")
+            if len(rows) < PAGE_FETCH:
+                return
+            seq += 1
+
+    def begin(self, key: str, name: str) -> None:
+        """Start (re)writing a document: drop any partial rows."""
+        with self._lock:
+            self._conn.execute("DELETE FROM doc_pages WHERE key = ?", (key,))
+            self._conn.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, 0, 0)", (key, name))
+
+    def put_page(self, key: str, seq: int, page: int, text: str) -> None:
+        data = zlib.compress(text.encode("utf-8"), 6)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO doc_pages VALUES (?, ?, ?, ?)", (key, seq, page, data))
+
+    def finish(self, key: str, n_pages: int) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE docs SET n_pages = ?, complete = 1 WHERE key = ?", (n_pages, key))
+
+    def prune(self, keep: set[str]) -> int:
+        """Drop entries whose key is not in `keep` (documents removed or changed)."""
+        with self._lock:
+            stale = [k for (k,) in self._conn.execute("SELECT key FROM docs") if k not in keep]
+            self._conn.executemany("DELETE FROM doc_pages WHERE key = ?", [(k,) for k in stale])
+            self._conn.executemany("DELETE FROM docs WHERE key = ?", [(k,) for k in stale])
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            docs, pages = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(n_pages), 0) FROM docs WHERE complete = 1"
+            ).fetchone()
+            (size,) = self._conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM doc_pages").fetchone()
+        return {"docs": docs, "pages": pages, "bytes": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
+
+
+def iter_clean_pages(path: Path, cache: Optional[PageCache] = None) -> Iterator[tuple[int, str]]:
+    """
+    (page_number, cleaned_text) for non-empty pages, served from the page cache
+    when the file content was seen before; otherwise extracted, cleaned and
+    written to the cache page by page as they are yielded (nothing per document
+    is held in memory either way).
+    """
+    cache = cache if cache is not None else get_page_cache()
+    key = content_key(path)
+
+    if cache.has(key):
+        yield from cache.iter_pages(key)
+        return
+
+    cache.begin(key, path.name)
+    n = 0
+    for page_num, page_text in iter_pages(path):
+        cleaned = clean_text(page_text)
+        if cleaned:
+            cache.put_page(key, n, page_num, cleaned)
+            n += 1
+            yield page_num, cleaned
+    cache.finish(key, n)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import faiss
+import numpy as np
+
+from rag.dedup import NearDuplicateFilter
+from rag.expansion import TermPostings, build_expansion_table
+from rag.hierarchy import build_child_index
+from rag.index_store import (
+    CHILD_INDEX_PATH,
+    CHILD_PARENT_PATH,
+    DOC_INDEX_DOCS_PATH,
+    DOC_INDEX_PATH,
+    EXPANSION_INDEX_PATH,
+    EXPANSION_TERMS_PATH,
+    INDEX_PATH,
+    META_PATH,
+    flat_vectors,
+    write_index_info,
+)
+from rag.intent import telemed_signal
+from rag.metadata import infer_metadata
+from rag.embeddings import embed_texts
+from rag.openai_client import offline_build
+from rag.routing import build_doc_index
+from rag.page_cache import iter_clean_pages
+from rag.preprocess import DOCS_PATH, chunk_text, load_documents
+
+EMBED_BATCH = 64
+
+
+def iter_chunk_records(docs: list[Path]) -> Iterator[dict]:
+    """
+    Yield chunk records one at a time: document -> page/section -> chunks.
+    Cleaned pages come from the page cache (rag/page_cache.py) for unchanged files.
+    """
+    chunk_id = 0
+    for doc_path in docs:
+        extra = infer_metadata(doc_path.name)
+        doc_chunks = 0
+        for page_num, cleaned in iter_clean_pages(doc_path):
+            for chunk in chunk_text(cleaned):
+                yield {
+                    "doc": doc_path.name,
+                    "page": page_num,
+                    "chunk_id": chunk_id,
+                    "text": chunk,
+                    **extra,
+                    "telemed_signal": telemed_signal(doc_path.name, extra["topics"], chunk),
+                }
+                chunk_id += 1
+                doc_chunks += 1
+        print(f" {doc_path.name}: {doc_chunks} chunks")
+
+
+@offline_build()
+def ingest_streaming(
+    docs_path: Path = DOCS_PATH,
+    index_path: Path = INDEX_PATH,
+    meta_path: Path = META_PATH,
+    batch_size: int = EMBED_BATCH,
+    dedupe: bool = True,
+    embed_fn: Callable[[list[str]], list[list[float]]] = embed_texts,
+    hierarchy: bool = True,
+) -> Optional[faiss.Index]:
+    """
+    Streaming build: documents -> chunks -> batched embeddings -> FAISS index.
+    Only one page and one embedding batch are held at a time (plus the index itself);
+    metadata is written line by line. Near-duplicates are dropped on the fly and
+    recorded as alt_citations on the kept chunk.
+    """
+    docs = load_documents(docs_path)
+    print(f" Found {len(docs)} documents")
+
+    dup_filter = NearDuplicateFilter() if dedupe else None
+    alts: dict[int, list[dict]] = {}
+    index: Optional[faiss.Index] = None
+    batch: list[dict] = []
+    row_docs: list[str] = []
+    postings = TermPostings()
+    kept = 0
+    removed = 0
+
+    tmp_meta = meta_path.with_suffix(".jsonl.tmp")
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _flush(fout) -> None:
+        nonlocal index
+        if not batch:
+            return
+        X = np.array(embed_fn([r["text"] for r in batch]), dtype="float32")
+        faiss.normalize_L2(X)
+        if index is None:
+            index = faiss.IndexFlatIP(X.shape[1])
+        index.add(X)
+        for r in batch:
+            fout.write(json.dumps(r, ensure_ascii=False) + "\n")
+            row_docs.append(r["doc"])
+        postings.add(r["text"] for r in batch)
+        batch.clear()
+
+    with tmp_meta.open("w", encoding="utf-8") as fout:
+        for record in iter_chunk_records(docs):
+            if dup_filter is not None:
+                rep = dup_filter.add(record["text"])
+                if rep is not None:
+                    alts.setdefault(rep, []).append(
+                        {"doc": record["doc"], "page": record["page"], "chunk_id": record["chunk_id"]}
+                    )
+                    removed += 1
+                    continue
+
+            batch.append(record)
+            kept += 1
+            if len(batch) >= batch_size:
+                _flush(fout)
+        _flush(fout)
+
+    if index is None:
+        tmp_meta.unlink(missing_ok=True)
+        print(" No chunks produced; index not written.")
+        return None
+
+    # second streaming pass: attach alt citations to their kept chunk. The index and
+    # metadata are written to temp files and swapped in at the end, index first and
+    # metadata last, so a failed build never pairs new rows with the old index.
+    new_meta = meta_path.with_name(meta_path.name + ".new")
+    new_index = index_path.with_name(index_path.name + ".new")
+    with tmp_meta.open("r", encoding="utf-8") as fin, new_meta.open("w", encoding="utf-8") as fout:
+        for row, line in enumerate(fin):
+            if row in alts:
+                record = json.loads(line)
+                record["alt_citations"] = alts[row]
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+            fout.write(line)
+    os.remove(tmp_meta)
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(new_index))
+    os.replace(new_index, index_path)
+    write_index_info(index_path, index.d)
+    os.replace(new_meta, meta_path)
+
+    print(f"FAISS index saved: {index_path}")
+    print(f"Metadata saved: {meta_path}")
+    print(f"Vectors indexed: {index.ntotal} (dim={index.d}); near-duplicates dropped: {removed}")
+
+    # coarse stage for two-stage retrieval, written next to the index
+    build_doc_index(
+        flat_vectors(index),
+        row_docs,
+        index_path=index_path.with_name(DOC_INDEX_PATH.name),
+        docs_path=index_path.with_name(DOC_INDEX_DOCS_PATH.name),
+    )
+    # corpus-derived query expansion (term -> centroid of the chunks using it)
+    build_expansion_table(
+        flat_vectors(index),
+        postings,
+        index_path=index_path.with_name(EXPANSION_INDEX_PATH.name),
+        terms_path=index_path.with_name(EXPANSION_TERMS_PATH.name),
+    )
+    # small-to-big child index, rebuilt with its parents so its rows always match
+    if hierarchy:
+        build_child_index(
+            meta_path,
+            index_path=index_path.with_name(CHILD_INDEX_PATH.name),
+            parent_path=index_path.with_name(CHILD_PARENT_PATH.name),
+            parent_index_path=index_path,
+            embed_fn=embed_fn,
+        )
+    return index
+
+
+if __name__ == "__main__":
+    ingest_streaming()
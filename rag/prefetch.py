@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from rag.metadata import infer_metadata
+
+PREFETCH_WORKERS = 4
+PREFETCH_MAX_ENTRIES = 8
+PREFETCH_WAIT_SECONDS = 5.0
+MAX_FOLLOW_UPS = 3
+
+# One pool for the whole process; sessions only own their small result caches.
+_EXECUTOR = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="rag-prefetch")
+
+_FOLLOW_UP_TEMPLATES = (
+    "What are the barriers to {topic}?",
+    "What are the effects of {topic}?",
+    "What are the limitations of {topic}?",
+)
+
+
+def retrieval_key(
+    retrieval_query: str,
+    top_k: int,
+    doc_filter: Optional[list[str]],
+    year_filter: Optional[int],
+    category_filter: Optional[str],
+    topic_filter: Optional[list[str]],
+) -> tuple:
+    return (
+        retrieval_query,
+        top_k,
+        tuple(doc_filter or ()),
+        year_filter,
+        category_filter,
+        tuple(sorted(topic_filter or ())),
+    )
+
+
+class PrefetchCache:
+    """
+    Per-session cache of in-flight / finished background retrievals.
+    Bounded: the oldest entries are dropped (and cancelled if not started yet).
+    """
+
+    def __init__(self, max_entries: int = PREFETCH_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._futures: OrderedDict[tuple, Future] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key: tuple, fn: Callable[..., Any], *args: Any) -> None:
+        with self._lock:
+            if key in self._futures:
+                return
+            # keep the caller's context (usage attribution, see rag/usage.py)
+            self._futures[key] = _EXECUTOR.submit(contextvars.copy_context().run, fn, *args)
+            while len(self._futures) > self.max_entries:
+                _, old = self._futures.popitem(last=False)
+                old.cancel()
+
+    def take(self, key: tuple, timeout: float = PREFETCH_WAIT_SECONDS) -> Optional[Any]:
+        """Pop a prefetched result (waiting briefly if still running); None on miss or failure."""
+        with self._lock:
+            fut = self._futures.pop(key, None)
+        if fut is None:
+            return None
+        try:
+            return fut.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def clear(self) -> None:
+        with self._lock:
+            for fut in self._futures.values():
+                fut.cancel()
+            self._futures.clear()
+
+
+def follow_up_candidates(question: str, sources: list[dict]) -> list[str]:
+    """
+    Likely next questions, built from the topics of the documents just cited.
+    These are offered as suggestions in the UI and prefetched in the background.
+    """
+    asked = (question or "").strip().lower()
+    topics: list[str] = []
+    for s in sources or []:
+        for t in infer_metadata(s.get("doc", ""))["topics"]:
+            if t not in topics:
+                topics.append(t)
+
+    candidates: list[str] = []
+    for topic in topics:
+        readable = topic.replace("-", " ")
+        for template in _FOLLOW_UP_TEMPLATES:
+            q = template.format(topic=readable)
+            if q.lower() != asked and q not in candidates:
+                candidates.append(q)
+            if len(candidates) >= MAX_FOLLOW_UPS:
+                return candidates
+    return candidates
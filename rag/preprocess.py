@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+from functools import lru_cache
+from html.parser import HTMLParser
 from pathlib import Path
 import re
-from typing import Iterable
+import zipfile
+from typing import Callable, Iterable, Iterator
+from xml.etree import ElementTree
 
 from pypdf import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -13,42 +17,214 @@ CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 150
 
 
-def load_pdfs(docs_path: Path = DOCS_PATH) -> list[Path]:
-    """Load PDFs from data/docs and drop duplicates by filename."""
-    pdfs = sorted(docs_path.glob("*.pdf"))
+# suffix -> loader; a loader yields (page_or_section_number, text) lazily
+LOADERS: dict[str, Callable[[Path], Iterator[tuple[int, str]]]] = {}
+
+TEXT_SECTION_CHARS = 4000   # plain text without headings is cut into pseudo-pages
+DOCX_SECTION_PARAGRAPHS = 40
+HTML_FEED_BYTES = 64 * 1024
+
+
+def register_loader(*suffixes: str):
+    """Register a page/section generator for one or more file suffixes."""
+
+    def deco(fn: Callable[[Path], Iterator[tuple[int, str]]]):
+        for suffix in suffixes:
+            LOADERS[suffix.lower()] = fn
+        return fn
+
+    return deco
+
 
+def _dedupe_by_name(paths: Iterable[Path]) -> list[Path]:
     unique: dict[str, Path] = {}
     duplicates: set[str] = set()
 
-    for pdf in pdfs:
-        if pdf.name in unique:
-            duplicates.add(pdf.name)
+    for p in paths:
+        if p.name in unique:
+            duplicates.add(p.name)
         else:
-            unique[pdf.name] = pdf
+            unique[p.name] = p
 
     if duplicates:
-        print("\n Duplicate PDF filenames detected (only first copy used):")
+        print("\n Duplicate filenames detected (only first copy used):")
         for name in sorted(duplicates):
             print(f" - {name}")
 
     return list(unique.values())
 
 
-def extract_text_with_pages(pdf_path: Path) -> list[tuple[int, str]]:
-    """Read a PDF and return a list of (page_number, page_text)."""
+def load_pdfs(docs_path: Path = DOCS_PATH) -> list[Path]:
+    """Load PDFs from data/docs and drop duplicates by filename."""
+    return _dedupe_by_name(sorted(docs_path.glob("*.pdf")))
+
+
+def load_documents(docs_path: Path = DOCS_PATH) -> list[Path]:
+    """Load every file with a registered loader (PDF, HTML, DOCX, MD, TXT), deduped by filename."""
+    return _dedupe_by_name(sorted(p for p in docs_path.iterdir() if p.suffix.lower() in LOADERS))
+
+
+def iter_pages(path: Path) -> Iterator[tuple[int, str]]:
+    """Yield (page_number, text) for any supported document, one page/section at a time."""
+    loader = LOADERS.get(path.suffix.lower())
+    if loader is None:
+        raise ValueError(f"No loader registered for {path.suffix!r} ({path.name})")
+    return loader(path)
+
+
+@register_loader(".pdf")
+def iter_pdf_pages(pdf_path: Path) -> Iterator[tuple[int, str]]:
     try:
         reader = PdfReader(str(pdf_path))
     except Exception as e:
         print(f" Failed to read PDF: {pdf_path.name} ({e})")
-        return []
+        return
 
-    pages: list[tuple[int, str]] = []
     for i, page in enumerate(reader.pages, start=1):
         text = page.extract_text() or ""
         if text.strip():
-            pages.append((i, text))
+            yield i, text
 
-    return pages
+
+def extract_text_with_pages(pdf_path: Path) -> list[tuple[int, str]]:
+    """Read a PDF and return a list of (page_number, page_text)."""
+    return list(iter_pdf_pages(pdf_path))
+
+
+_MD_HEADING_RE = re.compile(r"^#{1,3} ")
+
+
+@register_loader(".txt", ".md", ".markdown")
+def iter_text_sections(path: Path) -> Iterator[tuple[int, str]]:
+    """Sections split at Markdown headings (#, ##, ###) or every TEXT_SECTION_CHARS."""
+    section = 0
+    buf: list[str] = []
+    size = 0
+
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if buf and (_MD_HEADING_RE.match(line) or size >= TEXT_SECTION_CHARS):
+                text = "".join(buf)
+                if text.strip():
+                    section += 1
+                    yield section, text
+                buf, size = [], 0
+            buf.append(line)
+            size += len(line)
+
+    text = "".join(buf)
+    if text.strip():
+        yield section + 1, text
+
+
+class _HTMLSections(HTMLParser):
+    """Collects visible text; h1-h3 start a new section."""
+
+    _SKIP = {"script", "style", "noscript", "head"}
+    _BREAK = {"h1", "h2", "h3"}
+    _BLOCK = {"p", "div", "li", "br", "tr", "section", "article", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__()
+        self.done: list[str] = []
+        self._buf: list[str] = []
+        self._skip = 0
+
+    def _flush(self):
+        text = "".join(self._buf).strip()
+        if text:
+            self.done.append(text)
+        self._buf = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip += 1
+        elif tag in self._BREAK:
+            self._flush()
+        elif tag in self._BLOCK:
+            self._buf.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip:
+            self._skip -= 1
+        elif tag in self._BREAK or tag in self._BLOCK:
+            self._buf.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._buf.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+@register_loader(".html", ".htm")
+def iter_html_sections(path: Path) -> Iterator[tuple[int, str]]:
+    """Feeds the file incrementally; completed sections are yielded as soon as they end."""
+    parser = _HTMLSections()
+    section = 0
+
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(HTML_FEED_BYTES)
+            if not block:
+                break
+            parser.feed(block)
+            while parser.done:
+                section += 1
+                yield section, parser.done.pop(0)
+
+    parser.close()
+    for text in parser.done:
+        section += 1
+        yield section, text
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@register_loader(".docx")
+def iter_docx_sections(path: Path) -> Iterator[tuple[int, str]]:
+    """
+    Streams word/document.xml from the .docx zip (no python-docx needed).
+    Heading paragraphs or every DOCX_SECTION_PARAGRAPHS paragraphs start a new section.
+    """
+    try:
+        zf = zipfile.ZipFile(path)
+    except Exception as e:
+        print(f" Failed to read DOCX: {path.name} ({e})")
+        return
+    try:
+        xml = zf.open("word/document.xml")
+    except KeyError:
+        # a zip without a Word body (another OOXML type, or a malformed file)
+        zf.close()
+        print(f" Failed to read DOCX: {path.name} (no word/document.xml)")
+        return
+
+    section = 0
+    paragraphs: list[str] = []
+
+    with zf, xml:
+        for _, el in ElementTree.iterparse(xml, events=("end",)):
+            if el.tag != f"{_W_NS}p":
+                continue
+
+            style = el.find(f"{_W_NS}pPr/{_W_NS}pStyle")
+            is_heading = style is not None and (style.get(f"{_W_NS}val") or "").lower().startswith("heading")
+            text = "".join(t.text or "" for t in el.iter(f"{_W_NS}t"))
+            el.clear()
+
+            if paragraphs and (is_heading or len(paragraphs) >= DOCX_SECTION_PARAGRAPHS):
+                section += 1
+                yield section, "\n\n".join(paragraphs)
+                paragraphs = []
+            if text.strip():
+                paragraphs.append(text)
+
+    if paragraphs:
+        yield section + 1, "\n\n".join(paragraphs)
 
 
 def clean_text(text: str) -> str:
@@ -61,10 +237,14 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
-def chunk_text(text: str) -> list[str]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
+@lru_cache(maxsize=16)
+def _splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", ". ", " ", ""],
     )
-    return splitter.split_text(text)
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> list[str]:
+    return _splitter(chunk_size, chunk_overlap).split_text(text)
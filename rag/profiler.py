@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import CodeType
+from typing import Iterator, Optional
+
+from rag.index_store import STORAGE
+
+# Written by `python -m rag.profiler start/stop`; polled by running workers (no restart)
+PROFILE_CONTROL_PATH = STORAGE / "profiler.json"
+PROFILE_DIR = STORAGE / "profiles"
+
+SAMPLE_INTERVAL_S = 0.005   # 200 Hz, only while a sampled request is running
+FLUSH_S = 10.0              # workers rewrite their .folded file at most this often
+CONTROL_POLL_S = 1.0
+MAX_DEPTH = 64              # innermost frames kept per sample
+
+# Stage of a sample = first match walking out from the innermost frame
+# (so a regex in guardrails called from retrieval counts as guardrails).
+STAGE_RULES = (
+    ("rag/guardrails.py", "guardrails"),
+    ("rag/validators.py", "parse"),
+    ("rag/citations.py", "parse"),
+    ("/json/", "parse"),
+    ("rag/openai_client.py", "openai"),
+    ("rag/llm_cache.py", "openai"),
+    ("rag/filters.py", "retrieve"),
+    ("rag/retriever.py", "retrieve"),
+    ("rag/shards.py", "retrieve"),
+    ("rag/routing.py", "retrieve"),
+    ("rag/expansion.py", "retrieve"),
+    ("rag/embeddings.py", "retrieve"),
+    ("rag/intent.py", "plan"),
+    ("rag/prompts.py", "prompt"),
+    ("rag/memory.py", "memory"),
+    ("/streamlit/", "render"),
+)
+DEFAULT_STAGE = "app"
+
+_code_info: dict[CodeType, tuple[str, Optional[str]]] = {}
+
+
+def _frame_info(code: CodeType) -> tuple[str, Optional[str]]:
+    """(flamegraph label, stage or None) per code object, computed once."""
+    info = _code_info.get(code)
+    if info is None:
+        path = code.co_filename.replace(os.sep, "/")
+        stage = next((s for pattern, s in STAGE_RULES if pattern in path), None)
+        short = "/".join(path.rsplit("/", 2)[-2:])
+        info = (f"{code.co_name} ({short}:{code.co_firstlineno})".replace(";", ","), stage)
+        _code_info[code] = info
+    return info
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of registered threads (sampled requests) from one daemon
+    thread and counts them as collapsed stacks, `stage;outer;...;inner`.
+    Unregistered threads are never looked at; with nothing registered the
+    sampler thread sleeps.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S, out_dir: Path = PROFILE_DIR):
+        self.interval = interval
+        self.out_dir = out_dir
+        self.window: Optional[str] = None
+        self.samples = 0
+        self._stacks: Counter[str] = Counter()
+        self._threads: dict[int, int] = {}   # thread ident -> nesting depth
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, window: str) -> None:
+        """Start sampling the calling thread for `window` (a new window resets the counts)."""
+        ident = threading.get_ident()
+        with self._lock:
+            if window != self.window:
+                self._flush_locked()
+                self.window, self.samples, self._stacks = window, 0, Counter()
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rag-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def end(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + FLUSH_S
+        while True:
+            if self._threads:
+                self._sample()
+                time.sleep(self.interval)
+            else:
+                self._wake.wait(FLUSH_S)
+                self._wake.clear()
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + FLUSH_S
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            idents = list(self._threads)
+        stacks: list[str] = []
+        frame = None
+        for ident in idents:
+            frame = frames.get(ident)
+            stage: Optional[str] = None
+            labels: list[str] = []
+            while frame is not None and (len(labels) < MAX_DEPTH or stage is None):
+                label, frame_stage = _frame_info(frame.f_code)
+                if len(labels) < MAX_DEPTH:
+                    labels.append(label)
+                if stage is None:
+                    stage = frame_stage
+                frame = frame.f_back
+            if labels:
+                labels.reverse()
+                stacks.append(";".join([stage or DEFAULT_STAGE, *labels]))
+        del frames, frame
+        if stacks:
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += len(stacks)
+                self._dirty = True
+
+    def stacks(self) -> Counter[str]:
+        with self._lock:
+            return Counter(self._stacks)
+
+    def flush(self) -> Optional[Path]:
+        """Rewrite this process's .folded file for the current window (if anything changed)."""
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self) -> Optional[Path]:
+        if not self._dirty or self.window is None:
+            return None
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        path = self.out_dir / f"{self.window}-{os.getpid()}.folded"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text("".join(f"{s} {n}\n" for s, n in self._stacks.most_common()), encoding="utf-8")
+        tmp.replace(path)
+        self._dirty = False
+        return path
+
+
+_profiler: Optional[SamplingProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> SamplingProfiler:
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler()
+        return _profiler
+
+
+# (checked at, control file mtime, parsed control); re-read at most every CONTROL_POLL_S
+_control_state: tuple[float, Optional[float], Optional[dict]] = (0.0, None, None)
+
+
+def active_control(path: Path = PROFILE_CONTROL_PATH) -> Optional[dict]:
+    """The running profiling window ({"window", "rate", "until"}), or None."""
+    global _control_state
+    checked, mtime, control = _control_state
+    now = time.time()
+    if now - checked >= CONTROL_POLL_S:
+        try:
+            current = path.stat().st_mtime
+        except OSError:
+            current, control = None, None
+        if current is not None and current != mtime:
+            try:
+                control = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                control = None
+        _control_state = (now, current, control)
+    if control is None or now >= control.get("until", 0):
+        return None
+    return control
+
+
+@contextmanager
+def profile_request() -> Iterator[bool]:
+    """
+    Sample the calling thread for the duration of the block if a profiling window
+    is open and this request falls in its sampled fraction. Yields whether it does;
+    unsampled requests pay one cached control lookup and one random().
+    Background work (prefetch, memory summaries) runs on other threads and is not sampled.
+    """
+    control = active_control()
+    if control is None or random.random() >= float(control.get("rate", 1.0)):
+        yield False
+        return
+
+    profiler = get_profiler()
+    profiler.begin(control["window"])
+    try:
+        yield True
+    finally:
+        profiler.end()
+
+
+def start_profiling(rate: float = 1.0, seconds: float = 300.0, path: Path = PROFILE_CONTROL_PATH) -> str:
+    """Open a profiling window for every running worker; returns its id."""
+    window = time.strftime("%Y%m%d-%H%M%S")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"window": window, "rate": rate, "until": time.time() + seconds}), encoding="utf-8")
+    return window
+
+
+def stop_profiling(path: Path = PROFILE_CONTROL_PATH) -> None:
+    path.unlink(missing_ok=True)
+
+
+def load_stacks(window: Optional[str] = None, out_dir: Path = PROFILE_DIR) -> tuple[Optional[str], Counter[str]]:
+    """(window, merged collapsed stacks of all workers); default: the latest window."""
+    files = sorted(out_dir.glob("*.folded"))
+    if window is None and files:
+        window = files[-1].name.rsplit("-", 1)[0]
+    stacks: Counter[str] = Counter()
+    for f in files:
+        if f.name.rsplit("-", 1)[0] != window:
+            continue
+        for line in f.read_text(encoding="utf-8").splitlines():
+            stack, _, count = line.rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return window, stacks
+
+
+def stage_totals(stacks: Counter[str]) -> Counter[str]:
+    totals: Counter[str] = Counter()
+    for stack, n in stacks.items():
+        totals[stack.split(";", 1)[0]] += n
+    return totals
+
+
+def top_functions(stacks: Counter[str], stage: Optional[str] = None, n: int = 15) -> list[tuple[str, int]]:
+    """Innermost frames by sample count (self time), optionally within one stage."""
+    own: Counter[str] = Counter()
+    for stack, count in stacks.items():
+        if stage is None or stack.startswith(stage + ";"):
+            own[stack.rsplit(";", 1)[-1]] += count
+    return own.most_common(n)
+
+
+def _report(window: Optional[str], stacks: Counter[str], stage: Optional[str]) -> None:
+    total = sum(stacks.values())
+    if not total:
+        print("No samples yet (workers write their profiles every few seconds).")
+        return
+    print(f"Window {window}: {total} samples (~{total * SAMPLE_INTERVAL_S:.1f}s of sampled request time)")
+    for name, count in stage_totals(stacks).most_common():
+        print(f"  {name:<12} {count:>7} {100 * count / total:5.1f}%")
+    print(f"\nTop functions (self){f' in {stage}' if stage else ''}:")
+    for label, count in top_functions(stacks, stage):
+        print(f"  {count:>7} {100 * count / total:5.1f}%  {label}")
+
+
+if __name__ == "__main__":
+    # python -m rag.profiler start [rate] [seconds] -> sample a fraction of requests (default 1.0 for 300s)
+    # python -m rag.profiler stop
+    # python -m rag.profiler report [stage]          -> time per stage + hottest functions, latest window
+    # python -m rag.profiler export out.folded       -> collapsed stacks for flamegraph.pl / speedscope
+    cmd, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ("report", [])
+    if cmd == "start":
+        rate = float(args[0]) if args else 1.0
+        seconds = float(args[1]) if len(args) > 1 else 300.0
+        print(f"Profiling window {start_profiling(rate, seconds)}: {rate:.0%} of requests for {seconds:.0f}s")
+    elif cmd == "stop":
+        stop_profiling()
+        print("Profiling stopped.")
+    elif cmd == "report":
+        window, stacks = load_stacks()
+        _report(window, stacks, args[0] if args else None)
+    elif cmd == "export":
+        window, stacks = load_stacks()
+        out = Path(args[0]) if args else Path(f"{window}.folded")
+        out.write_text("".join(f"{s} {n}\n" for s, n in stacks.most_common()), encoding="utf-8")
+        print(f"{sum(stacks.values())} samples from window {window} -> {out}")
+    else:
+        sys.exit(f"unknown command {cmd!r} (start | stop | report | export)")
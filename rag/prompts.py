@@ -2,6 +2,40 @@ from __future__ import annotations
 
 DONT_KNOW = "I don't know based on the provided documents."
 
+# JSON schema enforced through the chat API's structured output (response_format)
+ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string"},
+        "sources": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"doc": {"type": "string"}, "page": {"type": "integer"}},
+                "required": ["doc", "page"],
+                "additionalProperties": False,
+            },
+        },
+        "quotes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"quote": {"type": "string"}, "source_index": {"type": "integer"}},
+                "required": ["quote", "source_index"],
+                "additionalProperties": False,
+            },
+        },
+        "confidence": {"type": "string", "enum": ["high", "medium", "low"]},
+    },
+    "required": ["answer", "sources", "quotes", "confidence"],
+    "additionalProperties": False,
+}
+
+JSON_RETRY_SUFFIX = (
+    "\n\nYour previous reply was not valid JSON. "
+    "Return ONLY the JSON object in the exact schema above, with no other text."
+)
+
 
 def build_prompt(question: str, contexts: list[dict]) -> str:
     """
@@ -1,19 +1,27 @@
 from __future__ import annotations
 
-from typing import Optional
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Optional
 
-import faiss
-
-from rag.barriers import RETRIEVAL_BOOST, is_barrierish, keyword_fallback_contexts
+from rag.barriers import RETRIEVAL_BOOST, keyword_fallback_contexts
+from rag.citations import verify_citations
 from rag.guardrails import looks_like_prompt_injection
-from rag.openai_client import chat
-from rag.prompts import DONT_KNOW, build_prompt
-from rag.retriever import retrieve
-from rag.validators import confidence_from_sources, normalize_result, parse_json_or_none
-
+from rag.intent import QueryIntent, classify, compare_facets
+from rag.llm_cache import CacheMiss
+from rag.memory import ConversationMemory
+from rag.openai_client import chat_json
+from rag.prefetch import PrefetchCache, retrieval_key
+from rag.prompts import ANSWER_SCHEMA, DONT_KNOW, JSON_RETRY_SUFFIX, build_prompt
+from rag.retriever import merge_by_quota, retrieve, retrieve_many, select_by_scores
+from rag.routing import DocRouter
+from rag.shards import Shard
+from rag.usage import BUDGET_MESSAGE, CACHED_ONLY, OK, REDUCED_TOP_K, budget_level
+from rag.validators import normalize_result, parse_json_partial, record_parse
+
+if TYPE_CHECKING:
+    import faiss
+    import numpy as np
 
-_TELEMED_TERMS = ("telemedicine", "telehealth", "tele-med", "tele-health", "virtual care", "telecare")
-_COMPARE_TERMS = ("compare", "versus", "vs", "overlap", "difference", "differences", "similarities", "similarity")
 
 _TELEMED_BOOST = (
     "Focus: telemedicine/telehealth in primary care; workflow; reimbursement/payment; licensure; regulation; "
@@ -25,47 +33,48 @@ _COMPARE_BOOST = (
     "If comparing interoperability and telemedicine, retrieve both families."
 )
 
+# Comparison questions: one sub-query per facet, each searched for FACET_TOP_K and
+# contributing at most FACET_QUOTA contexts (vs. one query with top_k 20)
+FACET_TOP_K = 8
+FACET_QUOTA = 5
 
-def _is_telemed_q(q: str) -> bool:
-    ql = (q or "").lower()
-    return any(t in ql for t in _TELEMED_TERMS)
-
-
-def _is_compare_q(q: str) -> bool:
-    ql = (q or "").lower()
-    return any(t in ql for t in _COMPARE_TERMS)
-
+# Fixed retrieval hints; embedded once per process (see retriever.hint_vectors, rag/warmup.py)
+BOOST_TEXTS = (RETRIEVAL_BOOST, _TELEMED_BOOST, _COMPARE_BOOST)
 
-def _telemed_context_score(c: dict) -> int:
-    doc = (c.get("doc") or "").lower()
-    text = (c.get("text") or "").lower()
-    topics = set(c.get("topics", []) or [])
-    score = 0
-    if "telemedicine" in doc or "telehealth" in doc:
-        score += 3
-    if "telemedicine" in topics:
-        score += 3
-    if any(t in text for t in ("telemedicine", "telehealth", "tele-med", "tele-health", "virtual care")):
-        score += 1
-    return score
 
-
-def _prefer_telemed_contexts(question: str, contexts: list[dict]) -> list[dict]:
-    if not _is_telemed_q(question) or not contexts:
+def _prefer_telemed_contexts(telemed_q: bool, contexts: list[dict]) -> list[dict]:
+    if not telemed_q or not contexts:
         return contexts
-    return sorted(contexts, key=_telemed_context_score, reverse=True)
+    # telemed_signal is precomputed per chunk (rag.intent.telemed_signal)
+    return sorted(contexts, key=lambda c: c.get("telemed_signal", 0), reverse=True)
 
 
 def _drop_injections(contexts: list[dict]) -> list[dict]:
     return [c for c in contexts if not looks_like_prompt_injection(c.get("text", ""))]
 
 
-def _run_llm(question: str, contexts: list[dict], memory_block: str) -> dict:
+def _run_llm(question: str, contexts: list[dict], memory_block: str, cached_only: bool = False) -> dict:
     prompt = build_prompt(memory_block + question, contexts)
-    raw = chat(prompt).strip()
+    try:
+        raw = chat_json(prompt, ANSWER_SCHEMA, cached_only=cached_only)
+    except CacheMiss:
+        # over budget and never answered before: degrade instead of failing
+        return {"answer": BUDGET_MESSAGE, "sources": [], "quotes": [], "budget_exhausted": True}
+
+    data, status = parse_json_partial(raw)
+    record_parse(status)
+
+    # one bounded retry, only when the output was malformed (not for empty/refusals)
+    if data is None and status == "malformed":
+        record_parse("retried")
+        try:
+            data, status = parse_json_partial(chat_json(prompt + JSON_RETRY_SUFFIX, ANSWER_SCHEMA, cached_only=cached_only))
+        except CacheMiss:
+            data, status = None, "empty"
+        record_parse(status)
 
-    data = parse_json_or_none(raw)
     if data is None:
+        record_parse("wasted")
         return {"answer": DONT_KNOW, "sources": [], "quotes": [], "confidence": "low"}
 
     answer, sources, quotes = normalize_result(
@@ -74,6 +83,9 @@ def _run_llm(question: str, contexts: list[dict], memory_block: str) -> dict:
         data.get("quotes", []),
     )
 
+    # Citations must point at retrieved contexts; quotes must appear in them
+    sources, quotes, report = verify_citations(sources, quotes, contexts)
+
     # STRICT grounding
     if answer == DONT_KNOW or len(sources) == 0:
         return {"answer": DONT_KNOW, "sources": [], "quotes": [], "confidence": "low"}
@@ -82,7 +94,8 @@ def _run_llm(question: str, contexts: list[dict], memory_block: str) -> dict:
         "answer": answer,
         "sources": sources,
         "quotes": quotes,
-        "confidence": confidence_from_sources(len(sources)),
+        "confidence": report["confidence"],
+        "evidence": report["evidence"],
     }
 
 
@@ -99,82 +112,255 @@ def _build_memory(history: Optional[list[str]]) -> tuple[list[str], str]:
     return last_questions, memory_block
 
 
-def answer_question_structured(
-    question: str,
-    index: faiss.Index,
-    meta: list[dict],
-    top_k: int = 5,
-    history: Optional[list[str]] = None,
-    doc_filter: Optional[list[str]] = None,
-    year_filter: Optional[int] = None,
-    category_filter: Optional[str] = None,
-    topic_filter: Optional[list[str]] = None,
-) -> dict:
-    if looks_like_prompt_injection(question):
-        return {"answer": DONT_KNOW, "sources": [], "quotes": [], "confidence": "low"}
+@dataclass(frozen=True)
+class RetrievalPlan:
+    query: str                      # question (+ previous questions) to embed
+    hints: tuple[str, ...]          # boost texts blended into the query vector
+    top_k: int
+    intent: QueryIntent
+    facets: tuple[str, ...] = ()    # per-facet sub-queries for comparison questions
+
+
+def _hints_for(intent: QueryIntent) -> tuple[str, ...]:
+    hints: list[str] = []
+    if intent.barrier:
+        hints.append(RETRIEVAL_BOOST)
+    if intent.telemed:
+        hints.append(_TELEMED_BOOST)
+    if intent.compare:
+        hints.append(_COMPARE_BOOST)
+    return tuple(hints)
+
 
-    last_questions, memory_block = _build_memory(history)
+def _facet_hints(facet: str) -> tuple[str, ...]:
+    # A facet is one side of the comparison: no compare boost
+    return tuple(h for h in _hints_for(classify(facet)) if h != _COMPARE_BOOST)
 
+
+def _plan_retrieval(question: str, last_questions: list[str], top_k: int) -> RetrievalPlan:
     retrieval_query = (question or "").strip()
     if last_questions:
         retrieval_query += "\n\nPrevious questions:\n" + "\n".join(last_questions)
 
-    barrierish = is_barrierish(question)
-    telemed_q = _is_telemed_q(question)
-    compare_q = _is_compare_q(question)
-
-    if barrierish:
-        retrieval_query += "\n\n" + RETRIEVAL_BOOST
-    if telemed_q:
-        retrieval_query += "\n\n" + _TELEMED_BOOST
-    if compare_q:
-        retrieval_query += "\n\n" + _COMPARE_BOOST
+    intent = classify(question)
+    facets = compare_facets(question) if intent.compare else ()
 
     effective_top_k = top_k
-    if barrierish:
+    if intent.barrier:
         effective_top_k = max(effective_top_k, 10)
-    if compare_q:
+    if intent.compare and not facets:
         effective_top_k = max(effective_top_k, 20)
 
-    contexts = retrieve(
-        retrieval_query,
+    return RetrievalPlan(retrieval_query, _hints_for(intent), effective_top_k, intent, facets)
+
+
+def _retrieve_facets(
+    plan: RetrievalPlan,
+    index: faiss.Index,
+    meta: list[dict],
+    doc_filter: Optional[list[str]],
+    year_filter: Optional[int],
+    category_filter: Optional[str],
+    topic_filter: Optional[list[str]],
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]],
+    shards: Optional[list[Shard]],
+    router: Optional[DocRouter],
+) -> Optional[list[dict]]:
+    """
+    Comparison retrieval: all facet sub-queries embedded in one batch and searched in
+    one matrix call, then merged so each facet gets up to FACET_QUOTA contexts.
+    Returns None when no facet has relevant results (out of scope).
+    """
+    per_facet = retrieve_many(
+        plan.facets,
         index=index,
         meta=meta,
-        top_k=effective_top_k,
+        top_k=FACET_TOP_K,
         doc_filter=doc_filter,
         year_filter=year_filter,
         category_filter=category_filter,
         topic_filter=topic_filter,
+        hierarchy=hierarchy,
+        shards=shards,
+        hints=[_facet_hints(f) for f in plan.facets],
+        router=router,
     )
+    if not any(per_facet):
+        return []
+
+    quota = min(FACET_QUOTA, plan.top_k)
+    per_facet = [_drop_injections(select_by_scores(c, quota)) for c in per_facet]
+    if not any(per_facet):
+        return None
+    return merge_by_quota(per_facet, quota)
+
+
+def _retrieve_contexts(
+    plan: RetrievalPlan,
+    index: faiss.Index,
+    meta: list[dict],
+    doc_filter: Optional[list[str]],
+    year_filter: Optional[int],
+    category_filter: Optional[str],
+    topic_filter: Optional[list[str]],
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]],
+    shards: Optional[list[Shard]] = None,
+    router: Optional[DocRouter] = None,
+) -> list[dict]:
+    telemed_q = plan.intent.telemed
+
+    if plan.facets:
+        contexts = _retrieve_facets(
+            plan, index, meta, doc_filter, year_filter, category_filter, topic_filter, hierarchy, shards, router
+        )
+        if contexts is None:
+            return []
+    else:
+        contexts = retrieve(
+            plan.query,
+            index=index,
+            meta=meta,
+            top_k=plan.top_k,
+            doc_filter=doc_filter,
+            year_filter=year_filter,
+            category_filter=category_filter,
+            topic_filter=topic_filter,
+            hierarchy=hierarchy,
+            shards=shards,
+            hints=plan.hints,
+            router=router,
+        )
 
-    contexts = _prefer_telemed_contexts(question, _drop_injections(contexts))
+        # Results exist but none is relevant enough: out of scope, skip the fallback too
+        if contexts:
+            contexts = select_by_scores(contexts, plan.top_k)
+            if not contexts:
+                return []
+
+        contexts = _prefer_telemed_contexts(telemed_q, _drop_injections(contexts))
 
     # Fallback if nothing retrieved
     if not contexts:
         fallback = keyword_fallback_contexts(
             meta=meta,
-            top_k=effective_top_k,
+            top_k=plan.top_k,
             doc_filter=doc_filter,
             year_filter=year_filter,
             category_filter=category_filter,
             topic_filter=topic_filter,
         )
-        contexts = _prefer_telemed_contexts(question, fallback)
+        contexts = _prefer_telemed_contexts(telemed_q, fallback)
+
+    return contexts
+
+
+def prefetch_retrieval(
+    prefetch: PrefetchCache,
+    question: str,
+    index: faiss.Index,
+    meta: list[dict],
+    top_k: int = 5,
+    history: Optional[list[str]] = None,
+    doc_filter: Optional[list[str]] = None,
+    year_filter: Optional[int] = None,
+    category_filter: Optional[str] = None,
+    topic_filter: Optional[list[str]] = None,
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    shards: Optional[list[Shard]] = None,
+    memory: Optional[ConversationMemory] = None,
+    router: Optional[DocRouter] = None,
+) -> None:
+    """
+    Start embedding + search for a likely next question in the background.
+    A later answer_question_structured(..., prefetch=prefetch) with the same
+    question/history/filters picks up the warm contexts instead of retrieving again.
+    Skipped once the usage budget is nearly spent (see rag/usage.py).
+    """
+    if looks_like_prompt_injection(question) or budget_level() != OK:
+        return
+
+    last_questions = memory.recent_questions() if memory is not None else _build_memory(history)[0]
+    plan = _plan_retrieval(question, last_questions, top_k)
+    key = retrieval_key(plan.query, plan.top_k, doc_filter, year_filter, category_filter, topic_filter)
+    prefetch.submit(
+        key,
+        _retrieve_contexts,
+        plan,
+        index,
+        meta,
+        doc_filter,
+        year_filter,
+        category_filter,
+        topic_filter,
+        hierarchy,
+        shards,
+        router,
+    )
+
+
+def answer_question_structured(
+    question: str,
+    index: faiss.Index,
+    meta: list[dict],
+    top_k: int = 5,
+    history: Optional[list[str]] = None,
+    doc_filter: Optional[list[str]] = None,
+    year_filter: Optional[int] = None,
+    category_filter: Optional[str] = None,
+    topic_filter: Optional[list[str]] = None,
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    prefetch: Optional[PrefetchCache] = None,
+    shards: Optional[list[Shard]] = None,
+    memory: Optional[ConversationMemory] = None,
+    router: Optional[DocRouter] = None,
+) -> dict:
+    if looks_like_prompt_injection(question):
+        return {"answer": DONT_KNOW, "sources": [], "quotes": [], "confidence": "low"}
+
+    if memory is not None:
+        last_questions, memory_block = memory.recent_questions(), memory.render()
+    else:
+        last_questions, memory_block = _build_memory(history)
+
+    # Near the usage budget: fewer contexts (smaller prompt); at it: cached answers only
+    level = budget_level()
+    plan = _plan_retrieval(question, last_questions, top_k)
+    if level != OK:
+        plan = replace(plan, top_k=min(plan.top_k, REDUCED_TOP_K))
+
+    contexts = None
+    if prefetch is not None:
+        key = retrieval_key(plan.query, plan.top_k, doc_filter, year_filter, category_filter, topic_filter)
+        contexts = prefetch.take(key)
+
+    if contexts is None:
+        contexts = _retrieve_contexts(
+            plan,
+            index,
+            meta,
+            doc_filter,
+            year_filter,
+            category_filter,
+            topic_filter,
+            hierarchy,
+            shards,
+            router,
+        )
 
     if not contexts:
         return {"answer": DONT_KNOW, "sources": [], "quotes": [], "confidence": "low"}
 
-    # For compare questions: force a grounded 2-part answer + cautious overlap
-    if compare_q:
+    # For compare questions: force a grounded per-facet answer + cautious overlap
+    if plan.intent.compare:
+        facets = plan.facets or ("Interoperability barriers", "Telemedicine barriers")
         question = (
             question
             + "\n\nAnswer format required:\n"
-            + "1) Interoperability barriers (with sources)\n"
-            + "2) Telemedicine barriers (with sources)\n"
-            + "3) Overlap (ONLY if overlap is explicitly supported by the provided sources; otherwise say 'Overlap not explicitly supported')\n"
+            + "".join(f"{i}) {facet} (with sources)\n" for i, facet in enumerate(facets, 1))
+            + f"{len(facets) + 1}) Overlap (ONLY if overlap is explicitly supported by the provided sources; otherwise say 'Overlap not explicitly supported')\n"
         )
 
-    return _run_llm(question, contexts, memory_block)
+    return _run_llm(question, contexts, memory_block, cached_only=level == CACHED_ONLY)
 
 
 def answer_question(
@@ -187,6 +373,10 @@ def answer_question(
     year_filter: Optional[int] = None,
     category_filter: Optional[str] = None,
     topic_filter: Optional[list[str]] = None,
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    shards: Optional[list[Shard]] = None,
+    memory: Optional[ConversationMemory] = None,
+    router: Optional[DocRouter] = None,
 ) -> str:
     return answer_question_structured(
         question=question,
@@ -198,5 +388,9 @@ def answer_question(
         year_filter=year_filter,
         category_filter=category_filter,
         topic_filter=topic_filter,
+        hierarchy=hierarchy,
+        shards=shards,
+        memory=memory,
+        router=router,
     )["answer"]
 
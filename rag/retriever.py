@@ -1,80 +1,425 @@
-from typing import Optional
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Optional, Sequence
 
-import faiss
 import numpy as np
 
-from rag.openai_client import embed_text
+from rag.filters import filter_mask
+from rag.embeddings import embed_texts
+from rag.expansion import expansion_table
+from rag.index_store import flat_vectors
+
+if TYPE_CHECKING:
+    import faiss
+
+    from rag.routing import DocRouter
+    from rag.shards import Shard
+
+# Score-based context selection (cosine similarity on normalized vectors).
+# MIN_RELEVANCE is calibrated with calibrate_min_relevance() on in-scope vs
+# out-of-scope questions; re-run it after changing the embedding model.
+# It gates the raw query-vector similarity ("relevance"), not the hint/expansion
+# blended search score, which any query sharing a corpus term is pulled up by.
+MIN_RELEVANCE = 0.25
+RELATIVE_FLOOR = 0.7    # drop chunks scoring below 70% of the best chunk
+SCORE_GAP = 0.1         # a drop this large between neighbours ends the useful context
+MIN_CONTEXTS = 3
+
+# Masks selecting at most this fraction of a flat index are scored by gathering
+# just those rows (cost ~ selected rows) instead of a bitmap-filtered full scan.
+GATHER_MAX_FRACTION = 0.5
+
+# Maximal marginal relevance over a pool of MMR_POOL * top_k candidates:
+# score = MMR_LAMBDA * relevance - (1 - MMR_LAMBDA) * max similarity to already
+# selected chunks (1.0 = plain top-k). Overlapping chunks of one page mostly
+# repeat each other, so at most MAX_PER_PAGE per (doc, page), MAX_PER_DOC per doc.
+MMR_LAMBDA = 0.7
+MMR_POOL = 3
+MAX_PER_PAGE = 2
+MAX_PER_DOC: Optional[int] = None
+
+
+# Fixed retrieval hints (boost texts) are embedded once per process and mixed
+# into the query vector together with the query's corpus expansion vector
+# (rag/expansion.py), so each query embeds only its own text.
+HINT_WEIGHT = 0.5
+
+_hint_vectors: dict[str, np.ndarray] = {}
+_hint_lock = threading.Lock()
+
+
+def hint_vectors(texts: Sequence[str]) -> list[np.ndarray]:
+    """Normalized embeddings of fixed hint texts (cached; missing ones embedded in one batch)."""
+    import faiss
+
+    with _hint_lock:
+        missing = [t for t in dict.fromkeys(texts) if t not in _hint_vectors]
+    if missing:
+        X = np.array(embed_texts(missing), dtype="float32")
+        faiss.normalize_L2(X)
+        with _hint_lock:
+            _hint_vectors.update(zip(missing, X))
+    return [_hint_vectors[t] for t in texts]
+
+
+def clear_hint_vectors() -> None:
+    """Forget cached hint embeddings (after switching the embedding provider)."""
+    with _hint_lock:
+        _hint_vectors.clear()
+
 
+def _search(index: faiss.Index, Q: np.ndarray, k: int, mask: Optional[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """index.search for a (nq, dim) query matrix, restricted to rows where mask is True."""
+    import faiss
 
-def _expand_query(query: str) -> str:
+    if mask is None:
+        return index.search(Q, k)
+
+    rows = np.flatnonzero(mask)
+    xb = flat_vectors(index) if rows.size <= GATHER_MAX_FRACTION * index.ntotal else None
+    if xb is not None and index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        k = min(k, rows.size)
+        if k == 0:
+            return np.empty((len(Q), 0), dtype="float32"), np.empty((len(Q), 0), dtype="int64")
+        S = Q @ xb[rows].T
+        top = np.argpartition(-S, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(S, top, axis=1), axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        return np.take_along_axis(S, top, axis=1), rows[top]
+
+    # FAISS bitmap selector: skips unselected rows during the scan
+    bits = np.packbits(mask, bitorder="little")
+    sel = faiss.IDSelectorBitmap(mask.size, faiss.swig_ptr(bits))
+    return index.search(Q, k, params=faiss.SearchParameters(sel=sel))
+
+
+def mmr_select(
+    V: np.ndarray,
+    relevance: np.ndarray,
+    k: int,
+    lambda_: float = MMR_LAMBDA,
+    groups: Optional[Sequence[Sequence[object]]] = None,
+    caps: Sequence[Optional[int]] = (),
+) -> list[int]:
     """
-    Tiny query expansion to improve retrieval for vague wording.
-    This does NOT change grounding, it only helps retrieval find better chunks.
+    Greedy MMR over n candidates with normalized vectors V (n, dim) and query
+    relevance scores (n,). Returns up to k candidate positions in selection order.
+    `groups[g][i]` is candidate i's key under grouping g (e.g. its doc); at most
+    `caps[g]` candidates per key are selected (None = no cap).
     """
-    q = (query or "").strip()
-    q_lower = q.lower()
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
 
-    expansions: list[str] = []
+    relevance = np.asarray(relevance, dtype="float32")
+    sim = V @ V.T
+    max_sim = np.zeros(n, dtype="float32")
+    available = np.ones(n, dtype=bool)
+
+    # group keys -> integer codes, so a full group is masked out in one step
+    capped: list[tuple[np.ndarray, int]] = []
+    for g, cap in enumerate(caps):
+        if cap is not None:
+            codes: dict[object, int] = {}
+            capped.append((np.array([codes.setdefault(key, len(codes)) for key in groups[g]]), cap))
+    counts = [np.zeros(n, dtype="int32") for _ in capped]
+
+    chosen: list[int] = []
+    while len(chosen) < k and available.any():
+        mmr = lambda_ * relevance - (1.0 - lambda_) * max_sim
+        j = int(np.argmax(np.where(available, mmr, -np.inf)))
+        chosen.append(j)
+        available[j] = False
+        max_sim = np.maximum(max_sim, sim[j])
+
+        for (codes, cap), count in zip(capped, counts):
+            count[codes[j]] += 1
+            if count[codes[j]] >= cap:
+                available &= codes != codes[j]
+    return chosen
+
+
+def candidate_vectors(index: faiss.Index, rows: Sequence[int]) -> Optional[np.ndarray]:
+    """Stored vectors of index rows (flat view, else reconstruct); None if not retrievable."""
+    xb = flat_vectors(index)
+    if xb is not None:
+        return xb[np.asarray(rows, dtype="int64")]
+    try:
+        return index.reconstruct_batch(np.asarray(rows, dtype="int64"))
+    except RuntimeError:
+        return None  # e.g. IVF without a direct map
+
+
+def _diversify(index: faiss.Index, meta: list[dict], hits: list[tuple[int, float]], top_k: int, mmr_lambda: float) -> list[tuple[int, float]]:
+    """MMR + per-page/doc caps over score-sorted (row, score) hits; result stays score-sorted."""
+    if len(hits) <= 1:
+        return hits[:top_k]
+    V = candidate_vectors(index, [row for row, _ in hits])
+    if V is None:
+        return hits[:top_k]
+
+    picked = mmr_select(
+        V,
+        np.array([score for _, score in hits], dtype="float32"),
+        top_k,
+        mmr_lambda,
+        groups=(
+            [(meta[row]["doc"], meta[row]["page"]) for row, _ in hits],
+            [meta[row]["doc"] for row, _ in hits],
+        ),
+        caps=(MAX_PER_PAGE, MAX_PER_DOC),
+    )
+    # select_by_scores expects score order
+    return [hits[i] for i in sorted(picked)]
 
-    if (
-        "prior authorization" in q_lower
-        or "prior auth" in q_lower
-        or "utilization management" in q_lower
-        or "prior-authorization" in q_lower
-    ):
-        expansions.extend(
-            [
-                "delays in care",
-                "administrative burden",
-                "paperwork",
-                "denials",
-                "appeals",
-                "cost",
-                "access",
-                "quality",
-                "patient outcomes",
-            ]
-        )
 
-    if (
-        "pay for performance" in q_lower
-        or "pay-for-performance" in q_lower
-        or "p4p" in q_lower
-        or "performance-based payment" in q_lower
-        or "performance based payment" in q_lower
-        or "performance-based reimbursement" in q_lower
-    ):
-        expansions.extend(
+def _to_context(item: dict, score: float, relevance: Optional[float] = None) -> dict:
+    return {
+        "score": float(score),
+        "relevance": float(score if relevance is None else relevance),
+        "doc": item["doc"],
+        "page": item["page"],
+        "chunk_id": item["chunk_id"],
+        "text": item["text"],
+        "year": item.get("year"),
+        "topics": item.get("topics", []),
+        "category": item.get("category"),
+        "alt_citations": item.get("alt_citations", []),
+        "telemed_signal": item.get("telemed_signal", 0),
+    }
+
+
+def embed_raw_queries(queries: Sequence[str]) -> np.ndarray:
+    """Embed queries in one batch as they are; normalized (len(queries), dim) float32."""
+    import faiss
+
+    Q = np.array(embed_texts([(q or "").strip() for q in queries]), dtype="float32")
+    faiss.normalize_L2(Q)
+    return Q
+
+
+def embed_queries(queries: Sequence[str], hints: Optional[Sequence[Sequence[str]]] = None) -> np.ndarray:
+    """
+    Embed queries in one batch and blend into each the cached vectors of its hints
+    plus its expansion vector from the corpus term table (rag/expansion.py);
+    returns a normalized (len(queries), dim) float32 matrix. Hints and expansions
+    only steer retrieval, not grounding.
+    """
+    return blend_queries(embed_raw_queries(queries), queries, hints)
+
+
+def blend_queries(
+    raw: np.ndarray,
+    queries: Sequence[str],
+    hints: Optional[Sequence[Sequence[str]]] = None,
+) -> np.ndarray:
+    """Search vectors: raw query vectors with their hints and expansion blended in (see embed_queries)."""
+    import faiss
+
+    Q = raw.copy()
+    table = expansion_table()
+    for i, query in enumerate(queries):
+        vectors = hint_vectors(hints[i]) if hints else []
+        expansion = table.expand(query) if table is not None else None
+        if expansion is not None:
+            vectors.append(expansion)
+        if vectors:
+            Q[i] += HINT_WEIGHT * np.mean(vectors, axis=0)
+    faiss.normalize_L2(Q)
+    return Q
+
+
+def embed_query(query: str, hints: Sequence[str] = ()) -> np.ndarray:
+    """Single-query embed_queries; returns a normalized (1, dim) float32 matrix."""
+    return embed_queries([query], [hints])
+
+
+def _search_masked(
+    Q: np.ndarray,
+    index: faiss.Index,
+    meta: list[dict],
+    top_k: int,
+    mask: Optional[np.ndarray],
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]],
+    mmr_lambda: Optional[float] = MMR_LAMBDA,
+    raw: Optional[np.ndarray] = None,
+) -> list[list[dict]]:
+    """
+    One matrix search for all query rows -> contexts per row (MMR-diversified unless
+    mmr_lambda is None). With `raw` (unblended query vectors, same rows as Q) each
+    context's "relevance" is its chunk's similarity to the raw query.
+    """
+    pool = top_k * MMR_POOL if mmr_lambda is not None else top_k
+
+    if hierarchy is not None:
+        child_index, child_parent = hierarchy
+        child_mask = mask[child_parent] if mask is not None else None
+        oversample = min(child_index.ntotal, max(pool * 60, 400))
+        scores, ids = _search(child_index, Q, oversample, child_mask)
+
+        per_row: list[list[tuple[int, float]]] = []
+        for row_scores, row_ids in zip(scores, ids):
+            hits: list[tuple[int, float]] = []
+            seen_parents: set[int] = set()
+            for score, cidx in zip(row_scores, row_ids):
+                if cidx < 0 or cidx >= len(child_parent):
+                    continue
+
+                pidx = int(child_parent[cidx])
+                if pidx in seen_parents or pidx >= len(meta):
+                    continue
+                seen_parents.add(pidx)
+
+                hits.append((pidx, float(score)))
+                if len(hits) >= pool:
+                    break
+            per_row.append(hits)
+    else:
+        scores, ids = _search(index, Q, min(len(meta), pool), mask)
+        per_row = [
+            [(int(idx), float(score)) for score, idx in zip(row_scores, row_ids) if 0 <= idx < len(meta)]
+            for row_scores, row_ids in zip(scores, ids)
+        ]
+
+    if mmr_lambda is not None:
+        per_row = [_diversify(index, meta, hits, top_k, mmr_lambda) for hits in per_row]
+
+    results: list[list[dict]] = []
+    for i, hits in enumerate(per_row):
+        relevance: Optional[np.ndarray] = None
+        if raw is not None and hits:
+            V = candidate_vectors(index, [row for row, _ in hits])
+            relevance = V @ raw[i] if V is not None else None
+        results.append(
             [
-                "financial incentives",
-                "provider incentives",
-                "quality measures",
-                "performance metrics",
-                "outcomes",
-                "process measures",
-                "service delivery",
-                "unintended consequences",
-                "equity",
-                "gaming",
+                _to_context(meta[row], score, float(relevance[j]) if relevance is not None else None)
+                for j, (row, score) in enumerate(hits)
             ]
         )
+    return results
+
+
+def search_vectors(
+    Q: np.ndarray,
+    index: faiss.Index,
+    meta: list[dict],
+    top_k: int = 5,
+    doc_filter: Optional[list[str]] = None,
+    year_filter: Optional[int] = None,
+    category_filter: Optional[str] = None,
+    topic_filter: Optional[list[str]] = None,
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    router: Optional[DocRouter] = None,
+    mmr_lambda: Optional[float] = MMR_LAMBDA,
+    raw: Optional[np.ndarray] = None,
+) -> list[list[dict]]:
+    """
+    Filtered search for already embedded queries (one row per query; see retrieve).
+    `raw` are the same queries before blending (embed_raw_queries), for the relevance gate.
+    Filters compile to a boolean row mask (rag/filters.py) that FAISS applies
+    during the scan, so selective filters cannot starve the top_k.
+
+    With a `router` (rag/routing.py) and no doc_filter, the queries are first matched
+    against per-document centroids and only the chunks of the best documents (union
+    over all queries) are scored; if any query then gets fewer than MIN_CONTEXTS
+    hits, the full search runs instead.
+
+    Each query's top_k is picked by MMR from MMR_POOL * top_k candidates, with at
+    most MAX_PER_PAGE chunks per page (see mmr_select); mmr_lambda=None = plain top_k.
+    """
+    mask = filter_mask(meta, doc_filter, year_filter, category_filter, topic_filter)
+    if mask is not None and not mask.any():
+        return [[] for _ in range(len(Q))]
+
+    docs = sorted({d for ds in router.route_batch(Q) for d in ds}) if router is not None and not doc_filter else []
+    if docs:
+        routed = filter_mask(meta, doc_filter=docs)
+        if mask is not None:
+            routed &= mask
+        if routed.any():
+            per_query = _search_masked(Q, index, meta, top_k, routed, hierarchy, mmr_lambda, raw)
+            if all(len(results) >= min(top_k, MIN_CONTEXTS) for results in per_query):
+                return per_query
+
+    return _search_masked(Q, index, meta, top_k, mask, hierarchy, mmr_lambda, raw)
+
+
+def search_vector(
+    q: np.ndarray,
+    index: faiss.Index,
+    meta: list[dict],
+    top_k: int = 5,
+    doc_filter: Optional[list[str]] = None,
+    year_filter: Optional[int] = None,
+    category_filter: Optional[str] = None,
+    topic_filter: Optional[list[str]] = None,
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    router: Optional[DocRouter] = None,
+    mmr_lambda: Optional[float] = MMR_LAMBDA,
+    raw: Optional[np.ndarray] = None,
+) -> list[dict]:
+    """search_vectors for a single embedded query (1, dim)."""
+    return search_vectors(
+        q, index, meta, top_k, doc_filter, year_filter, category_filter, topic_filter, hierarchy, router, mmr_lambda, raw
+    )[0]
 
-    if any(w in q_lower for w in ["impact", "impacts", "effect", "effects", "consequence", "consequences"]):
-        expansions.extend(["trade-offs", "benefits", "risks", "barriers", "limitations"])
 
-    if expansions:
-        seen = set()
-        uniq: list[str] = []
-        for e in expansions:
-            if e not in seen:
-                seen.add(e)
-                uniq.append(e)
-        expansions = uniq
+def retrieve_many(
+    queries: Sequence[str],
+    index: faiss.Index,
+    meta: list[dict],
+    top_k: int = 5,
+    doc_filter: Optional[list[str]] = None,
+    year_filter: Optional[int] = None,
+    category_filter: Optional[str] = None,
+    topic_filter: Optional[list[str]] = None,
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    shards: Optional[list[Shard]] = None,
+    hints: Optional[Sequence[Sequence[str]]] = None,
+    router: Optional[DocRouter] = None,
+    mmr_lambda: Optional[float] = MMR_LAMBDA,
+) -> list[list[dict]]:
+    """
+    retrieve() for several sub-queries at once: one embedding batch and one matrix
+    search (top_k per query). `hints[i]` are the hints of queries[i].
+    """
+    raw = embed_raw_queries(queries)
+    Q = blend_queries(raw, queries, hints)
+
+    if shards:
+        from rag.shards import search_shards
 
-    if not expansions:
-        return q
+        return [
+            search_shards(
+                Q[i : i + 1],
+                shards,
+                top_k=top_k,
+                doc_filter=doc_filter,
+                year_filter=year_filter,
+                category_filter=category_filter,
+                topic_filter=topic_filter,
+                mmr_lambda=mmr_lambda,
+                raw=raw[i : i + 1],
+            )
+            for i in range(len(Q))
+        ]
 
-    return q + "\n\nHelpful retrieval hints:\n- " + "\n- ".join(expansions)
+    return search_vectors(
+        Q,
+        index,
+        meta,
+        top_k=top_k,
+        doc_filter=doc_filter,
+        year_filter=year_filter,
+        category_filter=category_filter,
+        topic_filter=topic_filter,
+        hierarchy=hierarchy,
+        router=router,
+        mmr_lambda=mmr_lambda,
+        raw=raw,
+    )
 
 
 def retrieve(
@@ -86,6 +431,11 @@ def retrieve(
     year_filter: Optional[int] = None,
     category_filter: Optional[str] = None,
     topic_filter: Optional[list[str]] = None,
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    shards: Optional[list[Shard]] = None,
+    hints: Sequence[str] = (),
+    router: Optional[DocRouter] = None,
+    mmr_lambda: Optional[float] = MMR_LAMBDA,
 ) -> list[dict]:
     """
     Vector retrieval with optional metadata filters.
@@ -93,53 +443,153 @@ def retrieve(
     Fixes vs previous version:
     - topic_filter is "ANY overlap" (not "must contain all")
     - year_filter uses stored metadata year (not filename prefix)
-    - oversample is larger so filters don't starve results
+    - filters are applied inside the FAISS scan, so they don't starve results
+
+    If `hierarchy` (child index, child->parent rows) is given, matching is done on
+    small sentence-level children and each hit is expanded to its parent chunk
+    (best child score per parent), so returned contexts stay parent-sized.
+
+    If `shards` is given, the query is embedded once and fanned out across the
+    named collections in parallel instead of searching `index` (see rag/shards.py).
+
+    `hints` are fixed focus texts (e.g. the boost texts in rag_answer) blended into
+    the query vector from a per-process cache (see embed_queries).
+
+    `router` enables two-stage retrieval on the single index: candidate documents
+    first, then only their chunks (see search_vectors). Shards are searched as before.
+
+    Results are diversified with MMR (`mmr_lambda`, 1.0 = relevance only, None = off)
+    so overlapping chunks of the same page do not fill the context.
     """
-    query = _expand_query(query)
+    return retrieve_many(
+        [query],
+        index,
+        meta,
+        top_k=top_k,
+        doc_filter=doc_filter,
+        year_filter=year_filter,
+        category_filter=category_filter,
+        topic_filter=topic_filter,
+        hierarchy=hierarchy,
+        shards=shards,
+        hints=[hints],
+        router=router,
+        mmr_lambda=mmr_lambda,
+    )[0]
 
-    q = np.array([embed_text(query)], dtype="float32")
-    faiss.normalize_L2(q)
 
-    oversample = min(len(meta), max(top_k * 30, 200))
-    scores, ids = index.search(q, oversample)
+def select_by_scores(
+    contexts: list[dict],
+    max_k: int,
+    min_relevance: float = MIN_RELEVANCE,
+    relative_floor: float = RELATIVE_FLOOR,
+    score_gap: float = SCORE_GAP,
+    min_contexts: int = MIN_CONTEXTS,
+) -> list[dict]:
+    """
+    Adaptive top-k over score-sorted vector results:
+    - no chunk's raw query relevance passes min_relevance -> [] (caller can answer
+      DONT_KNOW without the LLM)
+    - keep chunks above relative_floor * best score whose relevance passes min_relevance
+    - after min_contexts, stop at the first large score gap
+    """
+    if not contexts:
+        return []
+
+    if max(c.get("relevance", c["score"]) for c in contexts) < min_relevance:
+        return []
 
-    results: list[dict] = []
-    topic_set = set(topic_filter) if topic_filter else None
+    best = contexts[0]["score"]
+    floor = best * relative_floor
+    selected: list[dict] = []
+    prev = best
 
-    for score, idx in zip(scores[0], ids[0]):
-        if idx < 0 or idx >= len(meta):
+    for c in contexts[:max_k]:
+        score = c["score"]
+        if score < floor:
+            break
+        if c.get("relevance", score) < min_relevance:
             continue
+        if len(selected) >= min_contexts and prev - score > score_gap:
+            break
+        selected.append(c)
+        prev = score
 
-        item = meta[idx]
+    return selected
 
-        if doc_filter and item.get("doc") not in doc_filter:
-            continue
 
-        if year_filter and item.get("year") != year_filter:
-            continue
+def merge_by_quota(per_query: list[list[dict]], quota: int) -> list[dict]:
+    """
+    Merge per-facet results (each score-sorted) so every facet gets up to `quota`
+    distinct chunks, interleaved by rank; chunks found by several facets count once.
+    Each context is tagged with the "facet" (sub-query position) that selected it.
+    """
+    merged: list[dict] = []
+    seen: set[tuple] = set()
+    taken = [0] * len(per_query)
+    cursor = [0] * len(per_query)
 
-        if category_filter and item.get("category") != category_filter:
-            continue
+    while True:
+        progressed = False
+        for f, results in enumerate(per_query):
+            while taken[f] < quota and cursor[f] < len(results):
+                c = results[cursor[f]]
+                cursor[f] += 1
+                key = (c["doc"], c["chunk_id"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append({**c, "facet": f})
+                taken[f] += 1
+                progressed = True
+                break
+        if not progressed:
+            return merged
 
-        if topic_set:
-            item_topics = set(item.get("topics", []))
-            if item_topics.isdisjoint(topic_set):
-                continue
 
-        results.append(
-            {
-                "score": float(score),
-                "doc": item["doc"],
-                "page": item["page"],
-                "chunk_id": item["chunk_id"],
-                "text": item["text"],
-                "year": item.get("year"),
-                "topics": item.get("topics", []),
-                "category": item.get("category"),
-            }
-        )
+def calibrate_min_relevance(in_scope_scores: list[float], out_of_scope_scores: list[float]) -> float:
+    """
+    Pick the threshold that best separates best-chunk scores of in-scope and
+    out-of-scope questions (fewest misclassified; ties -> lower threshold).
+    """
+    candidates = sorted(set(in_scope_scores) | set(out_of_scope_scores))
+    best_t, best_err = MIN_RELEVANCE, None
 
-        if len(results) >= top_k:
-            break
+    for t in candidates:
+        err = sum(1 for s in in_scope_scores if s < t) + sum(1 for s in out_of_scope_scores if s >= t)
+        if best_err is None or err < best_err:
+            best_t, best_err = t, err
 
-    return results
+    return float(best_t)
+
+
+_CALIBRATION_IN_SCOPE = (
+    "What are the barriers to implementing telemedicine in primary care?",
+    "What are unintended consequences of pay-for-performance programs?",
+    "What are the key barriers to interoperability in health information systems?",
+    "What are common data quality problems in health information systems?",
+    "How does prior authorization affect costs and quality of care?",
+)
+_CALIBRATION_OUT_OF_SCOPE = (
+    "What is the capital of France?",
+    "What is the meaning of life?",
+    "How do I bake sourdough bread?",
+    "Who won the football world cup in 2018?",
+)
+
+
+if __name__ == "__main__":
+    from rag.index_store import load_index, load_metadata
+
+    index = load_index()
+    meta = load_metadata()
+
+    def _best(q: str) -> float:
+        res = retrieve(q, index=index, meta=meta, top_k=5)
+        return max((c["relevance"] for c in res), default=0.0)
+
+    ins = [_best(q) for q in _CALIBRATION_IN_SCOPE]
+    outs = [_best(q) for q in _CALIBRATION_OUT_OF_SCOPE]
+    print("In-scope best scores:    ", ", ".join(f"{s:.3f}" for s in ins))
+    print("Out-of-scope best scores:", ", ".join(f"{s:.3f}" for s in outs))
+    print(f"Suggested MIN_RELEVANCE: {calibrate_min_relevance(ins, outs):.3f} (current {MIN_RELEVANCE})")
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from rag.index_store import DOC_INDEX_DOCS_PATH, DOC_INDEX_PATH, load_index, write_index_info
+
+if TYPE_CHECKING:
+    import faiss
+
+# Up to this many centroid vectors per document, one per ~CHUNKS_PER_CENTROID chunks
+MAX_CENTROIDS_PER_DOC = 4
+CHUNKS_PER_CENTROID = 32
+KMEANS_ITERATIONS = 20
+
+# Route to the best documents: at least ROUTE_MIN_DOCS, plus any within ROUTE_MARGIN
+# of the best document's score, at most ROUTE_MAX_DOCS
+ROUTE_MIN_DOCS = 2
+ROUTE_MAX_DOCS = 4
+ROUTE_MARGIN = 0.08
+
+
+class DocRouter:
+    """Coarse stage of two-stage retrieval: query -> candidate documents via per-document centroids."""
+
+    def __init__(self, index: faiss.Index, docs: list[str]):
+        self.index = index
+        self.docs = docs  # centroid row -> document name
+        self.n_docs = len(set(docs))
+
+    def route_batch(
+        self,
+        Q: np.ndarray,
+        min_docs: int = ROUTE_MIN_DOCS,
+        max_docs: int = ROUTE_MAX_DOCS,
+        margin: float = ROUTE_MARGIN,
+    ) -> list[list[str]]:
+        """Best-matching documents (best first) for each row of a normalized query matrix."""
+        scores, ids = self.index.search(Q, self.index.ntotal)
+
+        routes: list[list[str]] = []
+        for row_scores, row_ids in zip(scores, ids):
+            ranked: list[tuple[str, float]] = []
+            seen: set[str] = set()
+            for score, i in zip(row_scores, row_ids):
+                if i < 0:
+                    continue
+                doc = self.docs[i]
+                if doc not in seen:
+                    seen.add(doc)
+                    ranked.append((doc, float(score)))
+
+            best = ranked[0][1] if ranked else 0.0
+            routes.append([
+                doc for rank, (doc, score) in enumerate(ranked[:max_docs]) if rank < min_docs or score >= best - margin
+            ])
+        return routes
+
+    def route(self, q: np.ndarray, **kwargs) -> list[str]:
+        """route_batch for a single (1, dim) query."""
+        return self.route_batch(q, **kwargs)[0]
+
+
+def doc_centroids(X: np.ndarray, row_docs: list[str]) -> tuple[np.ndarray, list[str]]:
+    """
+    Summary vectors per document: the mean of its chunk vectors for small documents,
+    spherical k-means centroids for larger ones. Returns (normalized vectors, doc per row).
+    """
+    import faiss
+
+    rows_by_doc: dict[str, list[int]] = {}
+    for i, doc in enumerate(row_docs):
+        rows_by_doc.setdefault(doc, []).append(i)
+
+    vectors: list[np.ndarray] = []
+    docs: list[str] = []
+    for doc, rows in rows_by_doc.items():
+        D = np.ascontiguousarray(X[rows], dtype="float32")
+        k = min(MAX_CENTROIDS_PER_DOC, math.ceil(len(rows) / CHUNKS_PER_CENTROID))
+        if k <= 1:
+            C = D.mean(axis=0, keepdims=True)
+        else:
+            km = faiss.Kmeans(D.shape[1], k, niter=KMEANS_ITERATIONS, spherical=True, seed=1234, min_points_per_centroid=1)
+            km.train(D)
+            C = km.centroids
+        vectors.append(C)
+        docs.extend([doc] * len(C))
+
+    C = np.ascontiguousarray(np.vstack(vectors), dtype="float32")
+    faiss.normalize_L2(C)
+    return C, docs
+
+
+def build_doc_index(
+    X: np.ndarray,
+    row_docs: list[str],
+    model_id: Optional[str] = None,
+    index_path: Path = DOC_INDEX_PATH,
+    docs_path: Path = DOC_INDEX_DOCS_PATH,
+) -> None:
+    """Write the document routing index for chunk vectors X (row i belongs to row_docs[i])."""
+    import faiss
+
+    C, docs = doc_centroids(X, row_docs)
+    index = faiss.IndexFlatIP(C.shape[1])
+    index.add(C)
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(index_path))
+    write_index_info(index_path, index.d, model_id)
+    docs_path.write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+
+    print(f"Doc routing index saved: {index_path} ({index.ntotal} centroids for {len(set(docs))} docs)")
+
+
+def load_doc_router(
+    index_path: Path = DOC_INDEX_PATH,
+    docs_path: Path = DOC_INDEX_DOCS_PATH,
+) -> Optional[DocRouter]:
+    """Return the document router, or None if it was not built."""
+    if not index_path.exists() or not docs_path.exists():
+        return None
+    return DocRouter(load_index(index_path), json.loads(docs_path.read_text(encoding="utf-8")))
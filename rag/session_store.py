@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Optional
+
+from rag.index_store import STORAGE
+from rag.settings import env
+
+SESSION_DB_PATH = STORAGE / "sessions.sqlite3"
+MAX_MESSAGES_PER_SESSION = 200
+SESSION_TTL_DAYS = 30
+
+# sqlite (default) | memory | redis://host:port/db
+STORE_ENV = "RAG_SESSION_STORE"
+
+
+class SessionStore(ABC):
+    """
+    Chat history + small per-session state, keyed by session id.
+    Messages are JSON-serializable dicts, kept in order and capped per session.
+    """
+
+    @abstractmethod
+    def append(self, session_id: str, message: dict) -> None:
+        ...
+
+    @abstractmethod
+    def count(self, session_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def page(self, session_id: str, offset: int, limit: int) -> list[dict]:
+        """Messages [offset, offset + limit) in chronological order."""
+
+    @abstractmethod
+    def get_state(self, session_id: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def put_state(self, session_id: str, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store (dev / tests). Lost on restart."""
+
+    def __init__(self, max_messages: int = MAX_MESSAGES_PER_SESSION):
+        self.max_messages = max_messages
+        self._messages: dict[str, list[dict]] = {}
+        self._state: dict[tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, message: dict) -> None:
+        with self._lock:
+            msgs = self._messages.setdefault(session_id, [])
+            msgs.append(message)
+            del msgs[: max(0, len(msgs) - self.max_messages)]
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return len(self._messages.get(session_id, []))
+
+    def page(self, session_id: str, offset: int, limit: int) -> list[dict]:
+        with self._lock:
+            return list(self._messages.get(session_id, [])[offset : offset + limit])
+
+    def get_state(self, session_id: str, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._state.get((session_id, key))
+
+    def put_state(self, session_id: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._state[(session_id, key)] = value
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._messages.pop(session_id, None)
+            for k in [k for k in self._state if k[0] == session_id]:
+                del self._state[k]
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Default store: one SQLite file shared by all workers (WAL mode).
+    Survives restarts; old messages beyond max_messages and idle sessions are pruned.
+    """
+
+    def __init__(
+        self,
+        path: Path = SESSION_DB_PATH,
+        max_messages: int = MAX_MESSAGES_PER_SESSION,
+        ttl_days: float = SESSION_TTL_DAYS,
+    ):
+        self.max_messages = max_messages
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " session_id TEXT NOT NULL, seq INTEGER NOT NULL, payload TEXT NOT NULL,"
+                " PRIMARY KEY (session_id, seq))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " session_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (session_id, key))"
+            )
+            cutoff = time.time() - ttl_days * 86400
+            stale = [r[0] for r in self._conn.execute(
+                "SELECT DISTINCT session_id FROM state WHERE updated_at < ?", (cutoff,)
+            )]
+            for sid in stale:
+                self._conn.execute("DELETE FROM messages WHERE session_id = ?", (sid,))
+                self._conn.execute("DELETE FROM state WHERE session_id = ?", (sid,))
+
+    def _touch(self, session_id: str) -> None:
+        self._conn.execute(
+            "INSERT INTO state (session_id, key, value, updated_at) VALUES (?, '_seen', 'null', ?) "
+            "ON CONFLICT (session_id, key) DO UPDATE SET updated_at = excluded.updated_at",
+            (session_id, time.time()),
+        )
+
+    def append(self, session_id: str, message: dict) -> None:
+        payload = json.dumps(message, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                (last,) = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), -1) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                seq = last + 1
+                self._conn.execute(
+                    "INSERT INTO messages (session_id, seq, payload) VALUES (?, ?, ?)", (session_id, seq, payload)
+                )
+                self._conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq <= ?", (session_id, seq - self.max_messages)
+                )
+                self._touch(session_id)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            (n,) = self._conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+        return n
+
+    def page(self, session_id: str, offset: int, limit: int) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM messages WHERE session_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (session_id, limit, offset),
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get_state(self, session_id: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE session_id = ? AND key = ?", (session_id, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_state(self, session_id: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO state (session_id, key, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (session_id, key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM state WHERE session_id = ?", (session_id,))
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis (or any Redis-protocol server) store. Needs the optional `redis` package.
+    Messages are a capped list per session; state is a hash; both expire after the TTL.
+    """
+
+    def __init__(self, url: str, max_messages: int = MAX_MESSAGES_PER_SESSION, ttl_days: float = SESSION_TTL_DAYS):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                f"{STORE_ENV}={url} needs the 'redis' package (pip install redis)."
+            ) from e
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+        self.max_messages = max_messages
+        self.ttl_seconds = int(ttl_days * 86400)
+
+    def _keys(self, session_id: str) -> tuple[str, str]:
+        return f"rag:session:{session_id}:messages", f"rag:session:{session_id}:state"
+
+    def append(self, session_id: str, message: dict) -> None:
+        mkey, skey = self._keys(session_id)
+        pipe = self._r.pipeline()
+        pipe.rpush(mkey, json.dumps(message, ensure_ascii=False))
+        pipe.ltrim(mkey, -self.max_messages, -1)
+        pipe.expire(mkey, self.ttl_seconds)
+        pipe.expire(skey, self.ttl_seconds)
+        pipe.execute()
+
+    def count(self, session_id: str) -> int:
+        return int(self._r.llen(self._keys(session_id)[0]))
+
+    def page(self, session_id: str, offset: int, limit: int) -> list[dict]:
+        if limit <= 0:
+            return []
+        rows = self._r.lrange(self._keys(session_id)[0], offset, offset + limit - 1)
+        return [json.loads(r) for r in rows]
+
+    def get_state(self, session_id: str, key: str) -> Optional[Any]:
+        raw = self._r.hget(self._keys(session_id)[1], key)
+        return json.loads(raw) if raw is not None else None
+
+    def put_state(self, session_id: str, key: str, value: Any) -> None:
+        skey = self._keys(session_id)[1]
+        self._r.hset(skey, key, json.dumps(value, ensure_ascii=False))
+        self._r.expire(skey, self.ttl_seconds)
+
+    def delete(self, session_id: str) -> None:
+        self._r.delete(*self._keys(session_id))
+
+
+def get_session_store() -> SessionStore:
+    """Store selected by RAG_SESSION_STORE (default: SQLite under storage/)."""
+    spec = (env(STORE_ENV) or "sqlite").strip()
+    if spec == "sqlite":
+        return SQLiteSessionStore()
+    if spec == "memory":
+        return MemorySessionStore()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(spec)
+    raise RuntimeError(f"Unknown {STORE_ENV}: {spec!r} (use sqlite, memory or redis://...)")
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """Load .env into os.environ once, on first use (not at import time)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _env_loaded = True
+
+
+def env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """os.getenv that also sees values from .env."""
+    load_env()
+    return os.getenv(name, default)
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import heapq
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from rag.index_store import COLLECTIONS_DIR, load_index, load_metadata, write_index_info
+from rag.retriever import MMR_LAMBDA, search_vector
+
+if TYPE_CHECKING:
+    import faiss
+
+SHARD_WORKERS = 8
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="rag-shard")
+
+
+class Shard:
+    """
+    One named collection: its own FAISS index + metadata.
+    Docs/categories/years are precomputed so filters can skip whole shards.
+    """
+
+    def __init__(self, name: str, index: faiss.Index, meta: list[dict], filters: Optional[dict] = None):
+        self.name = name
+        self.index = index
+        self.meta = meta
+        # extra per-collection filters (same keys as retrieve(): doc_filter, year_filter, ...)
+        self.filters = filters or {}
+        self.docs = {m.get("doc") for m in meta}
+        self.categories = {m.get("category") for m in meta}
+        self.years = {m.get("year") for m in meta}
+        self.topics = {t for m in meta for t in (m.get("topics") or [])}
+
+    def may_match(
+        self,
+        doc_filter: Optional[list[str]],
+        year_filter: Optional[int],
+        category_filter: Optional[str],
+        topic_filter: Optional[list[str]],
+    ) -> bool:
+        if doc_filter and self.docs.isdisjoint(doc_filter):
+            return False
+        if year_filter and year_filter not in self.years:
+            return False
+        if category_filter and category_filter not in self.categories:
+            return False
+        if topic_filter and self.topics.isdisjoint(topic_filter):
+            return False
+        return True
+
+
+def collection_dir(name: str) -> Path:
+    return COLLECTIONS_DIR / name
+
+
+def list_collections() -> list[str]:
+    if not COLLECTIONS_DIR.exists():
+        return []
+    return sorted(
+        p.name for p in COLLECTIONS_DIR.iterdir() if (p / "index.faiss").exists() and (p / "index_meta.jsonl").exists()
+    )
+
+
+def load_shards(
+    names: Optional[list[str]] = None,
+    filters: Optional[dict[str, dict]] = None,
+) -> list[Shard]:
+    """Load the given collections (default: all built ones). `filters` maps name -> extra filters."""
+    filters = filters or {}
+    shards: list[Shard] = []
+    for name in names or list_collections():
+        d = collection_dir(name)
+        shards.append(
+            Shard(
+                name,
+                load_index(d / "index.faiss"),
+                load_metadata(d / "index_meta.jsonl"),
+                filters.get(name),
+            )
+        )
+    return shards
+
+
+def search_shards(
+    q: np.ndarray,
+    shards: list[Shard],
+    top_k: int = 5,
+    doc_filter: Optional[list[str]] = None,
+    year_filter: Optional[int] = None,
+    category_filter: Optional[str] = None,
+    topic_filter: Optional[list[str]] = None,
+    mmr_lambda: Optional[float] = MMR_LAMBDA,
+    raw: Optional[np.ndarray] = None,
+) -> list[dict]:
+    """
+    Fan an embedded query out across shards in parallel and merge the top_k by score.
+    Shards whose precomputed docs/categories/years/topics cannot match the filters are skipped.
+    Each shard diversifies its own hits (documents never span shards, so the per-page cap holds).
+    """
+    selected = [s for s in shards if s.may_match(doc_filter, year_filter, category_filter, topic_filter)]
+    if not selected:
+        return []
+
+    def _search(shard: Shard) -> list[dict]:
+        kwargs = {
+            "doc_filter": doc_filter,
+            "year_filter": year_filter,
+            "category_filter": category_filter,
+            "topic_filter": topic_filter,
+        }
+        # per-collection filters only narrow what the request did not set
+        for k, v in shard.filters.items():
+            if kwargs.get(k) is None:
+                kwargs[k] = v
+        hits = search_vector(q, shard.index, shard.meta, top_k=top_k, mmr_lambda=mmr_lambda, raw=raw, **kwargs)
+        for h in hits:
+            h["collection"] = shard.name
+        return hits
+
+    per_shard = list(_EXECUTOR.map(_search, selected))
+    return heapq.nlargest(top_k, (h for hits in per_shard for h in hits), key=lambda h: h["score"])
+
+
+def write_collection(name: str, vectors: np.ndarray, meta: list[dict], model_id: Optional[str] = None) -> None:
+    """Write one collection shard (vectors must already be L2-normalized)."""
+    import faiss
+
+    d = collection_dir(name)
+    d.mkdir(parents=True, exist_ok=True)
+
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    faiss.write_index(index, str(d / "index.faiss"))
+    write_index_info(d / "index.faiss", index.d, model_id)
+
+    with (d / "index_meta.jsonl").open("w", encoding="utf-8") as f:
+        for m in meta:
+            f.write(json.dumps(m, ensure_ascii=False) + "\n")
+
+    print(f"Collection '{name}': {index.ntotal} vectors → {d}")
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+# Deliberately stdlib-only: every measurement runs in a fresh interpreter.
+ROOT = Path(__file__).resolve().parents[1]
+
+# What app/app.py imports before its first render
+SERVING_MODULES = (
+    "rag.filters",
+    "rag.memory",
+    "rag.prefetch",
+    "rag.rag_answer",
+    "rag.index_store",
+    "rag.session_store",
+    "rag.throttle",
+    "rag.shards",
+    "rag.warmup",
+    "rag.routing",
+    "rag.expansion",
+    "rag.profiler",
+)
+
+# Heavy dependencies that must only load on first use (first question / first API call)
+LAZY_MODULES = ("openai", "faiss", "dotenv")
+
+# Import budget for SERVING_MODULES in a cold interpreter (streamlit itself excluded)
+IMPORT_BUDGET_MS = 500.0
+BUDGET_ENV = "RAG_STARTUP_BUDGET_MS"
+
+_CHILD = r"""
+import importlib, json, sys, time
+
+modules, lazy, question = json.loads(sys.argv[1])
+out = {"phases": {}}
+
+t = time.perf_counter()
+for m in modules:
+    importlib.import_module(m)
+out["imports_ms"] = (time.perf_counter() - t) * 1000
+out["eager"] = [m for m in lazy if m in sys.modules]
+
+def phase(name, fn):
+    t = time.perf_counter()
+    value = fn()
+    out["phases"][name] = (time.perf_counter() - t) * 1000
+    return value
+
+from rag.expansion import expansion_table
+from rag.filters import columns_for
+from rag.index_store import INDEX_PATH, load_child_index, load_index, load_metadata
+from rag.routing import load_doc_router
+from rag.shards import load_shards
+
+meta = phase("load_metadata", load_metadata)
+phase("filter_options", lambda: columns_for(meta))
+if INDEX_PATH.exists():
+    index = phase("load_index", load_index)
+    hierarchy = phase("load_child_index", load_child_index)
+    shards = phase("load_shards", lambda: load_shards() or None)
+    router = phase("load_doc_router", load_doc_router)
+    phase("load_expansion_table", expansion_table)
+    if question:
+        from rag.rag_answer import answer_question_structured
+
+        phase("first_answer", lambda: answer_question_structured(
+            question, index=index, meta=meta, top_k=20, hierarchy=hierarchy, shards=shards, router=router
+        ))
+
+print(json.dumps(out))
+"""
+
+
+@dataclass
+class StartupProfile:
+    imports_ms: float
+    eager: list[str]
+    phases: dict[str, float]
+    # (module, cumulative import ms) for top-level imports, slowest first
+    modules: list[tuple[str, float]] = field(default_factory=list)
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, float]]:
+    """`-X importtime` lines -> [(top-level module, cumulative ms)], slowest first."""
+    rows: list[tuple[str, float]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name[1:].startswith(" "):
+            continue  # nested import, already counted in its parent
+        rows.append((name.strip(), int(cumulative) / 1000))
+    return sorted(rows, key=lambda r: r[1], reverse=True)
+
+
+def profile_startup(
+    modules: tuple[str, ...] = SERVING_MODULES,
+    question: Optional[str] = None,
+) -> StartupProfile:
+    """
+    Cold-start profile in a fresh interpreter: import time of `modules`, which
+    LAZY_MODULES they pulled in, per-module import cost, and the load phases
+    (metadata, index, optional first answer - that one calls the API).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD, json.dumps([list(modules), list(LAZY_MODULES), question])],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))
+        raise RuntimeError(f"Startup profile failed:\n{tail}")
+
+    data = json.loads(proc.stdout.strip().splitlines()[-1])
+    return StartupProfile(
+        imports_ms=data["imports_ms"],
+        eager=data["eager"],
+        phases=data["phases"],
+        modules=_parse_importtime(proc.stderr),
+    )
+
+
+def check_startup(budget_ms: Optional[float] = None, runs: int = 3) -> list[str]:
+    """
+    Regression check: best-of-`runs` import time must stay under the budget and
+    no LAZY_MODULES may be imported eagerly. Returns the list of failures.
+    """
+    budget = budget_ms if budget_ms is not None else float(os.getenv(BUDGET_ENV) or IMPORT_BUDGET_MS)
+    profiles = [profile_startup() for _ in range(max(1, runs))]
+    best = min(p.imports_ms for p in profiles)
+
+    failures: list[str] = []
+    if best > budget:
+        failures.append(f"imports took {best:.0f} ms (budget {budget:.0f} ms)")
+    eager = sorted({m for p in profiles for m in p.eager})
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)} (import them inside the function that needs them)")
+    return failures
+
+
+def _report(p: StartupProfile, top: int = 15) -> None:
+    print(f"Import of serving modules: {p.imports_ms:.0f} ms")
+    print(f"Eager heavy imports: {', '.join(p.eager) or 'none'}")
+    for name, ms in p.phases.items():
+        print(f"  {name:<18} {ms:8.1f} ms")
+    print("Slowest top-level imports (cumulative):")
+    for name, ms in p.modules[:top]:
+        print(f"  {name:<40} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    # python -m rag.startup                     -> profile imports + load phases
+    # python -m rag.startup answer "question"   -> ... + time to first answer (calls the API)
+    # python -m rag.startup check [budget_ms]   -> exit 1 if cold start regressed
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        problems = check_startup(float(sys.argv[2]) if len(sys.argv) > 2 else None)
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            sys.exit(1)
+        print("Cold start within budget.")
+    else:
+        question = " ".join(sys.argv[2:]) if len(sys.argv) > 2 and sys.argv[1] == "answer" else None
+        _report(profile_startup(question=question))
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+from rag.settings import env
+from rag.usage import capture_usage, charge_shared
+
+# OpenAI request budget for this process (requests/second, burst): RAG_OPENAI_RPS, RAG_OPENAI_BURST
+API_RATE = 5.0
+API_BURST = 10
+API_WAIT_SECONDS = 10.0
+
+# Concurrent answer pipelines and how many may wait for a slot: RAG_MAX_CONCURRENT, RAG_MAX_QUEUED
+MAX_CONCURRENT = 4
+MAX_QUEUED = 16
+QUEUE_WAIT_SECONDS = 20.0
+
+BUSY_MESSAGE = "The assistant is busy right now. Please try again in a few seconds."
+
+
+class Overloaded(RuntimeError):
+    """Raised instead of timing out when the service sheds load."""
+
+    def __init__(self, message: str = BUSY_MESSAGE):
+        super().__init__(message)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/second, up to `capacity` stored."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, timeout: float = API_WAIT_SECONDS) -> None:
+        """Take one token, waiting up to `timeout`; raise Overloaded otherwise."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else timeout
+            if time.monotonic() + wait > deadline:
+                raise Overloaded()
+            time.sleep(wait)
+
+
+class AdmissionQueue:
+    """At most `max_concurrent` running, `max_queued` waiting; everyone else is rejected at once."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, max_queued: int = MAX_QUEUED):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._max_queued = max_queued
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def run(self, fn: Callable[[], Any], timeout: float = QUEUE_WAIT_SECONDS) -> Any:
+        with self._lock:
+            if self._queued >= self._max_queued:
+                raise Overloaded()
+            self._queued += 1
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._queued -= 1
+        if not acquired:
+            raise Overloaded()
+        try:
+            return fn()
+        finally:
+            self._slots.release()
+
+
+class Coalescer:
+    """
+    Merge identical in-flight requests: the first caller computes,
+    concurrent callers with the same key wait for and share its result.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._inflight[key] = fut
+
+        if not leader:
+            return fut.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+# Process-wide limiters, created on first use so settings from .env apply
+_api_bucket: Optional[TokenBucket] = None
+_admission: Optional[AdmissionQueue] = None
+_coalescer = Coalescer()
+_init_lock = threading.Lock()
+
+
+def api_bucket() -> TokenBucket:
+    global _api_bucket
+    with _init_lock:
+        if _api_bucket is None:
+            _api_bucket = TokenBucket(float(env("RAG_OPENAI_RPS") or API_RATE), int(env("RAG_OPENAI_BURST") or API_BURST))
+        return _api_bucket
+
+
+def _admission_queue() -> AdmissionQueue:
+    global _admission
+    with _init_lock:
+        if _admission is None:
+            _admission = AdmissionQueue(
+                int(env("RAG_MAX_CONCURRENT") or MAX_CONCURRENT), int(env("RAG_MAX_QUEUED") or MAX_QUEUED)
+            )
+        return _admission
+
+
+def run_guarded(key: Hashable, fn: Callable[[], Any]) -> Any:
+    """
+    Coalesce identical requests, then run through the bounded admission queue.
+    The usage of the shared computation is recorded for the leader as it happens
+    and charged to every follower's own scope (session budget) once it is done.
+    """
+    admission = _admission_queue()
+    led = False
+
+    def _lead() -> tuple[Any, list[tuple]]:
+        nonlocal led
+        led = True
+        with capture_usage() as calls:
+            result = admission.run(fn)
+        return result, list(calls)
+
+    result, calls = _coalescer.run(key, _lead)
+    if not led:
+        charge_shared(calls)
+    return result
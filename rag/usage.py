@@ -0,0 +1,462 @@
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from rag.index_store import STORAGE
+from rag.settings import env
+
+USAGE_DB_PATH = STORAGE / "usage.sqlite3"
+
+# USD per 1M tokens (input, output); local models are free
+PRICES_PER_MTOK = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+# Budgets in USD (unset = unlimited): per session, and for the whole process per UTC day
+SESSION_BUDGET_ENV = "RAG_SESSION_BUDGET_USD"
+DAILY_BUDGET_ENV = "RAG_DAILY_BUDGET_USD"
+
+# Degradation: from REDUCE_AT of a budget answers use at most REDUCED_TOP_K contexts
+# and skip optional calls (follow-up prefetch, memory summaries); at the budget,
+# answers come only from the response cache / cassette.
+REDUCE_AT = 0.8
+REDUCED_TOP_K = 4
+
+FLUSH_S = 2.0               # buffered rows / counters are written at most this often
+TOTALS_REFRESH_S = 30.0     # budget checks re-read totals from the file (other workers) this often
+MAX_PENDING_ROWS = 10_000   # kept in memory while the file stays locked
+
+OK, REDUCED, CACHED_ONLY = "ok", "reduced", "cached_only"
+
+BUDGET_MESSAGE = (
+    "The usage budget for this conversation has been reached, so only previously answered "
+    "questions can be answered right now. Please try again later."
+)
+
+
+def price_per_mtok(model: str) -> tuple[float, float]:
+    """(input, output) USD per 1M tokens; unknown models count as free (tokens are still recorded)."""
+    if model.startswith("local:"):
+        return 0.0, 0.0
+    return PRICES_PER_MTOK.get(model.removeprefix("openai:"), (0.0, 0.0))
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int = 0) -> float:
+    price_in, price_out = price_per_mtok(model)
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1e6
+
+
+@dataclass(frozen=True)
+class UsageScope:
+    session_id: str
+    request_id: str
+    filters: str    # JSON of the active filters ("{}" = none)
+
+
+_scope: contextvars.ContextVar[Optional[UsageScope]] = contextvars.ContextVar("rag_usage_scope", default=None)
+
+
+def filters_key(**filters: Any) -> str:
+    """Stable JSON for a filter combination (unset filters left out)."""
+    return json.dumps({k: v for k, v in filters.items() if v not in (None, [], ())}, sort_keys=True)
+
+
+@contextmanager
+def usage_scope(session_id: str, **filters: Any) -> Iterator[UsageScope]:
+    """
+    Attribute API usage in this context to a session, a new request id and a filter
+    combination. Work handed to executors keeps the scope if submitted with
+    contextvars.copy_context().run (see rag/prefetch.py, rag/memory.py).
+    """
+    token = _scope.set(UsageScope(session_id, uuid.uuid4().hex[:12], filters_key(**filters)))
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> Optional[UsageScope]:
+    return _scope.get()
+
+
+# Kind suffix of usage copied to a coalesced request (rag/throttle.py): charged to
+# the follower's session, but not a real API call, so left out of day totals
+SHARED_SUFFIX = ":shared"
+
+_capture: contextvars.ContextVar[Optional[list[tuple]]] = contextvars.ContextVar("rag_usage_capture", default=None)
+
+
+@contextmanager
+def capture_usage() -> Iterator[list[tuple]]:
+    """Collect the (kind, model, prompt_tokens, completion_tokens) of calls recorded in this block."""
+    calls: list[tuple] = []
+    token = _capture.set(calls)
+    try:
+        yield calls
+    finally:
+        _capture.reset(token)
+
+
+def _row_filter(column: str, value: str) -> tuple[str, Callable[[tuple], bool]]:
+    """SQL condition and the same test on a buffered row: a session's usage, or a day's API calls."""
+    if column == "session_id":
+        return "session_id = ?", lambda r: r[2] == value
+    return (
+        f"day = ? AND kind NOT LIKE '%{SHARED_SUFFIX}'",
+        lambda r: r[1] == value and not r[5].endswith(SHARED_SUFFIX),
+    )
+
+
+def _utc_day(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+class UsageLedger:
+    """
+    Append-only token/cost ledger in one SQLite file (WAL mode, shared by workers).
+    One row per API call, with the session, request and filters it was made for.
+
+    Nothing is written on the request path: rows and event counters are buffered
+    in memory and written in one transaction every FLUSH_S by a daemon thread
+    (and at exit). Budget checks read in-memory running costs, re-read from the
+    file at most every TOTALS_REFRESH_S to pick up other workers' spend.
+    """
+
+    def __init__(self, path: Path = USAGE_DB_PATH, flush_s: float = FLUSH_S):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_s = flush_s
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()        # buffers and running costs
+        self._db_lock = threading.Lock()     # the connection
+        self._rows: list[tuple] = []
+        self._events: Counter[tuple[str, str]] = Counter()   # (day, name) -> count
+        self._running: dict[tuple[str, str], tuple[float, float]] = {}   # ("session"|"day", key) -> (read at, cost)
+        self._thread: Optional[threading.Thread] = None
+        with self._db_lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                " ts REAL NOT NULL, day TEXT NOT NULL, session_id TEXT, request_id TEXT, filters TEXT,"
+                " kind TEXT NOT NULL, model TEXT NOT NULL,"
+                " prompt_tokens INTEGER NOT NULL, completion_tokens INTEGER NOT NULL, cost_usd REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS usage_session ON usage (session_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS usage_day ON usage (day)")
+            # pipeline event counters per UTC day (parse outcomes, response cache hits, ...)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " day TEXT NOT NULL, name TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (day, name))"
+            )
+        if _counter_sources:
+            with self._lock:
+                self._start_flusher()
+
+    def record(
+        self,
+        kind: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int = 0,
+        scope: Optional[UsageScope] = None,
+    ) -> None:
+        now = time.time()
+        day = _utc_day(now)
+        cost = cost_usd(model, prompt_tokens, completion_tokens)
+        session_id = scope.session_id if scope else None
+        row = (
+            now,
+            day,
+            session_id,
+            scope.request_id if scope else None,
+            scope.filters if scope else None,
+            kind,
+            model,
+            prompt_tokens,
+            completion_tokens,
+            cost,
+        )
+        keys = [("session", session_id)] if kind.endswith(SHARED_SUFFIX) else [("session", session_id), ("day", day)]
+        with self._lock:
+            self._rows.append(row)
+            for key in keys:
+                if key in self._running:
+                    read_at, total = self._running[key]
+                    self._running[key] = (read_at, total + cost)
+            self._start_flusher()
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._events[(_utc_day(time.time()), name)] += n
+            self._start_flusher()
+
+    def _start_flusher(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rag-usage-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_s)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered rows and counters in one transaction; on a locked database they are kept for the next flush."""
+        # buffers are swapped under the connection lock, so readers see every row either buffered or in the file
+        deltas = _counter_deltas()
+        with self._db_lock:
+            with self._lock:
+                self._events.update({(_utc_day(time.time()), name): n for name, n in deltas.items()})
+                rows, events = self._rows, self._events
+                self._rows, self._events = [], Counter()
+            if not rows and not events:
+                return
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany("INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    self._conn.executemany(
+                        "INSERT INTO events VALUES (?, ?, ?)"
+                        " ON CONFLICT (day, name) DO UPDATE SET count = count + excluded.count",
+                        [(day, name, n) for (day, name), n in events.items()],
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.OperationalError as e:
+                print(f"Usage ledger flush failed, retrying later: {e}")
+                with self._lock:
+                    self._rows = (rows + self._rows)[-MAX_PENDING_ROWS:]
+                    self._events.update(events)
+
+    def event_counts(self, day: Optional[str] = None) -> dict[str, int]:
+        day = day or _utc_day(time.time())
+        with self._db_lock:
+            counts = Counter(dict(self._conn.execute("SELECT name, count FROM events WHERE day = ?", (day,)).fetchall()))
+            with self._lock:
+                counts.update({name: n for (d, name), n in self._events.items() if d == day})
+        return dict(sorted(counts.items()))
+
+    def session_totals(self, session_id: str) -> dict:
+        return self._totals("session_id", session_id)
+
+    def day_totals(self, day: Optional[str] = None) -> dict:
+        return self._totals("day", day or _utc_day(time.time()))
+
+    def _totals(self, column: str, value: str) -> dict:
+        where, matches = _row_filter(column, value)
+        with self._db_lock:
+            calls, prompt, completion, cost = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0),"
+                f" COALESCE(SUM(cost_usd), 0) FROM usage WHERE {where}",
+                (value,),
+            ).fetchone()
+            with self._lock:
+                pending = [r for r in self._rows if matches(r)]
+        return {
+            "calls": calls + len(pending),
+            "prompt_tokens": prompt + sum(r[7] for r in pending),
+            "completion_tokens": completion + sum(r[8] for r in pending),
+            "cost_usd": cost + sum(r[9] for r in pending),
+        }
+
+    def session_cost(self, session_id: str) -> float:
+        return self._running_cost("session", session_id)
+
+    def day_cost(self, day: Optional[str] = None) -> float:
+        return self._running_cost("day", day or _utc_day(time.time()))
+
+    def _running_cost(self, kind: str, value: str) -> float:
+        key = (kind, value)
+        with self._lock:
+            entry = self._running.get(key)
+        if entry is not None and time.time() - entry[0] < TOTALS_REFRESH_S:
+            return entry[1]
+        where, matches = _row_filter("session_id" if kind == "session" else "day", value)
+        try:
+            with self._db_lock:
+                (flushed,) = self._conn.execute(
+                    f"SELECT COALESCE(SUM(cost_usd), 0) FROM usage WHERE {where}", (value,)
+                ).fetchone()
+                with self._lock:
+                    # buffered rows are not in the file yet; later ones are added by record()
+                    total = flushed + sum(r[9] for r in self._rows if matches(r))
+                    now = time.time()
+                    self._running = {k: v for k, v in self._running.items() if now - v[0] < TOTALS_REFRESH_S}
+                    self._running[key] = (now, total)
+        except sqlite3.OperationalError as e:
+            print(f"Usage ledger read failed: {e}")
+            return entry[1] if entry is not None else 0.0
+        return total
+
+    def summary(self, by: str = "day", limit: int = 20) -> list[tuple]:
+        """(group, kind, calls, prompt tokens, completion tokens, cost) per group, costliest first."""
+        column = {"day": "day", "session": "session_id", "filters": "filters", "model": "model"}[by]
+        self.flush()
+        with self._db_lock:
+            return self._conn.execute(
+                f"SELECT {column}, kind, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd)"
+                f" FROM usage GROUP BY {column}, kind ORDER BY SUM(cost_usd) DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def close(self) -> None:
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+_ledger: Optional[UsageLedger] = None
+_ledger_lock = threading.Lock()
+
+# (prefix, snapshot of cumulative in-process counters), see export_counters
+_counter_sources: list[tuple[str, Callable[[], dict[str, int]]]] = []
+_exported: Counter[str] = Counter()
+_exported_lock = threading.Lock()
+
+
+def get_ledger() -> UsageLedger:
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UsageLedger()
+        return _ledger
+
+
+def export_counters(prefix: str, snapshot: Callable[[], dict[str, int]]) -> None:
+    """
+    Copy a module's cumulative in-process counters (e.g. response cache hits) into
+    today's events as `prefix.name` on every ledger flush, instead of a write per event.
+    """
+    with _exported_lock:
+        _counter_sources.append((prefix, snapshot))
+
+
+def _counter_deltas() -> dict[str, int]:
+    """Counter increments since the last export."""
+    with _exported_lock:
+        current = {f"{prefix}.{name}": n for prefix, snapshot in _counter_sources for name, n in snapshot().items()}
+        deltas = {name: n - _exported[name] for name, n in current.items() if n > _exported[name]}
+        _exported.update(deltas)
+    return deltas
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    try:
+        if _ledger is not None:
+            _ledger.flush()
+        elif (deltas := _counter_deltas()):
+            # no API call in this process (e.g. replay): still keep its counters
+            ledger = get_ledger()
+            for name, n in deltas.items():
+                ledger.count(name, n)
+            ledger.flush()
+    except sqlite3.Error as e:
+        print(f"Usage ledger flush failed: {e}")
+
+
+def record_usage(kind: str, model: str, prompt_tokens: int, completion_tokens: int = 0) -> None:
+    """Record one API call for the current scope (buffered); the ledger never fails a request."""
+    calls = _capture.get()
+    if calls is not None:
+        calls.append((kind, model, prompt_tokens, completion_tokens))
+    try:
+        get_ledger().record(kind, model, prompt_tokens, completion_tokens, _scope.get())
+    except sqlite3.Error as e:
+        print(f"Usage ledger write failed: {e}")
+
+
+def charge_shared(calls: list[tuple]) -> None:
+    """Charge the current scope for calls made on its behalf by a coalesced request (see capture_usage)."""
+    for kind, model, prompt_tokens, completion_tokens in calls:
+        try:
+            get_ledger().record(kind + SHARED_SUFFIX, model, prompt_tokens, completion_tokens, _scope.get())
+        except sqlite3.Error as e:
+            print(f"Usage ledger write failed: {e}")
+
+
+def record_event(name: str, n: int = 1) -> None:
+    """Count a pipeline event for today (e.g. "parse.malformed"; buffered); never fails a request."""
+    try:
+        get_ledger().count(name, n)
+    except sqlite3.Error as e:
+        print(f"Usage ledger write failed: {e}")
+
+
+def _budget(name: str) -> Optional[float]:
+    value = env(name)
+    return float(value) if value else None
+
+
+def budget_level(session_id: Optional[str] = None) -> str:
+    """
+    OK, REDUCED or CACHED_ONLY for a session (default: the current scope's),
+    from the worse of its session budget and today's global budget.
+    """
+    session_budget, daily_budget = _budget(SESSION_BUDGET_ENV), _budget(DAILY_BUDGET_ENV)
+    if session_budget is None and daily_budget is None:
+        return OK
+
+    if session_id is None:
+        scope = _scope.get()
+        session_id = scope.session_id if scope else None
+
+    try:
+        ledger = get_ledger()
+    except sqlite3.Error as e:
+        print(f"Usage ledger unavailable: {e}")
+        return OK
+    fractions: list[float] = []
+    if session_budget is not None and session_id is not None:
+        fractions.append(ledger.session_cost(session_id) / session_budget if session_budget > 0 else 1.0)
+    if daily_budget is not None:
+        fractions.append(ledger.day_cost() / daily_budget if daily_budget > 0 else 1.0)
+
+    used = max(fractions, default=0.0)
+    if used >= 1.0:
+        return CACHED_ONLY
+    if used >= REDUCE_AT:
+        return REDUCED
+    return OK
+
+
+def _report_events(counts: dict[str, int]) -> None:
+    calls = counts.get("parse.calls", 0)
+    print(f"LLM answer calls today: {calls}")
+    for name, n in counts.items():
+        share = f" ({100 * n / calls:.1f}% of calls)" if calls and name.startswith("parse.") and name != "parse.calls" else ""
+        print(f"  {name:<24} {n:>8}{share}")
+    lookups = counts.get("cache.hit", 0) + counts.get("cache.miss", 0)
+    if lookups:
+        print(f"Response cache hit rate: {100 * counts.get('cache.hit', 0) / lookups:.1f}% of {lookups} lookups")
+
+
+if __name__ == "__main__":
+    # python -m rag.usage [day|session|filters|model] -> spend per group
+    # python -m rag.usage events                      -> today's parse outcomes / wasted calls, cache hits
+    by = sys.argv[1] if len(sys.argv) > 1 else "day"
+    if by == "events":
+        _report_events(get_ledger().event_counts())
+        sys.exit(0)
+    rows = get_ledger().summary(by)
+    today = get_ledger().day_totals()
+    print(f"Today: {today['calls']} calls, {today['prompt_tokens']} prompt + {today['completion_tokens']} completion tokens, ${today['cost_usd']:.4f}")
+    print(f"{by:<40} {'kind':<10} {'calls':>6} {'prompt':>10} {'completion':>10} {'cost':>10}")
+    for group, kind, calls, prompt, completion, cost in rows:
+        print(f"{str(group)[:40]:<40} {kind:<10} {calls:>6} {prompt:>10} {completion:>10} ${cost:>9.4f}")
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import json
+import re
+import threading
+from collections import Counter
 from typing import Any
 
 from rag.prompts import DONT_KNOW
+from rag.usage import export_counters
 
 
 def parse_json_or_none(raw: str) -> dict | None:
@@ -14,6 +18,80 @@ def parse_json_or_none(raw: str) -> dict | None:
     return data if isinstance(data, dict) else None
 
 
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_ANSWER_RE = re.compile(r'"answer"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_SOURCE_RE = re.compile(r'\{\s*"doc"\s*:\s*"((?:[^"\\]|\\.)*)"\s*,\s*"page"\s*:\s*(\d+)\s*\}')
+_QUOTE_RE = re.compile(r'\{\s*"quote"\s*:\s*"((?:[^"\\]|\\.)*)"\s*,\s*"source_index"\s*:\s*(\d+)\s*\}')
+
+
+def _unescape(s: str) -> str:
+    try:
+        return json.loads(f'"{s}"')
+    except Exception:
+        return s
+
+
+def parse_json_partial(raw: str) -> tuple[dict | None, str]:
+    """
+    Parse model output, recovering what we can from malformed JSON.
+    Returns (data, status) with status:
+      "ok"        - valid JSON object
+      "recovered" - code fences / surrounding text stripped, or fields salvaged by regex
+      "empty"     - no output (e.g. refusal); not worth retrying
+      "malformed" - nothing usable; a retry may help
+    """
+    raw = (raw or "").strip()
+    if not raw:
+        return None, "empty"
+
+    data = parse_json_or_none(raw)
+    if data is not None:
+        return data, "ok"
+
+    stripped = _FENCE_RE.sub("", raw)
+    start, end = stripped.find("{"), stripped.rfind("}")
+    if start != -1 and end > start:
+        data = parse_json_or_none(stripped[start : end + 1])
+        if data is not None:
+            return data, "recovered"
+
+    # truncated / broken JSON: salvage complete fields
+    answer = _ANSWER_RE.search(raw)
+    sources = [{"doc": _unescape(d), "page": int(p)} for d, p in _SOURCE_RE.findall(raw)]
+    if answer and sources:
+        quotes = [{"quote": _unescape(q), "source_index": int(i)} for q, i in _QUOTE_RE.findall(raw)]
+        return {"answer": _unescape(answer.group(1)), "sources": sources, "quotes": quotes}, "recovered"
+
+    return None, "malformed"
+
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+_PARSE_STATUSES = ("ok", "recovered", "empty", "malformed")
+
+
+def record_parse(status: str) -> None:
+    """
+    Count a parse outcome (one per LLM call) or a pipeline event ("retried", "wasted")
+    in this process; the usage ledger exports the counts per day (`python -m rag.usage events`).
+    """
+    with _stats_lock:
+        if status in _PARSE_STATUSES:
+            _stats["calls"] += 1
+        _stats[status] += 1
+
+
+def parse_stats() -> dict:
+    """Counts of LLM output outcomes: calls, ok, recovered, empty, malformed, retried, wasted."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+export_counters("parse", parse_stats)
+
+
 def unique_sources(sources: list[Any]) -> list[dict]:
     seen: set[tuple[str, int]] = set()
     uniq: list[dict] = []
@@ -37,14 +115,6 @@ def unique_sources(sources: list[Any]) -> list[dict]:
     return uniq
 
 
-def confidence_from_sources(num_sources: int) -> str:
-    if num_sources <= 0:
-        return "low"
-    if num_sources <= 2:
-        return "medium"
-    return "high"
-
-
 def normalize_result(answer: Any, sources: Any, quotes: Any) -> tuple[str, list[dict], list[dict]]:
     # Answer
     if not isinstance(answer, str) or not answer.strip():
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import numpy as np
+
+from rag.index_store import ROOT, flat_vectors
+from rag.settings import env
+
+if TYPE_CHECKING:
+    import faiss
+
+    from rag.routing import DocRouter
+    from rag.shards import Shard
+
+APP_PATH = ROOT / "app" / "app.py"
+
+# Exercises the boost hints, the filters and a full-corpus scan
+WARMUP_QUERY = "What are the barriers to implementing telemedicine in primary care?"
+
+# Readiness endpoint (GET any path -> 200 when warm, 503 otherwise)
+READY_PORT_ENV = "RAG_READY_PORT"
+DEFAULT_READY_PORT = 8502
+
+# Touch one float per 4 KiB page
+_PAGE_FLOATS = 1024
+
+
+@dataclass
+class WarmupReport:
+    ready: bool = False
+    running: bool = False
+    steps: dict[str, float] = field(default_factory=dict)  # step -> ms
+    errors: dict[str, str] = field(default_factory=dict)
+
+
+_report = WarmupReport()
+_report_lock = threading.Lock()
+
+# Resources loaded by the launcher, handed over once to the app's cached loaders
+_preloaded: dict[str, Any] = {}
+_preloaded_lock = threading.Lock()
+
+
+def readiness() -> dict:
+    """Snapshot of the warmup state (what the readiness endpoint returns)."""
+    with _report_lock:
+        return asdict(_report)
+
+
+def is_ready() -> bool:
+    with _report_lock:
+        return _report.ready
+
+
+def take_preloaded(name: str, load: Callable[[], Any]) -> Any:
+    """Return the resource the launcher preloaded under `name` (once), else load it."""
+    with _preloaded_lock:
+        if name in _preloaded:
+            return _preloaded.pop(name)
+    return load()
+
+
+def touch_index(index: faiss.Index) -> None:
+    """Fault in the vector pages of a flat index; other index types get one search."""
+    if index.ntotal == 0:
+        return
+    xb = flat_vectors(index)
+    if xb is not None:
+        float(xb.reshape(-1)[::_PAGE_FLOATS].sum())
+    else:
+        index.search(np.zeros((1, index.d), dtype="float32"), 1)
+
+
+def _prime_clients() -> None:
+    from rag.embeddings import get_provider
+    from rag.llm_cache import get_mode
+    from rag.openai_client import prime_client
+
+    # loads a local model, or resolves the OpenAI provider
+    get_provider()
+    # replay serves chat and query embeddings from the cassette: no client, no API key
+    if get_mode() != "replay":
+        prime_client()
+
+
+def warmup(
+    index: faiss.Index,
+    meta: list[dict],
+    hierarchy: Optional[tuple[faiss.Index, np.ndarray]] = None,
+    shards: Optional[list[Shard]] = None,
+    router: Optional[DocRouter] = None,
+) -> WarmupReport:
+    """
+    Take the first-query costs up front, then mark the process ready:
+    - create API clients / load the local embedding model
+    - embed the fixed hint texts in one batch (this also opens the HTTPS connection)
+    - load the corpus expansion table (rag/expansion.py)
+    - fault in index pages (main, child, shards) and build the filter columns
+    - run one synthetic retrieval end to end
+    A failing step is recorded and leaves the process not ready.
+    """
+    from rag.expansion import expansion_table
+    from rag.filters import columns_for
+    from rag.rag_answer import BOOST_TEXTS
+    from rag.retriever import hint_vectors, retrieve
+
+    indexes = [index] + [s.index for s in shards or []]
+    if hierarchy is not None:
+        indexes.append(hierarchy[0])
+    if router is not None:
+        indexes.append(router.index)
+    steps: list[tuple[str, Callable[[], Any]]] = [
+        ("clients", _prime_clients),
+        ("hint_vectors", lambda: hint_vectors(BOOST_TEXTS)),
+        ("expansion_table", lambda: touch_index(table.index) if (table := expansion_table()) else None),
+        ("index_pages", lambda: [touch_index(ix) for ix in indexes]),
+        ("filter_columns", lambda: [columns_for(m) for m in [meta] + [s.meta for s in shards or []]]),
+        (
+            "synthetic_query",
+            lambda: retrieve(WARMUP_QUERY, index, meta, top_k=5, hierarchy=hierarchy, shards=shards, router=router),
+        ),
+    ]
+
+    with _report_lock:
+        _report.running = True
+        _report.ready = False
+        _report.steps.clear()
+        _report.errors.clear()
+
+    for name, step in steps:
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            with _report_lock:
+                _report.errors[name] = f"{type(e).__name__}: {e}"
+        with _report_lock:
+            _report.steps[name] = (time.perf_counter() - t0) * 1000
+
+    with _report_lock:
+        _report.running = False
+        _report.ready = not _report.errors
+        return WarmupReport(_report.ready, False, dict(_report.steps), dict(_report.errors))
+
+
+def warmup_in_background(load: Callable[[], tuple]) -> None:
+    """Load (index, meta, hierarchy, shards, router) via `load` and warm up on a daemon thread."""
+
+    def _run() -> None:
+        try:
+            warmup(*load())
+        except Exception as e:
+            with _report_lock:
+                _report.running = False
+                _report.errors["load"] = f"{type(e).__name__}: {e}"
+
+    with _report_lock:
+        if _report.running or _report.ready:
+            return
+        _report.running = True
+    threading.Thread(target=_run, name="rag-warmup", daemon=True).start()
+
+
+class _ReadinessHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        state = readiness()
+        body = json.dumps(state).encode("utf-8")
+        self.send_response(200 if state["ready"] else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def serve_readiness(port: Optional[int] = None) -> ThreadingHTTPServer:
+    """Serve the readiness state on a daemon thread (default port: RAG_READY_PORT or 8502)."""
+    port = port if port is not None else int(env(READY_PORT_ENV) or DEFAULT_READY_PORT)
+    server = ThreadingHTTPServer(("0.0.0.0", port), _ReadinessHandler)
+    threading.Thread(target=server.serve_forever, name="rag-ready", daemon=True).start()
+    return server
+
+
+def preload_and_warm() -> WarmupReport:
+    """Load the index artifacts (kept for the app's cached loaders) and warm up."""
+    from rag.index_store import load_child_index, load_index, load_metadata
+    from rag.routing import load_doc_router
+    from rag.shards import load_shards
+
+    resources = {
+        "meta": load_metadata(),
+        "index": load_index(),
+        "hierarchy": load_child_index(),
+        "shards": load_shards() or None,
+        "router": load_doc_router(),
+    }
+    with _preloaded_lock:
+        _preloaded.update(resources)
+    return warmup(
+        resources["index"], resources["meta"], resources["hierarchy"], resources["shards"], resources["router"]
+    )
+
+
+if __name__ == "__main__":
+    # python -m rag.warmup [streamlit flags]: readiness endpoint up (503), warm up in
+    # this process, then start the app here so it inherits the warm caches.
+    # Go through the importable module: this file runs as __main__, but the app
+    # reads the preloaded resources and readiness state from rag.warmup.
+    from rag import warmup as _warmup
+
+    _warmup.serve_readiness()
+    report = _warmup.preload_and_warm()
+    for step, ms in report.steps.items():
+        print(f"warmup {step:<16} {ms:8.1f} ms{'  FAILED: ' + report.errors[step] if step in report.errors else ''}")
+    print("Ready." if report.ready else "Warmup failed; readiness stays 503.")
+
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", str(APP_PATH), *sys.argv[1:]]
+    sys.exit(stcli.main())
@@ -0,0 +1,22 @@
+from rag.citations import SCORE_REF, verify_citations
+
+
+def _context(doc, page, text, score, relevance=None):
+    c = {"doc": doc, "page": page, "chunk_id": 0, "text": text, "score": score, "alt_citations": []}
+    if relevance is not None:
+        c["relevance"] = relevance
+    return c
+
+
+def test_keyword_fallback_hit_counts_do_not_raise_relevance():
+    keyword = _context("a.pdf", 1, "Broadband access limits telemedicine in rural clinics.", 5.0)
+    vector = _context("b.pdf", 2, "Reimbursement rules slow telemedicine adoption.", 0.42, relevance=0.3)
+    quote = {"quote": "Broadband access limits telemedicine", "source_index": 1}
+
+    sources, _, report = verify_citations([{"doc": "a.pdf", "page": 1}], [quote], [keyword, vector])
+    assert sources[0]["relevance"] == 0.0
+    assert report["evidence"] == 0.8  # quote + source support, no relevance term
+
+    sources, _, report = verify_citations([{"doc": "b.pdf", "page": 2}], [], [keyword, vector])
+    assert sources[0]["relevance"] == 0.3
+    assert report["evidence"] == round(0.3 + 0.2 * 0.3 / SCORE_REF, 3)
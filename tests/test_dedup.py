@@ -0,0 +1,36 @@
+from rag.dedup import NearDuplicateFilter, cluster_near_duplicates, dedupe_records
+
+PARAGRAPH = (
+    "Telemedicine adoption in rural primary care is limited by broadband access, reimbursement rules, "
+    "licensure across state lines, and clinician workflow integration. Practices reported that payer policies "
+    "changed frequently during the study period, and that patients without video-capable devices relied on "
+    "audio-only visits, which were reimbursed inconsistently across plans and states."
+)
+# the same passage as extracted from another report: case, spacing and a trailing page number differ
+REPRINT = PARAGRAPH.upper().replace(", ", " ,  ") + " 12"
+OTHER = (
+    "Prior authorization requirements delay care for patients with chronic conditions and add administrative "
+    "burden for practices, according to surveyed physicians in all three health systems."
+)
+
+
+def test_near_duplicates_collapse_and_distinct_texts_survive():
+    assert cluster_near_duplicates([PARAGRAPH, OTHER, REPRINT]) == [0, 1, 0]
+
+
+def test_dedupe_records_keeps_first_and_records_alt_citation():
+    records = [
+        {"doc": "a.pdf", "page": 1, "chunk_id": 0, "text": PARAGRAPH},
+        {"doc": "b.pdf", "page": 4, "chunk_id": 1, "text": OTHER},
+        {"doc": "c.pdf", "page": 9, "chunk_id": 2, "text": REPRINT},
+    ]
+    kept, report = dedupe_records(records)
+    assert kept == [0, 1]
+    assert records[0]["alt_citations"] == [{"doc": "c.pdf", "page": 9, "chunk_id": 2}]
+    assert "alt_citations" not in records[1]
+    assert report["chunks_removed"] == 1 and report["clusters"] == 1
+
+
+def test_streaming_filter_matches_batch_clustering():
+    f = NearDuplicateFilter()
+    assert [f.add(t) for t in (PARAGRAPH, OTHER, REPRINT)] == [None, None, 0]
@@ -0,0 +1,52 @@
+import itertools
+
+import numpy as np
+
+from rag.filters import filter_mask
+
+META = [
+    {"doc": "2019_rural.pdf", "year": 2019, "category": "telemedicine", "topics": ["telemedicine", "broadband"]},
+    {"doc": "2021_p4p.pdf", "year": None, "category": "payment", "topics": ["p4p"]},
+    {"doc": "2021_p4p.pdf", "year": None, "category": "payment", "topics": []},
+    {"doc": "ehr_review.pdf", "year": 2021, "category": None, "topics": ["ehr", "interoperability"]},
+    {"doc": "notes.txt", "category": "telemedicine"},
+]
+
+
+def _matches_filters(item, doc_filter, year_filter, category_filter, topic_filter):
+    """The per-row predicate the vectorized mask replaced (formerly in rag/barriers.py)."""
+    if doc_filter and item.get("doc") not in doc_filter:
+        return False
+    if year_filter:
+        item_year = item.get("year")
+        if item_year is not None:
+            if int(item_year) != int(year_filter):
+                return False
+        elif not item.get("doc", "").startswith(f"{year_filter}_"):
+            return False
+    if category_filter and item.get("category") != category_filter:
+        return False
+    if topic_filter and set(item.get("topics", []) or []).isdisjoint(set(topic_filter)):
+        return False
+    return True
+
+
+DOCS = [None, ["2021_p4p.pdf"], ["ehr_review.pdf", "notes.txt"], ["missing.pdf"]]
+YEARS = [None, 2019, 2021, 2030]
+CATEGORIES = [None, "telemedicine", "payment", "unknown"]
+TOPICS = [None, ["p4p"], ["ehr", "broadband"], ["unknown"]]
+
+
+def test_filter_mask_matches_the_row_predicate():
+    for spec in itertools.product(DOCS, YEARS, CATEGORIES, TOPICS):
+        mask = filter_mask(META, *spec)
+        expected = [_matches_filters(m, *spec) for m in META]
+        if mask is None:
+            assert all(expected), spec
+        else:
+            assert mask.tolist() == expected, spec
+
+
+def test_no_filter_is_no_mask():
+    assert filter_mask(META) is None
+    assert isinstance(filter_mask(META, year_filter=2021), np.ndarray)
@@ -0,0 +1,63 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from rag.hierarchy import build_child_index
+from rag.index_store import load_child_index
+
+DIM = 8
+
+
+def _embed(texts):
+    return np.random.default_rng(len(texts)).standard_normal((len(texts), DIM)).tolist()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    meta = [
+        {"doc": "a.pdf", "page": 1, "chunk_id": 0, "text": "Broadband is limited. Visits moved to audio. Payers lagged."},
+        {"doc": "b.pdf", "page": 2, "chunk_id": 1, "text": "Prior authorization delays care. Staff time grows."},
+    ]
+    (tmp_path / "index_meta.jsonl").write_text("".join(json.dumps(m) + "\n" for m in meta), encoding="utf-8")
+    index = faiss.IndexFlatIP(DIM)
+    index.add(np.asarray(_embed([m["text"] for m in meta]), dtype="float32"))
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    build_child_index(
+        tmp_path / "index_meta.jsonl",
+        tmp_path / "child_index.faiss",
+        tmp_path / "child_parent.npy",
+        parent_index_path=tmp_path / "index.faiss",
+        embed_fn=_embed,
+        batch_size=2,
+    )
+    return tmp_path
+
+
+def _load(storage):
+    return load_child_index(
+        storage / "child_index.faiss",
+        storage / "child_parent.npy",
+        parent_index_path=storage / "index.faiss",
+        meta_path=storage / "index_meta.jsonl",
+    )
+
+
+def test_child_index_matching_its_parents_loads(storage):
+    index, child_parent = _load(storage)
+    assert index.ntotal == len(child_parent)
+    assert set(child_parent.tolist()) == {0, 1}
+
+
+def test_child_index_of_another_parent_version_is_rejected(storage):
+    meta = storage / "index_meta.jsonl"
+    meta.write_text(meta.read_text(encoding="utf-8").replace("Payers lagged", "Payers caught up"), encoding="utf-8")
+    assert _load(storage) is None
+
+
+def test_child_parent_rows_out_of_range_are_rejected(storage):
+    child_parent = np.load(storage / "child_parent.npy")
+    child_parent[-1] = 5
+    np.save(storage / "child_parent.npy", child_parent)
+    assert _load(storage) is None
@@ -0,0 +1,36 @@
+import pytest
+
+from rag.intent import compare_facets
+
+
+@pytest.mark.parametrize(
+    "question, facets",
+    [
+        ("similarities and differences between P4P and prior authorization", ("P4P", "prior authorization")),
+        ("Barriers vs facilitators of EHR adoption", ("Barriers of EHR adoption", "facilitators of EHR adoption")),
+        (
+            "Compare barriers to interoperability and telemedicine",
+            ("barriers to interoperability", "barriers to telemedicine"),
+        ),
+        ("Compare interoperability and telemedicine barriers", ("interoperability barriers", "telemedicine barriers")),
+        ("Compare telemedicine with pay-for-performance", ("telemedicine", "pay-for-performance")),
+        ("What is telemedicine vs interoperability?", ("telemedicine", "interoperability")),
+    ],
+)
+def test_compare_facets_splits_explicit_comparisons(question, facets):
+    assert compare_facets(question) == facets
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Compare telehealth adoption in low- and middle-income countries",
+        "What are the effects of P4P and prior auth on quality and costs?",
+        "Compare the effects of P4P and prior auth on quality and costs",
+        "Compare interoperability, telemedicine and P4P",
+        "How does P4P compare?",
+        "",
+    ],
+)
+def test_compare_facets_falls_back_to_single_query(question):
+    assert compare_facets(question) == ()
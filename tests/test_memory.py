@@ -0,0 +1,60 @@
+import threading
+import time
+
+from rag.memory import FOLD_BATCH_TURNS, ConversationMemory
+
+
+def test_render_does_not_wait_for_a_running_fold():
+    started, release = threading.Event(), threading.Event()
+
+    def slow_summarize(summary, turns):
+        started.set()
+        release.wait(5)
+        return "Discussed " + ", ".join(q for q, _ in turns)
+
+    memory = ConversationMemory(recent_turns=1, summarize=slow_summarize)
+    memory.add_turn("What limits rural telemedicine?", "Broadband.")
+    memory.add_turn("And reimbursement?", "Payer rules vary.")
+    memory.compact_async()
+    assert started.wait(5)
+
+    t0 = time.perf_counter()
+    block = memory.render()
+    assert time.perf_counter() - t0 < 0.5
+    # the turn being folded is still visible as a question
+    assert "Earlier question: What limits rural telemedicine?" in block
+    assert "User: And reimbursement?" in block
+
+    release.set()
+    memory._pending.result(5)
+    block = memory.render()
+    assert "Summary of earlier conversation: Discussed What limits rural telemedicine?" in block
+    assert "Earlier question" not in block
+
+
+def test_fold_merges_a_batch_of_turns_per_call():
+    calls = []
+
+    def summarize(summary, turns):
+        calls.append(len(turns))
+        return summary + "".join(q[0] for q, _ in turns)
+
+    memory = ConversationMemory(recent_turns=2, summarize=summarize)
+    for i in range(FOLD_BATCH_TURNS + 5):
+        memory.add_turn(f"q{i}", f"a{i}")
+    memory.compact_async()
+    memory._pending.result(5)
+
+    assert calls == [FOLD_BATCH_TURNS, 3]
+    assert [q for q, _ in memory.turns] == [f"q{FOLD_BATCH_TURNS + 3}", f"q{FOLD_BATCH_TURNS + 4}"]
+
+
+def test_failed_summary_keeps_the_questions():
+    def broken(summary, turns):
+        raise RuntimeError("no network")
+
+    memory = ConversationMemory(recent_turns=0, summarize=broken)
+    memory.add_turn("Barriers to EHR adoption?", "Cost.")
+    memory.compact_async()
+    memory._pending.result(5)
+    assert memory.summary == "Barriers to EHR adoption?"
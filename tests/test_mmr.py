@@ -0,0 +1,42 @@
+import faiss
+import numpy as np
+
+from rag.retriever import MAX_PER_PAGE, _diversify, mmr_select
+
+
+def _unit_rows(n, dim=16, seed=0):
+    V = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(V)
+    return V
+
+
+def test_lambda_one_is_plain_top_k():
+    V = _unit_rows(20)
+    scores = np.random.default_rng(1).random(20).astype("float32")
+    assert mmr_select(V, scores, 5, lambda_=1.0) == list(np.argsort(-scores)[:5])
+
+
+def test_lower_lambda_skips_a_near_copy_of_the_best_hit():
+    V = _unit_rows(3)
+    V[1] = V[0]   # same passage twice
+    scores = np.array([0.9, 0.89, 0.5], dtype="float32")
+    assert mmr_select(V, scores, 2, lambda_=1.0) == [0, 1]
+    assert mmr_select(V, scores, 2, lambda_=0.5) == [0, 2]
+
+
+def test_page_cap_is_respected_even_at_lambda_one():
+    pages = [("a.pdf", 1)] * 4 + [("a.pdf", 2), ("b.pdf", 1)]
+    scores = np.array([0.9, 0.85, 0.8, 0.75, 0.5, 0.4], dtype="float32")
+    picked = mmr_select(_unit_rows(6), scores, 4, lambda_=1.0, groups=(pages,), caps=(MAX_PER_PAGE,))
+    assert picked == [0, 1, 4, 5]
+    assert sum(pages[i] == ("a.pdf", 1) for i in picked) == MAX_PER_PAGE
+
+
+def test_diversify_caps_pages_and_keeps_score_order():
+    V = _unit_rows(5)
+    index = faiss.IndexFlatIP(V.shape[1])
+    index.add(V)
+    meta = [{"doc": "a.pdf", "page": 1}] * 3 + [{"doc": "a.pdf", "page": 2}, {"doc": "b.pdf", "page": 7}]
+    hits = [(0, 0.9), (1, 0.8), (2, 0.7), (3, 0.6), (4, 0.5)]
+    out = _diversify(index, meta, hits, top_k=4, mmr_lambda=1.0)
+    assert out == [(0, 0.9), (1, 0.8), (3, 0.6), (4, 0.5)]
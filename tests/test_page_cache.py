@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from rag import page_cache
+from rag.page_cache import PageCache, content_key, iter_clean_pages
+
+
+@pytest.fixture
+def doc(tmp_path):
+    path = tmp_path / "guide.md"
+    path.write_text("".join(f"# Part {i}\nTelemedicine section {i}.\n" for i in range(1, 6)), encoding="utf-8")
+    return path
+
+
+def test_reopened_cache_serves_complete_documents_page_by_page(tmp_path, doc, monkeypatch):
+    db = tmp_path / "page_cache.sqlite3"
+    cache = PageCache(db)
+    extracted = list(iter_clean_pages(doc, cache))
+    assert len(extracted) == 5
+    cache.close()
+
+    monkeypatch.setattr(page_cache, "PAGE_FETCH", 2)
+    monkeypatch.setattr(page_cache, "iter_pages", pytest.fail)   # must not re-extract
+    reopened = PageCache(db)
+    assert reopened.has(content_key(doc))
+    assert list(iter_clean_pages(doc, reopened)) == extracted
+    assert reopened.stats()["pages"] == 5
+    reopened.close()
+
+
+def test_interrupted_extraction_is_redone(tmp_path, doc):
+    cache = PageCache(tmp_path / "page_cache.sqlite3")
+    pages = iter_clean_pages(doc, cache)
+    next(pages)
+    pages.close()
+    assert not cache.has(content_key(doc))
+    assert len(list(iter_clean_pages(doc, cache))) == 5
+    cache.close()
+
+
+def test_first_layout_is_dropped_once(tmp_path, doc):
+    db = tmp_path / "page_cache.sqlite3"
+    with sqlite3.connect(str(db)) as conn:
+        conn.execute("CREATE TABLE pages (key TEXT PRIMARY KEY, data BLOB)")
+
+    cache = PageCache(db)
+    list(iter_clean_pages(doc, cache))
+    cache.close()
+
+    with sqlite3.connect(str(db)) as conn:
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == page_cache.SCHEMA_VERSION
+    assert "pages" not in tables
+    assert PageCache(db).has(content_key(doc))
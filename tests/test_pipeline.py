@@ -0,0 +1,53 @@
+import zipfile
+
+import faiss
+import numpy as np
+import pytest
+
+from rag import pipeline
+from rag.page_cache import PageCache, iter_clean_pages
+
+
+def _embed(texts):
+    return np.random.default_rng(len(texts)).standard_normal((len(texts), 8)).tolist()
+
+
+@pytest.fixture
+def docs(tmp_path, monkeypatch):
+    cache = PageCache(tmp_path / "page_cache.sqlite3")
+    monkeypatch.setattr(pipeline, "iter_clean_pages", lambda path: iter_clean_pages(path, cache))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "notes.txt").write_text("Telemedicine needs broadband. " * 40, encoding="utf-8")
+    with zipfile.ZipFile(docs / "sheet.docx", "w") as z:
+        z.writestr("xl/workbook.xml", "<workbook/>")
+    return docs
+
+
+def _build(docs, storage):
+    return pipeline.ingest_streaming(
+        docs, storage / "index.faiss", storage / "index_meta.jsonl", embed_fn=_embed, hierarchy=False
+    )
+
+
+def test_non_word_docx_is_skipped(docs, tmp_path):
+    index = _build(docs, tmp_path)
+    meta = (tmp_path / "index_meta.jsonl").read_text(encoding="utf-8").splitlines()
+    assert index.ntotal == len(meta) > 0
+
+
+def test_failed_index_write_keeps_previous_index_and_meta(docs, tmp_path, monkeypatch):
+    _build(docs, tmp_path)
+    old_meta = (tmp_path / "index_meta.jsonl").read_bytes()
+    old_index = (tmp_path / "index.faiss").read_bytes()
+
+    (docs / "more.txt").write_text("Reimbursement rules differ by state. " * 40, encoding="utf-8")
+
+    def fail(index, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(faiss, "write_index", fail)
+    with pytest.raises(OSError):
+        _build(docs, tmp_path)
+    assert (tmp_path / "index_meta.jsonl").read_bytes() == old_meta
+    assert (tmp_path / "index.faiss").read_bytes() == old_index
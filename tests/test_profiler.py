@@ -0,0 +1,48 @@
+import time
+
+from rag.profiler import DEFAULT_STAGE, SamplingProfiler, _report, load_stacks, stage_totals, top_functions
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(i * i for i in range(200))
+
+
+def test_folded_output_round_trips_through_report(tmp_path, capsys):
+    profiler = SamplingProfiler(interval=0.001, out_dir=tmp_path)
+    profiler.begin("20261019-120000")
+    _busy(0.2)
+    profiler.end()
+    time.sleep(0.05)   # let an in-progress sample finish
+    path = profiler.flush()
+    assert path is not None and path.suffix == ".folded"
+
+    window, stacks = load_stacks(out_dir=tmp_path)
+    assert window == "20261019-120000"
+    assert stacks == profiler.stacks()
+    assert sum(stacks.values()) == profiler.samples > 0
+    # not under a rag/ stage pattern: attributed to the default stage
+    assert set(stage_totals(stacks)) == {DEFAULT_STAGE}
+    assert any(label.startswith("_busy (tests/test_profiler.py:") for stack in stacks for label in stack.split(";"))
+
+    _report(window, stacks, None)
+    out = capsys.readouterr().out
+    assert f"Window 20261019-120000: {profiler.samples} samples" in out
+
+
+def test_report_merges_workers_of_the_latest_window(tmp_path):
+    (tmp_path / "20261019-110000-11.folded").write_text("openai;main (app/app.py:1);chat (rag/openai_client.py:98) 7\n")
+    (tmp_path / "20261019-120000-11.folded").write_text(
+        "retrieve;main (app/app.py:1);retrieve (rag/retriever.py:425) 3\n"
+        "parse;main (app/app.py:1);loads (json/__init__.py:299) 2\n"
+    )
+    (tmp_path / "20261019-120000-12.folded").write_text("retrieve;main (app/app.py:1);retrieve (rag/retriever.py:425) 4\n")
+
+    window, stacks = load_stacks(out_dir=tmp_path)
+    assert window == "20261019-120000"
+    assert stage_totals(stacks) == {"retrieve": 7, "parse": 2}
+    assert top_functions(stacks, "retrieve") == [("retrieve (rag/retriever.py:425)", 7)]
+    assert load_stacks("20261019-110000", out_dir=tmp_path)[1] == {
+        "openai;main (app/app.py:1);chat (rag/openai_client.py:98)": 7
+    }
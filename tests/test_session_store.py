@@ -0,0 +1,53 @@
+import pytest
+
+from rag.session_store import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(tmp_path / "sessions.sqlite3", max_messages=5)
+    return MemorySessionStore(max_messages=5)
+
+
+def test_history_pages_in_order_and_is_capped(store):
+    for i in range(7):
+        store.append("s1", {"role": "user", "content": f"q{i}"})
+    store.append("s2", {"role": "user", "content": "other"})
+
+    assert store.count("s1") == 5
+    assert [m["content"] for m in store.page("s1", 0, 2)] == ["q2", "q3"]
+    assert [m["content"] for m in store.page("s1", 2, 2)] == ["q4", "q5"]
+    assert [m["content"] for m in store.page("s1", 4, 2)] == ["q6"]
+    assert store.page("s1", 5, 2) == []
+    assert store.count("s2") == 1
+
+
+def test_state_round_trip_and_delete(store):
+    state = {"turns": [["Barriers?", "Cost – and “access”."]], "summary": ""}
+    store.put_state("s1", "memory", state)
+    assert store.get_state("s1", "memory") == state
+    store.put_state("s1", "memory", {"turns": [], "summary": "x"})
+    assert store.get_state("s1", "memory")["summary"] == "x"
+
+    store.delete("s1")
+    assert store.get_state("s1", "memory") is None
+    assert store.count("s1") == 0
+
+
+def test_sqlite_history_survives_reopen(tmp_path):
+    SQLiteSessionStore(tmp_path / "sessions.sqlite3").append("s1", {"role": "assistant", "content": "a"})
+    reopened = SQLiteSessionStore(tmp_path / "sessions.sqlite3")
+    assert reopened.page("s1", 0, 10) == [{"role": "assistant", "content": "a"}]
+
+
+def test_incomplete_store_cannot_be_created():
+    class NoDelete(SessionStore):
+        def append(self, session_id, message): ...
+        def count(self, session_id): ...
+        def page(self, session_id, offset, limit): ...
+        def get_state(self, session_id, key): ...
+        def put_state(self, session_id, key, value): ...
+
+    with pytest.raises(TypeError):
+        NoDelete()
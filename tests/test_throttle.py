@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from rag import throttle, usage
+from rag.usage import UsageLedger, record_usage, usage_scope
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    ledger = UsageLedger(tmp_path / "usage.sqlite3", flush_s=3600)
+    monkeypatch.setattr(usage, "_ledger", ledger)
+    yield ledger
+    ledger.close()
+
+
+def test_identical_concurrent_requests_share_one_call_and_both_pay(ledger):
+    calls = []
+    release = threading.Event()
+    results = {}
+
+    def answer():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        record_usage("chat", "gpt-4o-mini", 1000, 200)
+        return {"answer": "shared"}
+
+    def ask(session_id):
+        with usage_scope(session_id):
+            results[session_id] = throttle.run_guarded(("same question",), answer)
+
+    leader = threading.Thread(target=ask, args=("s1",), name="leader")
+    leader.start()
+    while ("same question",) not in throttle._coalescer._inflight:
+        time.sleep(0.001)
+    follower = threading.Thread(target=ask, args=("s2",), name="follower")
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert calls == ["leader"]
+    assert results == {"s1": {"answer": "shared"}, "s2": {"answer": "shared"}}
+    assert ledger.session_totals("s1")["calls"] == 1
+    assert ledger.session_totals("s2")["calls"] == 1
+    assert ledger.session_cost("s2") == ledger.session_cost("s1") > 0
+    # one real API call today; the follower's copy only counts against its session
+    assert ledger.day_totals()["calls"] == 1
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+from rag.usage import UsageLedger, UsageScope, export_counters
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UsageLedger(tmp_path / "usage.sqlite3", flush_s=3600)
+    yield ledger
+    ledger.close()
+
+
+def _rows(path):
+    with sqlite3.connect(str(path)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM usage").fetchone()[0]
+
+
+def test_records_are_buffered_until_flush(ledger, tmp_path):
+    scope = UsageScope("s1", "r1", "{}")
+    ledger.record("chat", "gpt-4o-mini", 1_000_000, 0, scope)
+    ledger.count("parse.calls")
+
+    assert _rows(tmp_path / "usage.sqlite3") == 0
+    assert ledger.session_totals("s1")["calls"] == 1
+    assert ledger.event_counts() == {"parse.calls": 1}
+
+    ledger.flush()
+    assert _rows(tmp_path / "usage.sqlite3") == 1
+    assert ledger.session_totals("s1")["calls"] == 1
+    assert ledger.event_counts() == {"parse.calls": 1}
+
+
+def test_running_cost_includes_buffered_and_later_calls(ledger):
+    scope = UsageScope("s1", "r1", "{}")
+    ledger.record("chat", "gpt-4o-mini", 1_000_000, 0, scope)
+    assert ledger.session_cost("s1") == pytest.approx(0.15)
+    ledger.flush()
+    ledger.record("chat", "gpt-4o-mini", 0, 1_000_000, scope)
+    assert ledger.session_cost("s1") == pytest.approx(0.75)
+    assert ledger.day_cost() == pytest.approx(0.75)
+
+
+def test_locked_database_keeps_rows_for_the_next_flush(ledger, tmp_path):
+    ledger.record("chat", "gpt-4o-mini", 10, 5, UsageScope("s1", "r1", "{}"))
+    blocker = sqlite3.connect(str(tmp_path / "usage.sqlite3"), timeout=0, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    ledger._conn.execute("PRAGMA busy_timeout = 0")
+
+    ledger.flush()  # logged, not raised
+    assert _rows(tmp_path / "usage.sqlite3") == 0
+    assert ledger.session_totals("s1")["calls"] == 1
+
+    blocker.execute("ROLLBACK")
+    blocker.close()
+    ledger.flush()
+    assert _rows(tmp_path / "usage.sqlite3") == 1
+
+
+def test_exported_counters_are_written_as_deltas(ledger):
+    counts = {"hit": 0}
+    export_counters("test_export", lambda: dict(counts))
+    counts["hit"] = 3
+    ledger.flush()
+    counts["hit"] = 5
+    ledger.flush()
+    assert ledger.event_counts()["test_export.hit"] == 5
@@ -0,0 +1,64 @@
+import hashlib
+
+import faiss
+import numpy as np
+import pytest
+
+from rag import llm_cache, openai_client, warmup
+from rag.retriever import clear_hint_vectors
+
+DIM = 8
+
+
+def _fake_embed_call(texts):
+    out = []
+    for t in texts:
+        seed = int(hashlib.sha256(t.encode("utf-8")).hexdigest()[:8], 16)
+        out.append(np.random.default_rng(seed).standard_normal(DIM).tolist())
+    return out
+
+
+@pytest.fixture
+def corpus():
+    texts = ["Telemedicine barriers in primary care.", "Reimbursement for remote visits.", "EHR adoption costs."]
+    meta = [
+        {"doc": f"doc{i}.pdf", "page": 1, "chunk_id": i, "text": t, "year": 2020, "topics": [], "category": None}
+        for i, t in enumerate(texts)
+    ]
+    X = np.array(_fake_embed_call(texts), dtype="float32")
+    faiss.normalize_L2(X)
+    index = faiss.IndexFlatIP(DIM)
+    index.add(X)
+    return index, meta
+
+
+def _reset_caches():
+    llm_cache.clear_cache()
+    llm_cache._cassette = None
+    clear_hint_vectors()
+
+
+def test_replay_warmup_is_ready_without_api_key(tmp_path, monkeypatch, corpus):
+    index, meta = corpus
+    monkeypatch.setenv(llm_cache.CASSETTE_ENV, str(tmp_path / "cassette.jsonl"))
+    monkeypatch.setattr(openai_client, "_embed_call", _fake_embed_call)
+    monkeypatch.setattr(openai_client, "_client", None)
+    monkeypatch.setattr(openai_client, "prime_client", lambda: None)
+
+    # record the warmup embeddings once
+    monkeypatch.setenv(llm_cache.MODE_ENV, "record")
+    _reset_caches()
+    assert warmup.warmup(index, meta).ready
+
+    monkeypatch.undo()
+    monkeypatch.setenv(llm_cache.CASSETTE_ENV, str(tmp_path / "cassette.jsonl"))
+    monkeypatch.setenv(llm_cache.MODE_ENV, "replay")
+    monkeypatch.setenv("OPENAI_API_KEY", "")
+    monkeypatch.setattr(openai_client, "_client", None)
+    monkeypatch.setattr(openai_client, "_embed_call", pytest.fail)
+    _reset_caches()
+
+    report = warmup.warmup(index, meta)
+    assert report.ready, report.errors
+    assert openai_client._client is None
+    _reset_caches()